@@ -0,0 +1,112 @@
+"""
+Runs the SDK benchmarks against an in-process mock Ottu server.
+
+    python -m benchmarks
+    python -m benchmarks --only checkout session_init --iterations 5000
+    python -m benchmarks --max-regression 0.1 --metric p99_us
+
+Every run is appended as one JSON line to the history file. Unless a
+`--baseline` file is given, the run is compared against the last entry of
+the history, and the command exits with status 1 on a regression.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from .suite import BENCHMARKS, BenchmarkConfig, find_regressions, run
+
+DEFAULT_HISTORY = Path(".benchmarks/history.jsonl")
+
+
+def load_last_record(path: Path) -> dict | None:
+    if not path.exists():
+        return None
+    lines = [line for line in path.read_text().splitlines() if line.strip()]
+    if not lines:
+        return None
+    return json.loads(lines[-1])
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS))
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument(
+        "--async-latency-ms",
+        type=float,
+        default=2.0,
+        help="Simulated round trip of the mock server in the async benchmark.",
+    )
+    parser.add_argument("--history", type=Path, default=DEFAULT_HISTORY)
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        help="JSON lines file to compare against (last line). "
+        "Defaults to the last entry of the history.",
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown before failing, as a fraction (0.25 = 25%%).",
+    )
+    parser.add_argument(
+        "--metric",
+        default="p50_us",
+        choices=["p50_us", "p99_us", "mean_us", "ops_per_sec"],
+    )
+    parser.add_argument(
+        "--no-save",
+        action="store_true",
+        help="Do not append this run to the history.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    config = BenchmarkConfig(
+        iterations=args.iterations,
+        warmup=args.warmup,
+        concurrency=args.concurrency,
+        async_latency=args.async_latency_ms / 1000,
+    )
+    baseline = load_last_record(args.baseline or args.history)
+    record = run(config=config, names=args.only)
+
+    sys.stdout.write(
+        f"{'benchmark':<32}{'ops/sec':>12}{'mean us':>12}"
+        f"{'p50 us':>12}{'p99 us':>12}\n",
+    )
+    for name, result in record["results"].items():
+        sys.stdout.write(
+            f"{name:<32}{result['ops_per_sec']:>12.1f}{result['mean_us']:>12.1f}"
+            f"{result['p50_us']:>12.1f}{result['p99_us']:>12.1f}\n",
+        )
+
+    if not args.no_save:
+        args.history.parent.mkdir(parents=True, exist_ok=True)
+        with args.history.open("a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    if baseline is None:
+        return 0
+    regressions = find_regressions(
+        record=record,
+        baseline=baseline,
+        max_regression=args.max_regression,
+        metric=args.metric,
+    )
+    for regression in regressions:
+        sys.stderr.write(f"REGRESSION {regression}\n")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+An in-process stand-in for the Ottu API, built on `httpx.MockTransport`.
+
+It answers the endpoints used by the SDK with canned responses, so the
+benchmarks measure the SDK overhead instead of the network.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+
+import httpx
+
+from ottu import Ottu, OttuAsync, urls
+from ottu.session import Session
+from tests import fake_data
+
+
+def _json_response(status_code: int, data) -> httpx.Response:
+    # Pre-serialized, so that the server side costs (almost) nothing
+    return httpx.Response(
+        status_code,
+        content=json.dumps(data).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+
+
+class MockOttuServer:
+    def __init__(self, latency: float = 0.0):
+        # Simulated network round trip, in seconds
+        self.latency = latency
+        self.requests = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        path = request.url.path
+        if path == Session.url_session_create:
+            return _json_response(201, fake_data.response_checkout)
+        if path.startswith(Session.url_session_create):
+            return _json_response(200, fake_data.response_checkout)
+        if path == Session.url_ops:
+            return _json_response(200, {"detail": "Success"})
+        if path == Session.url_auto_debit:
+            return _json_response(200, fake_data.response_auto_debit)
+        if path == urls.PAYMENT_METHODS:
+            return _json_response(200, fake_data.response_payment_methods)
+        if path.startswith(urls.USER_CARDS):
+            return _json_response(200, fake_data.response_user_cards)
+        return _json_response(404, {"detail": "Not found."})
+
+    @property
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self)
+
+    def client(self, auth) -> httpx.Client:
+        return httpx.Client(auth=auth, transport=self.transport)
+
+    def ottu(self, **kwargs) -> Ottu:
+        ottu = Ottu(**kwargs)
+        ottu.request_session = self.client(auth=ottu.auth)
+        return ottu
+
+    def ottu_async(self, **kwargs) -> OttuAsync:
+        ottu = OttuAsync(**kwargs)
+        ottu._ottu.request_session = self.client(auth=ottu._ottu.auth)
+        return ottu
@@ -0,0 +1,296 @@
+"""
+Benchmarks for the SDK hot paths.
+
+Each benchmark is a function that takes the `BenchmarkConfig` and returns
+the per-call latencies (in seconds) and the wall time of the whole run.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from ottu.auth import APIKeyAuth
+from ottu.enums import TxnType
+from ottu.session import Session
+from ottu.utils.webhooks import (
+    calculate_hmac_signature,
+    calculate_subscription_hmac_signature,
+    verify_signature,
+)
+from tests import fake_data
+
+from .mock_server import MockOttuServer
+
+MERCHANT_ID = "bench.ottu.dev"
+SESSION_ID = fake_data.response_checkout["session_id"]
+WEBHOOK_KEY = "bench-webhook-key"
+
+CHECKOUT_PAYLOAD = {
+    "txn_type": TxnType.PAYMENT_REQUEST,
+    "amount": "12.34",
+    "currency_code": "KWD",
+    "pg_codes": ["KNET"],
+    "customer_id": "bench-customer",
+}
+
+SUBSCRIPTION_WEBHOOK = {
+    **fake_data.webhook_payload,
+    "payment_type": "auto_debit",
+    "session_id": SESSION_ID,
+    "token": {"token": "tok-1", "pg_code": "knet", "customer_id": "cust-1"},
+    "extra": {"merchant_id": MERCHANT_ID},
+}
+
+
+@dataclass
+class BenchmarkConfig:
+    iterations: int = 1000
+    warmup: int = 50
+    # Number of in-flight requests in the async benchmark
+    concurrency: int = 20
+    # Simulated round trip of the mock server in the async benchmark, in seconds
+    async_latency: float = 0.002
+    # Every sample of the import benchmark spawns an interpreter, so it runs
+    # at most this many iterations
+    import_iterations: int = 20
+
+
+@dataclass
+class Timings:
+    latencies: list[float]
+    wall_time: float
+
+
+def _time_calls(func: Callable[[], object], config: BenchmarkConfig) -> Timings:
+    for _ in range(config.warmup):
+        func()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(config.iterations):
+        call_start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - call_start)
+    return Timings(latencies=latencies, wall_time=time.perf_counter() - start)
+
+
+def _ottu(server: MockOttuServer):
+    return server.ottu(merchant_id=MERCHANT_ID, auth=APIKeyAuth("bench-api-key"))
+
+
+def bench_checkout(config: BenchmarkConfig) -> Timings:
+    ottu = _ottu(MockOttuServer())
+    return _time_calls(lambda: ottu.checkout(**CHECKOUT_PAYLOAD), config)
+
+
+def bench_session_ops(config: BenchmarkConfig) -> Timings:
+    ottu = _ottu(MockOttuServer())
+    return _time_calls(
+        lambda: ottu.session.ops(
+            operation="refund",
+            session_id=SESSION_ID,
+            amount="1.000",
+        ),
+        config,
+    )
+
+
+def bench_get_cards(config: BenchmarkConfig) -> Timings:
+    ottu = _ottu(MockOttuServer())
+    return _time_calls(
+        lambda: ottu.cards.get_cards(customer_id="bench-customer"),
+        config,
+    )
+
+
+def bench_verify_signature_standard(config: BenchmarkConfig) -> Timings:
+    payload = fake_data.webhook_payload
+    signature = calculate_hmac_signature(payload=payload, hmac_key=WEBHOOK_KEY)
+    return _time_calls(
+        lambda: verify_signature(
+            payload=payload,
+            signature=signature,
+            webhook_key=WEBHOOK_KEY,
+        ),
+        config,
+    )
+
+
+def bench_verify_signature_subscription(config: BenchmarkConfig) -> Timings:
+    payload = SUBSCRIPTION_WEBHOOK
+    signature = calculate_subscription_hmac_signature(
+        payload=payload,
+        hmac_key=WEBHOOK_KEY,
+    )
+    return _time_calls(
+        lambda: verify_signature(
+            payload=payload,
+            signature=signature,
+            webhook_key=WEBHOOK_KEY,
+        ),
+        config,
+    )
+
+
+def bench_session_init(config: BenchmarkConfig) -> Timings:
+    ottu = _ottu(MockOttuServer())
+    return _time_calls(
+        lambda: Session(ottu=ottu, **fake_data.response_checkout),
+        config,
+    )
+
+
+def bench_async_checkout_concurrency(config: BenchmarkConfig) -> Timings:
+    server = MockOttuServer(latency=config.async_latency)
+
+    async def run() -> Timings:
+        latencies: list[float] = []
+        semaphore = asyncio.Semaphore(config.concurrency)
+        ottu = server.ottu_async(
+            merchant_id=MERCHANT_ID,
+            auth=APIKeyAuth("bench-api-key"),
+        )
+
+        async def checkout():
+            async with semaphore:
+                call_start = time.perf_counter()
+                await ottu.checkout(**CHECKOUT_PAYLOAD)
+                latencies.append(time.perf_counter() - call_start)
+
+        async with ottu:
+            start = time.perf_counter()
+            await asyncio.gather(*(checkout() for _ in range(config.iterations)))
+            wall_time = time.perf_counter() - start
+        return Timings(latencies=latencies, wall_time=wall_time)
+
+    return asyncio.run(run())
+
+
+def _import_time(module: str) -> float:
+    """
+    Returns the time (in seconds) it takes to import `module` in a fresh
+    interpreter, as reported by `python -X importtime`. The interpreter
+    startup itself is not included.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # import time: self [us] | cumulative | imported package
+    for line in process.stderr.splitlines():
+        _, cumulative, name = line.split("|")
+        if name.strip() == module:
+            return int(cumulative) / 1e6
+    raise RuntimeError(f"{module} was not imported")
+
+
+def bench_import(config: BenchmarkConfig) -> Timings:
+    if config.warmup:
+        # Writes the bytecode cache
+        _import_time("ottu")
+    latencies = [
+        _import_time("ottu")
+        for _ in range(min(config.iterations, config.import_iterations))
+    ]
+    return Timings(latencies=latencies, wall_time=sum(latencies))
+
+
+BENCHMARKS: dict[str, Callable[[BenchmarkConfig], Timings]] = {
+    "checkout": bench_checkout,
+    "session_ops": bench_session_ops,
+    "get_cards": bench_get_cards,
+    "verify_signature_standard": bench_verify_signature_standard,
+    "verify_signature_subscription": bench_verify_signature_subscription,
+    "session_init": bench_session_init,
+    "async_checkout_concurrency": bench_async_checkout_concurrency,
+    "import": bench_import,
+}
+
+
+def _percentile(samples: list[float], percent: float) -> float:
+    index = round(percent / 100 * (len(samples) - 1))
+    return samples[index]
+
+
+def summarize(timings: Timings) -> dict[str, float]:
+    samples = sorted(timings.latencies)
+    return {
+        "iterations": len(samples),
+        "ops_per_sec": len(samples) / timings.wall_time,
+        "mean_us": statistics.fmean(samples) * 1e6,
+        "p50_us": _percentile(samples, 50) * 1e6,
+        "p99_us": _percentile(samples, 99) * 1e6,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(
+    config: BenchmarkConfig,
+    names: list[str] | None = None,
+) -> dict:
+    """
+    Runs the benchmarks and returns a JSON serializable record.
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        results[name] = summarize(BENCHMARKS[name](config))
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "iterations": config.iterations,
+            "concurrency": config.concurrency,
+            "async_latency": config.async_latency,
+            "import_iterations": config.import_iterations,
+        },
+        "results": results,
+    }
+
+
+def find_regressions(
+    record: dict,
+    baseline: dict,
+    max_regression: float,
+    metric: str = "p50_us",
+) -> list[str]:
+    """
+    Compares `record` against `baseline` and describes every benchmark whose
+    `metric` got worse by more than `max_regression` (eg: 0.25 is 25%).
+    """
+    regressions = []
+    # For throughput higher is better, for latencies lower is better
+    higher_is_better = metric == "ops_per_sec"
+    for name, result in record["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or not previous.get(metric):
+            continue
+        change = (result[metric] - previous[metric]) / previous[metric]
+        if higher_is_better:
+            change = -change
+        if change > max_regression:
+            regressions.append(
+                f"{name}: {metric} {previous[metric]:.2f} -> {result[metric]:.2f} "
+                f"({change:+.0%}, limit {max_regression:+.0%})",
+            )
+    return regressions
@@ -0,0 +1,166 @@
+"""
+Measures the Django token lookup (`Session.get_token_from_db`) against the
+size of the `Checkout` table, next to the former lookup on the JSON path
+`agreement__id` on a table without `ottu_checkout_token_idx`, that is, as
+it was before the `0002_checkout_token_index` migration.
+
+    python -m benchmarks.token_lookup
+    python -m benchmarks.token_lookup --sizes 1000 10000 100000 --lookups 200
+
+Runs against an in-memory SQLite database.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+# Rows per customer and agreements per customer of the generated table
+CHECKOUTS_PER_CUSTOMER = 10
+AGREEMENTS_PER_CUSTOMER = 2
+
+
+def setup_django() -> None:
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    if not settings.configured:
+        settings.configure(
+            INSTALLED_APPS=["ottu.contrib.django"],
+            DATABASES={
+                "default": {
+                    "ENGINE": "django.db.backends.sqlite3",
+                    "NAME": ":memory:",
+                },
+            },
+            USE_TZ=True,
+            OTTU_MERCHANT_ID="bench.ottu.dev",
+            OTTU_AUTH={"class": "ottu.auth.APIKeyAuth", "api_key": "bench"},
+        )
+        django.setup()
+    call_command("migrate", "ottu", verbosity=0)
+
+
+def populate(size: int) -> None:
+    """
+    Grows the `Checkout` table to `size` rows.
+    """
+    from ottu.contrib.django.models import Checkout
+
+    start = Checkout.objects.count()
+    checkouts = []
+    for index in range(start, size):
+        customer = index // CHECKOUTS_PER_CUSTOMER
+        agreement_id = f"agreement-{customer}-{index % AGREEMENTS_PER_CUSTOMER}"
+        checkouts.append(
+            Checkout(
+                session_id=f"session-{index}",
+                customer_id=f"customer-{customer}",
+                token=f"token-{index}",
+                agreement={"id": agreement_id},
+                # `bulk_create` does not call `save()`
+                agreement_id=agreement_id,
+            ),
+        )
+    Checkout.objects.bulk_create(checkouts, batch_size=5000)
+
+
+def json_path_lookup(agreement: dict, customer_id: str) -> str | None:
+    from ottu.contrib.django.models import Checkout
+
+    instance = Checkout.objects.filter(
+        customer_id=customer_id,
+        agreement__id=agreement.get("id"),
+    ).first()
+    return instance.token if instance else None
+
+
+@contextmanager
+def without_token_index() -> Iterator[None]:
+    from django.db import connection
+
+    from ottu.contrib.django.models import Checkout
+
+    index = next(
+        index
+        for index in Checkout._meta.indexes
+        if index.name == "ottu_checkout_token_idx"
+    )
+    with connection.schema_editor() as schema_editor:
+        schema_editor.remove_index(Checkout, index)
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as schema_editor:
+            schema_editor.add_index(Checkout, index)
+
+
+def _mean_us(
+    lookup: Callable[[dict, str], object],
+    keys: list[tuple[dict, str]],
+) -> float:
+    latencies = []
+    for agreement, customer_id in keys:
+        start = time.perf_counter()
+        lookup(agreement, customer_id)
+        latencies.append(time.perf_counter() - start)
+    return statistics.fmean(latencies) * 1e6
+
+
+def run(sizes: list[int], lookups: int = 100, seed: int = 0) -> list[dict]:
+    """
+    Returns the mean latency of both lookups for every table size. Django
+    must be set up, see `setup_django()`.
+    """
+    from ottu.contrib.django.core.ottu import ottu
+
+    rng = random.Random(seed)
+    results = []
+    for size in sorted(sizes):
+        populate(size)
+        customers = max(size // CHECKOUTS_PER_CUSTOMER, 1)
+        keys = []
+        for _ in range(lookups):
+            customer = rng.randrange(customers)
+            agreement = rng.randrange(AGREEMENTS_PER_CUSTOMER)
+            keys.append(
+                ({"id": f"agreement-{customer}-{agreement}"}, f"customer-{customer}"),
+            )
+        indexed_us = _mean_us(ottu.session.get_token_from_db, keys)
+        with without_token_index():
+            json_path_us = _mean_us(json_path_lookup, keys)
+        results.append(
+            {"rows": size, "indexed_us": indexed_us, "json_path_us": json_path_us},
+        )
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.token_lookup")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1_000, 10_000, 100_000],
+    )
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    sys.stdout.write(f"{'rows':>12}{'indexed us':>16}{'json path us':>16}\n")
+    for result in run(args.sizes, lookups=args.lookups):
+        sys.stdout.write(
+            f"{result['rows']:>12}{result['indexed_us']:>16.1f}"
+            f"{result['json_path_us']:>16.1f}\n",
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,22 @@
 from __future__ import annotations
 
-from .async_ottu import OttuAsync
+from typing import TYPE_CHECKING
+
 from .ottu import Ottu
 
+if TYPE_CHECKING:  # pragma: no cover
+    from .async_ottu import OttuAsync
+
 __all__ = [
     "Ottu",
     "OttuAsync",
 ]
+
+
+def __getattr__(name: str):
+    # `OttuAsync` pulls in `asgiref`, which is only imported when it is used
+    if name == "OttuAsync":
+        from .async_ottu import OttuAsync
+
+        return OttuAsync
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -14,12 +14,21 @@ except ImportError:
 from .ottu import Ottu
 
 
+async def call_sync(func, *args, **kwargs):
+    """Runs the sync `func` in a worker thread."""
+    return await sync_to_async(func)(*args, **kwargs)
+
+
 def async_method(func):
-    """Decorator to convert sync methods to async using sync_to_async."""
+    """Decorator to convert sync methods to async using sync_to_async.
+
+    The call goes through the `_call_sync` of the instance, which is
+    `call_sync` unless overridden.
+    """
 
     @wraps(func)
-    async def wrapper(*args, **kwargs):
-        return await sync_to_async(func)(*args, **kwargs)
+    async def wrapper(self, *args, **kwargs):
+        return await self._call_sync(func, self, *args, **kwargs)
 
     return wrapper
 
@@ -31,9 +40,11 @@ class OttuAsync:
     while providing proper async/await support.
     """
 
+    ottu_cls = Ottu
+
     def __init__(self, *args, **kwargs):
         """Initialize with same arguments as Ottu."""
-        self._ottu = Ottu(*args, **kwargs)
+        self._ottu = self.ottu_cls(*args, **kwargs)
 
     async def __aenter__(self):
         """Async context manager entry."""
@@ -46,13 +57,13 @@ class OttuAsync:
         exc_tb: TracebackType | None,
     ) -> bool | None:
         """Async context manager exit."""
-        # Close the underlying httpx client if it has an aclose method
-        if hasattr(self._ottu.request_session, "aclose"):
-            await self._ottu.request_session.aclose()
-        elif hasattr(self._ottu.request_session, "close"):
-            self._ottu.request_session.close()
+        self._ottu.close()
         return None
 
+    async def _call_sync(self, func, *args, **kwargs):
+        """Runs `func`, a sync method of this instance or of its wrappers."""
+        return await call_sync(func, *args, **kwargs)
+
     # Proxy properties to underlying Ottu instance
     @property
     def merchant_id(self):
@@ -69,12 +80,12 @@ class OttuAsync:
     @property
     def session(self):
         """Return async-wrapped session."""
-        return AsyncSessionWrapper(self._ottu.session)
+        return AsyncSessionWrapper(self._ottu.session, call_sync=self._call_sync)
 
     @property
     def cards(self):
         """Return async-wrapped cards."""
-        return AsyncCardWrapper(self._ottu.cards)
+        return AsyncCardWrapper(self._ottu.cards, call_sync=self._call_sync)
 
     # Async-wrapped methods
     @async_method
@@ -109,8 +120,9 @@ class OttuAsync:
 class AsyncSessionWrapper:
     """Async wrapper for Session class."""
 
-    def __init__(self, session):
+    def __init__(self, session, call_sync=call_sync):
         self._session = session
+        self._call_sync = call_sync
 
     # Proxy properties
     @property
@@ -178,8 +190,9 @@ class AsyncSessionWrapper:
 class AsyncCardWrapper:
     """Async wrapper for Card class."""
 
-    def __init__(self, cards):
+    def __init__(self, cards, call_sync=call_sync):
         self._cards = cards
+        self._call_sync = call_sync
 
     @property
     def customer_id(self):
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TypeGuard
+
+
+@dataclass(frozen=True)
+class CachedAttachment:
+    digest: str
+    filename: str
+    content: bytes
+
+
+class AttachmentCache:
+    """
+    Caches attachments that are sent with many checkout sessions.
+
+    Paths and `bytes` attachments are hashed (SHA-256) once and their content is
+    kept in memory, so repeated uploads skip the disk read. Files are identified
+    by their absolute path, size and modification time, so an edited file is
+    read again.
+
+    The URL that Ottu returns for an uploaded attachment is remembered per
+    content hash. If `reference_field` is set, later sessions with the same
+    content send that URL in `reference_field` instead of uploading the file
+    again. Only set it if your Ottu instance supports such a field. At most
+    `max_urls` URLs are remembered, the least recently used are dropped first.
+
+    Usage:
+        ottu = Ottu(merchant_id=..., auth=..., attachment_cache=AttachmentCache())
+    """
+
+    def __init__(
+        self,
+        max_size: int = 50 * 1024 * 1024,
+        reference_field: str | None = None,
+        max_urls: int = 10_000,
+    ):
+        # Maximum total size of the cached content, in bytes
+        self.max_size = max_size
+        self.reference_field = reference_field
+        self.max_urls = max_urls
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[object, CachedAttachment] = OrderedDict()
+        self._size = 0
+        self._uploaded_urls: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def supports(attachment) -> TypeGuard[str | os.PathLike | bytes]:
+        return isinstance(attachment, (str, os.PathLike, bytes))
+
+    def _get_key(self, attachment) -> tuple:
+        if isinstance(attachment, bytes):
+            # Hashing is needed anyway to find the entry
+            return ("bytes", hashlib.sha256(attachment).hexdigest())
+        stat = os.stat(attachment)
+        return ("path", os.path.abspath(attachment), stat.st_size, stat.st_mtime_ns)
+
+    def get(self, attachment: str | os.PathLike | bytes) -> CachedAttachment:
+        key = self._get_key(attachment)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        if isinstance(attachment, bytes):
+            entry = CachedAttachment(
+                digest=key[1],
+                filename="attachment.pdf",
+                content=attachment,
+            )
+        else:
+            with open(attachment, "rb") as f:
+                content = f.read()
+            entry = CachedAttachment(
+                digest=hashlib.sha256(content).hexdigest(),
+                filename=os.fspath(attachment) or "attachment.pdf",
+                content=content,
+            )
+        self._store(key, entry)
+        return entry
+
+    def _store(self, key: tuple, entry: CachedAttachment) -> None:
+        size = len(entry.content)
+        if size > self.max_size:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            while self._entries and self._size + size > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.content)
+            self._entries[key] = entry
+            self._size += size
+
+    def get_reference(self, digest: str) -> str | None:
+        """
+        The URL to send instead of the file, if reuse is enabled and the
+        content was uploaded before.
+        """
+        if not self.reference_field:
+            return None
+        with self._lock:
+            url = self._uploaded_urls.get(digest)
+            if url is not None:
+                self._uploaded_urls.move_to_end(digest)
+            return url
+
+    def remember_upload(self, digest: str, url: str | None) -> None:
+        if not url or self.max_urls <= 0:
+            return
+        with self._lock:
+            self._uploaded_urls[digest] = url
+            self._uploaded_urls.move_to_end(digest)
+            while len(self._uploaded_urls) > self.max_urls:
+                self._uploaded_urls.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self._uploaded_urls.clear()
+            self.hits = self.misses = 0
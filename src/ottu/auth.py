@@ -1,15 +1,27 @@
 from __future__ import annotations
 
+import os
+
 import httpx
 from httpx import Auth, BasicAuth as _BasicAuth, Request
 
-try:
-    from django.core.cache import cache  # pragma: no cover
-except ImportError:  # pragma: no cover
-    cache = None  # pragma: no cover
+
+def get_cache():
+    """
+    Returns the default Django cache, or `None` if Django is not installed.
+    Imported on demand, so that importing `ottu` does not import Django.
+    """
+    try:
+        from django.core.cache import cache
+    except ImportError:  # pragma: no cover
+        return None  # pragma: no cover
+    return cache
 
 
 class BasicAuth(_BasicAuth):
+    # The attributes that identify the credentials, see `get_auth_key(...)`
+    credential_fields: tuple[str, ...] = ("_auth_header",)
+
     def __bool__(self):
         """
         Sample Pseudo Code:
@@ -31,6 +43,8 @@ class BasicAuthorizationHeaderAuth(Auth):
     Basic authentication using `Authorization` header.
     """
 
+    credential_fields: tuple[str, ...] = ("header",)
+
     def __init__(self, header: str):
         self.header = header
 
@@ -61,6 +75,10 @@ class APIKeyAuth(TokenAuth):
 class KeycloakAuthBase:
     grant_type: str
     namespace = "keycloak"
+    credential_fields: tuple[str, ...] = ("host", "realm", "caching", "cache_key")
+    # Reused for the token requests, created on first use
+    _token_client: httpx.Client | None = None
+    _token_client_pid: int | None = None
 
     def __init__(
         self,
@@ -87,13 +105,34 @@ class KeycloakAuthBase:
     def cache_key_full(self) -> str:
         return f"{self.namespace}:{self.realm}:{self.cache_key}"
 
+    @property
+    def token_client(self) -> httpx.Client:
+        if (
+            self._token_client is None
+            or self._token_client.is_closed
+            # Inherited from the parent process, see `Ottu.request_session`
+            or self._token_client_pid != os.getpid()
+        ):
+            self._token_client = httpx.Client()
+            self._token_client_pid = os.getpid()
+        return self._token_client
+
+    def close(self) -> None:
+        if self._token_client is not None and self._token_client_pid == os.getpid():
+            self._token_client.close()
+            self._token_client = None
+
     def get_token_request_payload(self) -> dict:
         return {"grant_type": self.grant_type}
 
     def _get_token(self):
         headers = {"Content-Type": "application/x-www-form-urlencoded"}
         data = self.get_token_request_payload()
-        response = httpx.post(url=self.token_url, data=data, headers=headers)
+        response = self.token_client.post(
+            url=self.token_url,
+            data=data,
+            headers=headers,
+        )
         response.raise_for_status()
         response_json = response.json()
         access_token = response_json["access_token"]
@@ -101,12 +140,14 @@ class KeycloakAuthBase:
         return access_token, ttl
 
     def get_token_from_cache(self):
+        cache = get_cache()
         if cache is None:
             # During unittests, the `cache` is always available
             return None  # pragma: no cover
         return cache.get(self.cache_key_full)
 
     def set_token_in_cache(self, token: str, ttl: int):
+        cache = get_cache()
         if cache is None:
             # During unittests, the `cache` is always available
             return None  # pragma: no cover
@@ -130,6 +171,13 @@ class KeycloakAuthBase:
 
 class KeycloakPasswordAuth(KeycloakAuthBase, Auth):
     grant_type = "password"
+    credential_fields = (
+        *KeycloakAuthBase.credential_fields,
+        "username",
+        "password",
+        "client_id",
+        "client_secret",
+    )
 
     def __init__(
         self,
@@ -158,6 +206,11 @@ class KeycloakPasswordAuth(KeycloakAuthBase, Auth):
 
 class KeycloakClientAuth(KeycloakAuthBase, Auth):
     grant_type = "client_credentials"
+    credential_fields = (
+        *KeycloakAuthBase.credential_fields,
+        "client_id",
+        "client_secret",
+    )
 
     def __init__(self, client_id: str, client_secret: str, *args, **kwargs):
         super().__init__(*args, **kwargs)
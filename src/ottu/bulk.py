@@ -0,0 +1,434 @@
+from __future__ import annotations
+
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import typing
+from collections.abc import Callable, Collection, Iterable
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from dataclasses import asdict, dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from .enums import TxnType
+
+if typing.TYPE_CHECKING:
+    from .session import Session
+
+logger = logging.getLogger("ottu-py")
+
+REQUIRED_CHECKOUT_FIELDS = ("txn_type", "amount", "currency_code", "pg_codes")
+REQUIRED_AUTO_DEBIT_FIELDS = (
+    "txn_type",
+    "amount",
+    "currency_code",
+    "customer_id",
+    "agreement",
+)
+# Errors found before a record is validated (eg: by the CLI while parsing
+# it), the record is then reported as invalid with these errors only
+RECORD_ERRORS_FIELD = "_errors"
+# Set by `BulkAutoDebit.resolve_tokens(...)` on the records whose token could
+# not be resolved (eg: none was found), which are then reported as failed
+TOKEN_ERROR_FIELD = "_token_error"
+TOKEN_NOT_FOUND_ERROR = "Token not found in the database"
+
+
+def validate_checkout_record(
+    record: dict,
+    required_fields: Iterable[str] = REQUIRED_CHECKOUT_FIELDS,
+) -> list[str]:
+    """
+    Validates the parameters of a single `Session.create(...)` call locally,
+    without contacting Ottu. Returns the list of errors, empty if valid.
+    """
+    errors = [
+        f"`{name}` is required" for name in required_fields if not record.get(name)
+    ]
+    txn_type = record.get("txn_type")
+    if txn_type and not isinstance(txn_type, TxnType):
+        try:
+            TxnType(txn_type)
+        except ValueError:
+            errors.append(f"`txn_type` {txn_type!r} is not a valid transaction type")
+    amount = record.get("amount")
+    if amount:
+        try:
+            if Decimal(str(amount)) <= 0:
+                errors.append("`amount` must be greater than zero")
+        except InvalidOperation:
+            errors.append(f"`amount` {amount!r} is not a valid number")
+    pg_codes = record.get("pg_codes")
+    if pg_codes and not isinstance(pg_codes, (list, tuple)):
+        errors.append("`pg_codes` must be a list")
+    return errors
+
+
+def validate_auto_debit_record(record: dict) -> list[str]:
+    """
+    Validates the parameters of a single `Session.auto_debit_autoflow(...)`
+    call locally, without contacting Ottu.
+    """
+    errors = validate_checkout_record(record, REQUIRED_AUTO_DEBIT_FIELDS)
+    agreement = record.get("agreement")
+    if agreement and not (isinstance(agreement, dict) and agreement.get("id")):
+        errors.append("`agreement` must be an object with an `id`")
+    return errors
+
+
+@dataclass
+class BulkResult:
+    """
+    Outcome of a single record of `Session.bulk_create(...)`.
+    """
+
+    index: int
+    key: str
+    success: bool
+    session_id: str | None = None
+    checkout_url: str | None = None
+    checkout_short_url: str | None = None
+    status_code: int | None = None
+    errors: list | dict | None = None
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class BulkSummary:
+    """
+    Counters of a `Session.bulk_create(...)` run. In a dry run, `succeeded`
+    is the number of valid records. `results` is only filled without a sink.
+    """
+
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    invalid: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+    results: list[BulkResult] = field(default_factory=list, repr=False)
+
+    def as_dict(self) -> dict:
+        return {
+            "total": self.total,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "invalid": self.invalid,
+            "skipped": self.skipped,
+            "elapsed": self.elapsed,
+        }
+
+
+class RateLimiter:
+    """
+    Spaces calls of `acquire()` so that at most `rate` of them
+    happen per second, across all threads.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            wait_for = self._next - now
+            self._next = max(self._next, now) + self.interval
+        if wait_for > 0:
+            time.sleep(wait_for)
+
+
+class JSONLinesSink:
+    """
+    Appends every `BulkResult` as a JSON line to `path`, flushing after each
+    line so that the file can be used to resume an interrupted run.
+
+    Usage:
+        with JSONLinesSink("results.jsonl") as sink:
+            ottu.session.bulk_create(
+                records,
+                sink=sink,
+                completed=load_completed_keys("results.jsonl"),
+            )
+    """
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __call__(self, result: BulkResult) -> None:
+        self._file.write(json.dumps(result.as_dict()) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def load_completed_keys(path: str | os.PathLike) -> set[str]:
+    """
+    Returns the keys of the successful records of a previous run
+    written by `JSONLinesSink`.
+    """
+    if not os.path.exists(path):
+        return set()
+    completed = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # The last line may be truncated if the run was killed
+                continue
+            if result.get("success"):
+                completed.add(str(result["key"]))
+    return completed
+
+
+class BulkCheckout:
+    """
+    Creates checkout sessions for many records with bounded concurrency.
+
+    Records are consumed lazily, so the input can be a generator over a
+    file of any size. At most `concurrency * 2` records are held in memory.
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        concurrency: int = 8,
+        rate_limit: float | None = None,
+        key_field: str = "order_no",
+    ):
+        self.session = session
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+        self.key_field = key_field
+
+    def validate(self, record: dict) -> list[str]:
+        return record.get(RECORD_ERRORS_FIELD) or validate_checkout_record(record)
+
+    def iter_records(self, records: Iterable[dict]) -> Iterable[dict]:
+        """
+        Hook to transform the records, lazily, before they are validated.
+        """
+        return records
+
+    def get_key(self, index: int, record: dict) -> str:
+        """
+        The identity of a record, used to resume a run.
+        Defaults to `order_no`, falling back to the position in the input.
+        """
+        return str(record.get(self.key_field) or index)
+
+    def prepare(self, record: dict) -> dict:
+        record = dict(record)
+        if not isinstance(record["txn_type"], TxnType):
+            record["txn_type"] = TxnType(record["txn_type"])
+        record["amount"] = str(record["amount"])
+        return record
+
+    def create(self, index: int, key: str, record: dict) -> BulkResult:
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        try:
+            response = self.session.create(**self.prepare(record))
+        except Exception as exc:
+            logger.exception("Bulk checkout of record %s failed", key)
+            return BulkResult(index=index, key=key, success=False, errors=[str(exc)])
+        body = response["response"] or {}
+        return BulkResult(
+            index=index,
+            key=key,
+            success=response["success"],
+            session_id=body.get("session_id"),
+            checkout_url=body.get("checkout_url"),
+            checkout_short_url=body.get("checkout_short_url"),
+            status_code=response["status_code"],
+            errors=response["error"] or None,
+        )
+
+    def run(
+        self,
+        records: Iterable[dict],
+        sink: Callable[[BulkResult], None] | None = None,
+        completed: Collection[str] | None = None,
+        dry_run: bool = False,
+    ) -> BulkSummary:
+        summary = BulkSummary()
+        completed = completed or ()
+        start = time.perf_counter()
+
+        def report(result: BulkResult, invalid: bool = False) -> None:
+            if invalid:
+                summary.invalid += 1
+            elif result.success:
+                summary.succeeded += 1
+            else:
+                summary.failed += 1
+            if sink is None:
+                summary.results.append(result)
+            else:
+                sink(result)
+
+        pending: set[Future] = set()
+
+        def collect(futures: Iterable[Future]) -> None:
+            for future in futures:
+                report(future.result())
+                # Only once reported, see `finally`
+                pending.discard(future)
+
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        try:
+            for index, record in enumerate(self.iter_records(records)):
+                summary.total += 1
+                key = self.get_key(index, record)
+                if key in completed:
+                    summary.skipped += 1
+                    continue
+                errors = self.validate(record)
+                if errors or dry_run:
+                    report(
+                        BulkResult(
+                            index=index,
+                            key=key,
+                            success=not errors,
+                            errors=errors or None,
+                        ),
+                        invalid=bool(errors),
+                    )
+                    continue
+                if len(pending) >= self.concurrency * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending.add(executor.submit(self.create, index, key, record))
+            collect(as_completed(list(pending)))
+        finally:
+            # Reached early on an interruption (eg: `KeyboardInterrupt`) or a
+            # failing sink: the records not sent yet are cancelled, and the
+            # ones already sent are still reported, so that resuming the run
+            # does not create them twice.
+            executor.shutdown(cancel_futures=True)
+            for future in pending:
+                if future.cancelled():
+                    continue
+                try:
+                    report(future.result())
+                except Exception:
+                    logger.exception("Reporting a bulk result failed")
+
+        summary.elapsed = time.perf_counter() - start
+        return summary
+
+
+class BulkAutoDebit(BulkCheckout):
+    """
+    Charges many customers through `Session.auto_debit_autoflow(...)`.
+
+    The tokens of the records without a `token` are resolved
+    `token_batch_size` records at a time, with one
+    `Session.get_tokens_from_db(...)` call per batch.
+    """
+
+    def __init__(self, *args, token_batch_size: int = 500, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.token_batch_size = token_batch_size
+
+    def validate(self, record: dict) -> list[str]:
+        return record.get(RECORD_ERRORS_FIELD) or validate_auto_debit_record(record)
+
+    def iter_records(self, records: Iterable[dict]) -> Iterable[dict]:
+        iterator = iter(records)
+        while batch := list(itertools.islice(iterator, self.token_batch_size)):
+            yield from self.resolve_tokens(batch)
+
+    def resolve_tokens(self, records: list[dict]) -> list[dict]:
+        # Invalid records are reported as such by `run(...)`
+        pairs = [
+            (
+                get_token_pair(record)
+                if not record.get("token") and not self.validate(record)
+                else None
+            )
+            for record in records
+        ]
+        if not any(pairs):
+            return records
+        try:
+            tokens = self.session.get_tokens_from_db({pair for pair in pairs if pair})
+        except Exception as exc:
+            # Eg: the database is down, only the records of the batch fail
+            logger.exception("Resolving the tokens of %s records failed", len(records))
+            error = str(exc) or type(exc).__name__
+            return [
+                {**record, TOKEN_ERROR_FIELD: error} if pair else record
+                for record, pair in zip(records, pairs)
+            ]
+        return [
+            self._set_token(record, pair, tokens) if pair else record
+            for record, pair in zip(records, pairs)
+        ]
+
+    @staticmethod
+    def _set_token(
+        record: dict,
+        pair: tuple[str, str],
+        tokens: dict[tuple[str, str], str],
+    ) -> dict:
+        if pair in tokens:
+            return {**record, "token": tokens[pair]}
+        # Rather than looking it up again, one query per record
+        return {**record, TOKEN_ERROR_FIELD: TOKEN_NOT_FOUND_ERROR}
+
+    def create(self, index: int, key: str, record: dict) -> BulkResult:
+        if TOKEN_ERROR_FIELD in record:
+            return BulkResult(
+                index=index,
+                key=key,
+                success=False,
+                errors=[record[TOKEN_ERROR_FIELD]],
+            )
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        try:
+            response = self.session.auto_debit_autoflow(**self.prepare(record))
+        except Exception as exc:
+            logger.exception("Bulk auto-debit of record %s failed", key)
+            return BulkResult(index=index, key=key, success=False, errors=[str(exc)])
+        body = response["response"] or {}
+        return BulkResult(
+            index=index,
+            key=key,
+            success=response["success"],
+            session_id=body.get("session_id"),
+            status_code=response["status_code"],
+            errors=response["error"] or None,
+        )
+
+
+def get_token_pair(record: dict) -> tuple[str, str]:
+    """
+    The `(customer_id, agreement_id)` pair of an auto-debit record, as
+    accepted by `Session.get_tokens_from_db(...)`.
+    """
+    return str(record["customer_id"]), str(record["agreement"]["id"])
@@ -0,0 +1,282 @@
+"""
+Command line interface of the SDK.
+
+    python -m ottu bulk-checkout customers.csv --output results.jsonl \\
+        --merchant-id merchant.id.ottu.dev --txn-type payment_request \\
+        --currency-code KWD --pg-codes knet
+
+The API key is read from `--api-key` or the `OTTU_API_KEY` environment variable.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections.abc import Callable, Iterator
+from typing import TextIO
+
+import httpx
+
+from .auth import APIKeyAuth, BasicAuth
+from .bulk import (
+    RECORD_ERRORS_FIELD,
+    BulkResult,
+    JSONLinesSink,
+    load_completed_keys,
+)
+from .ottu import Ottu
+
+# CSV columns whose cells are comma separated lists
+CSV_LIST_FIELDS = ("pg_codes", "email_recipients")
+
+
+def parse_csv_row(row: dict[str, str]) -> dict:
+    """
+    A record from a CSV row. The cells that are not valid JSON make the
+    record invalid, see `RECORD_ERRORS_FIELD`.
+    """
+    record: dict = {}
+    errors = []
+    for name, value in row.items():
+        value = (value or "").strip()
+        if not name or not value:
+            continue
+        if name in CSV_LIST_FIELDS:
+            record[name] = [item.strip() for item in value.split(",") if item.strip()]
+        elif value[0] in "[{":
+            # Nested fields, eg: `extra` or `agreement`, as JSON
+            try:
+                record[name] = json.loads(value)
+            except ValueError as exc:
+                errors.append(f"`{name}` is not valid JSON: {exc}")
+        else:
+            record[name] = value
+    if errors:
+        record[RECORD_ERRORS_FIELD] = errors
+    return record
+
+
+def parse_json_line(line: str) -> dict:
+    """
+    A record from a JSONL line, an invalid one if the line is not a JSON
+    object.
+    """
+    try:
+        record = json.loads(line)
+    except ValueError as exc:
+        return {RECORD_ERRORS_FIELD: [f"Not valid JSON: {exc}"]}
+    if not isinstance(record, dict):
+        return {RECORD_ERRORS_FIELD: ["Not a JSON object"]}
+    return record
+
+
+def read_records(
+    file: TextIO,
+    input_format: str,
+    defaults: dict,
+) -> Iterator[dict]:
+    if input_format == "csv":
+        rows = (parse_csv_row(row) for row in csv.DictReader(file))
+    else:
+        rows = (parse_json_line(line) for line in file if line.strip())
+    for row in rows:
+        yield {**defaults, **row}
+
+
+def count_records(path: str, input_format: str) -> int | None:
+    if path == "-":
+        return None
+    with open(path, encoding="utf-8") as f:
+        count = sum(1 for line in f if line.strip())
+    # Header line
+    return count - 1 if input_format == "csv" else count
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}"
+
+
+class ProgressSink:
+    """
+    Forwards the results to `sink` and prints the throughput and the ETA
+    to `stream` at most once every `interval` seconds.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[BulkResult], None],
+        total: int | None,
+        stream: TextIO,
+        interval: float = 1.0,
+    ):
+        self.sink = sink
+        self.total = total
+        self.stream = stream
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.start = time.perf_counter()
+        self._last_print = 0.0
+
+    def __call__(self, result: BulkResult) -> None:
+        self.done += 1
+        if not result.success:
+            self.failed += 1
+        self.sink(result)
+        now = time.perf_counter()
+        if now - self._last_print >= self.interval:
+            self._last_print = now
+            self.print_progress(now)
+
+    def print_progress(self, now: float | None = None) -> None:
+        elapsed = (now or time.perf_counter()) - self.start
+        rate = self.done / elapsed if elapsed else 0.0
+        line = f"{self.done}"
+        if self.total:
+            line += f"/{self.total}"
+        line += f" records, {self.failed} failed, {rate:.1f}/s"
+        if self.total and rate:
+            remaining = max(self.total - self.done, 0) / rate
+            line += f", ETA {format_duration(remaining)}"
+        self.stream.write(line + "\n")
+        self.stream.flush()
+
+
+class StdoutSink:
+    def __call__(self, result: BulkResult) -> None:
+        sys.stdout.write(json.dumps(result.as_dict()) + "\n")
+
+
+class InvalidRecordsPrinter:
+    """
+    Reports the invalid records of a dry run.
+    """
+
+    def __call__(self, result: BulkResult) -> None:
+        if not result.success:
+            sys.stdout.write(json.dumps(result.as_dict()) + "\n")
+
+
+def get_auth(args: argparse.Namespace):
+    if args.api_key:
+        return APIKeyAuth(args.api_key)
+    if args.username and args.password:
+        return BasicAuth(username=args.username, password=args.password)
+    return None
+
+
+def bulk_checkout(args: argparse.Namespace) -> int:
+    input_format = args.format or ("csv" if args.input.endswith(".csv") else "jsonl")
+    defaults = {
+        "txn_type": args.txn_type,
+        "currency_code": args.currency_code,
+        "pg_codes": args.pg_codes,
+    }
+    defaults = {name: value for name, value in defaults.items() if value}
+
+    auth = get_auth(args)
+    if auth is None and not args.dry_run:
+        sys.stderr.write(
+            "Missing credentials: use --api-key (or OTTU_API_KEY) "
+            "or --username and --password\n",
+        )
+        return 2
+    ottu = Ottu(
+        merchant_id=args.merchant_id or "",
+        # Nothing is sent in a dry run
+        auth=auth or httpx.Auth(),
+        is_sandbox=not args.production,
+    )
+
+    sink: Callable[[BulkResult], None]
+    completed: set[str] = set()
+    if args.dry_run:
+        sink = InvalidRecordsPrinter()
+    elif args.output:
+        completed = load_completed_keys(args.output)
+        sink = JSONLinesSink(args.output)
+    else:
+        sink = StdoutSink()
+    total = count_records(args.input, input_format)
+    if total is not None:
+        total = max(total - len(completed), 0)
+    progress = ProgressSink(sink=sink, total=total, stream=sys.stderr)
+    file = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        summary = ottu.session.bulk_create(
+            read_records(file, input_format=input_format, defaults=defaults),
+            sink=progress,
+            concurrency=args.concurrency,
+            rate_limit=args.rate_limit,
+            completed=completed,
+            key_field=args.key_field,
+            dry_run=args.dry_run,
+        )
+    finally:
+        if file is not sys.stdin:
+            file.close()
+        if isinstance(sink, JSONLinesSink):
+            sink.close()
+
+    progress.print_progress()
+    sys.stderr.write(json.dumps(summary.as_dict()) + "\n")
+    return 1 if summary.failed or summary.invalid else 0
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m ottu")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bulk = commands.add_parser(
+        "bulk-checkout",
+        help="Create a checkout session for every record of a CSV or JSONL file.",
+    )
+    bulk.add_argument("input", help="CSV or JSONL file, `-` for stdin (JSONL).")
+    bulk.add_argument("--format", choices=["csv", "jsonl"])
+    bulk.add_argument(
+        "--output",
+        "-o",
+        help="JSONL file the results are appended to. Records that already "
+        "succeeded in this file are skipped, so a run can be resumed. "
+        "Defaults to stdout.",
+    )
+    bulk.add_argument("--merchant-id", default=os.environ.get("OTTU_MERCHANT_ID"))
+    bulk.add_argument("--api-key", default=os.environ.get("OTTU_API_KEY"))
+    bulk.add_argument("--username", default=os.environ.get("OTTU_USERNAME"))
+    bulk.add_argument("--password", default=os.environ.get("OTTU_PASSWORD"))
+    bulk.add_argument("--production", action="store_true")
+    bulk.add_argument("--txn-type", help="Default `txn_type` of the records.")
+    bulk.add_argument("--currency-code", help="Default `currency_code`.")
+    bulk.add_argument(
+        "--pg-codes",
+        type=lambda value: [code for code in value.split(",") if code],
+        help="Default `pg_codes`, comma separated.",
+    )
+    bulk.add_argument("--key-field", default="order_no")
+    bulk.add_argument("--concurrency", type=int, default=8)
+    bulk.add_argument(
+        "--rate-limit",
+        type=float,
+        help="Maximum number of requests per second.",
+    )
+    bulk.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only validate the records and print the invalid ones.",
+    )
+    bulk.set_defaults(func=bulk_checkout)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = get_parser().parse_args(argv)
+    if not args.merchant_id and not args.dry_run:
+        sys.stderr.write("Missing --merchant-id (or OTTU_MERCHANT_ID)\n")
+        return 2
+    return args.func(args)
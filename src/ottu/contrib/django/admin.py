@@ -1,12 +1,106 @@
 from __future__ import annotations
 
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
 
-from .models import Checkout, Webhook
+from . import conf
+from .models import Checkout, Token, Webhook
+
+
+def estimate_count(model, using: str = "default") -> int | None:
+    """
+    The row count of the table of `model` estimated by the database, from its
+    statistics. `None` when the database does not provide one.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == "postgresql":
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)"
+        params = [connection.ops.quote_name(table)]
+    elif connection.vendor == "mysql":
+        sql = (
+            "SELECT table_rows FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = %s"
+        )
+        params = [table]
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    # PostgreSQL returns -1 for a table that was never analyzed
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts the unfiltered changelist with `estimate_count(...)` instead of a
+    `COUNT(*)` over the whole table, once the table has more than `threshold`
+    rows. Filtered and searched changelists are counted exactly.
+    """
+
+    threshold = 10_000
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.has_filters():
+            estimate = estimate_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.threshold:
+                return estimate
+        return super().count
+
+
+class ProjectedChangeList(ChangeList):
+    """
+    Loads only the columns of `list_display`, when they are all model fields,
+    eg: not the JSON payloads.
+    """
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        fields = self.get_only_fields()
+        return queryset.only(*fields) if fields else queryset
+
+    def get_only_fields(self) -> list[str]:
+        concrete_fields = {field.name for field in self.opts.concrete_fields}
+        names = [name for name in self.list_display if name != "action_checkbox"]
+        if not set(names) <= concrete_fields:
+            return []
+        if self.date_hierarchy:
+            names.append(self.date_hierarchy)
+        return [self.opts.pk.name, *names]
+
+
+class OttuModelAdmin(admin.ModelAdmin):
+    """
+    Keeps the changelist of large tables responsive: no full table count,
+    only the displayed columns, and searches on indexed columns only (unless
+    `OTTU_ADMIN_FULL_SEARCH` is set, see `full_search_fields`).
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # The former search, over columns that are not indexed
+    full_search_fields: tuple[str, ...] = ()
+
+    def get_changelist(self, request, **kwargs):
+        return ProjectedChangeList
+
+    def get_search_fields(self, request):
+        if conf.ADMIN_FULL_SEARCH and self.full_search_fields:
+            return self.full_search_fields
+        return super().get_search_fields(request)
 
 
 @admin.register(Checkout)
-class CheckoutAdmin(admin.ModelAdmin):
+class CheckoutAdmin(OttuModelAdmin):
     list_display = (
         "session_id",
         "type",
@@ -16,7 +110,12 @@ class CheckoutAdmin(admin.ModelAdmin):
         "state",
         "customer_id",
     )
+    # Served by the primary key and `ottu_checkout_token_idx`
     search_fields = (
+        "session_id__startswith",
+        "customer_id__exact",
+    )
+    full_search_fields = (
         "session_id",
         "type",
         "payment_type",
@@ -29,16 +128,45 @@ class CheckoutAdmin(admin.ModelAdmin):
     )
     list_filter = ["state"]
     ordering = ["-created_at"]
+    date_hierarchy = "created_at"
 
 
 @admin.register(Webhook)
-class WebhookAdmin(admin.ModelAdmin):
+class WebhookAdmin(OttuModelAdmin):
     list_display = (
         "id",
         "session_id",
         "timestamp",
     )
-    search_fields = (
+    # Served by `ottu_webhook_session_idx`
+    search_fields = ("session_id__exact",)
+    full_search_fields = (
         "session_id",
         "payload",
     )
+    ordering = ["-timestamp"]
+    date_hierarchy = "timestamp"
+    # Not a `<select>` of every checkout
+    raw_id_fields = ["checkout"]
+
+
+class TokenAdmin(OttuModelAdmin):
+    list_display = (
+        "customer_id",
+        "agreement_id",
+        "pg_code",
+        "state",
+        "last_used",
+    )
+    # Served by `ottu_token_customer_agreement_uniq`
+    search_fields = ("customer_id__exact",)
+    full_search_fields = (
+        "customer_id",
+        "agreement_id",
+    )
+    list_filter = ["state"]
+
+
+# The vault is optional, see `OTTU_ABSTRACT_TOKEN_MODEL`
+if not Token._meta.abstract:
+    admin.site.register(Token, TokenAdmin)
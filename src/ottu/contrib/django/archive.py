@@ -0,0 +1,87 @@
+"""
+Archiving of the old `Webhook` rows, see the `ottu_archive_webhooks`
+management command.
+
+The rows are written to gzip compressed JSON Lines files, one gzip member per
+batch (`gzip`, `zcat` and `gzip.open(...)` read the concatenated members as
+one file), and a batch is deleted only once its member is on disk.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+# Columns of the archived rows
+ARCHIVE_FIELDS = ("id", "session_id", "checkout_id", "payload", "timestamp")
+
+
+@dataclass
+class ArchiveSummary:
+    """
+    Outcome of an `archive_webhooks(...)` run. `path` is `None` when the rows
+    were only deleted, or when there was nothing to archive.
+    """
+
+    rows: int = 0
+    batches: int = 0
+    path: Path | None = None
+
+
+def get_archive_path(directory: str | os.PathLike, before: datetime) -> Path:
+    now = timezone.now()
+    return Path(directory) / (
+        f"webhooks-before-{before:%Y%m%dT%H%M%S}-at-{now:%Y%m%dT%H%M%S}.jsonl.gz"
+    )
+
+
+def archive_webhooks(
+    model,
+    before: datetime,
+    directory: str | os.PathLike | None = None,
+    batch_size: int = 1000,
+) -> ArchiveSummary:
+    """
+    Moves the rows of `model` older than `before` to a new file of `directory`,
+    `batch_size` rows at a time, and returns what was done. `directory` is
+    created if needed. Without it, the rows are deleted without being archived.
+
+    An interrupted run leaves a valid file (the last member may be truncated,
+    its rows are not deleted), and can be run again.
+    """
+    summary = ArchiveSummary()
+    queryset = model.objects.filter(timestamp__lt=before).order_by("pk")
+    path = get_archive_path(directory, before) if directory else None
+    if path is not None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    last_pk = None
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(batch.values(*ARCHIVE_FIELDS)[:batch_size])
+        if not rows:
+            break
+        if path is not None:
+            _write_member(path, rows)
+            summary.path = path
+        model.objects.filter(pk__in=[row["id"] for row in rows]).delete()
+        last_pk = rows[-1]["id"]
+        summary.rows += len(rows)
+        summary.batches += 1
+    return summary
+
+
+def _write_member(path: Path, rows: list[dict]) -> None:
+    lines = b"".join(
+        json.dumps(row, cls=DjangoJSONEncoder).encode() + b"\n" for row in rows
+    )
+    with open(path, "ab") as file:
+        file.write(gzip.compress(lines))
+        file.flush()
+        os.fsync(file.fileno())
@@ -11,10 +11,53 @@ AUTH: dict = getattr(settings, "OTTU_AUTH")
 # Abstract models
 ABSTRACT_CHECKOUT_MODEL: bool = getattr(settings, "OTTU_ABSTRACT_CHECKOUT_MODEL", False)
 ABSTRACT_WEBHOOK_MODEL: bool = getattr(settings, "OTTU_ABSTRACT_WEBHOOK_MODEL", False)
+ABSTRACT_TOKEN_MODEL: bool = getattr(settings, "OTTU_ABSTRACT_TOKEN_MODEL", False)
+
+# Token vault
+# Seconds a token is cached in-process. `0` disables the cache.
+TOKEN_CACHE_TTL: float = getattr(settings, "OTTU_TOKEN_CACHE_TTL", 60)
+TOKEN_CACHE_SIZE: int = getattr(settings, "OTTU_TOKEN_CACHE_SIZE", 10_000)
 
 # Webhook
 WEBHOOK_KEY: str = getattr(settings, "OTTU_WEBHOOK_KEY", "")
 WEBHOOK_URL: str = getattr(settings, "OTTU_WEBHOOK_URL", "")
+# Maximum accepted webhook body size in bytes. `None` disables the check.
+WEBHOOK_MAX_BODY_SIZE: int | None = getattr(
+    settings,
+    "OTTU_WEBHOOK_MAX_BODY_SIZE",
+    1024 * 1024,
+)
+# Default age in days of the webhooks archived by `ottu_archive_webhooks`
+WEBHOOK_RETENTION_DAYS: int = getattr(settings, "OTTU_WEBHOOK_RETENTION_DAYS", 90)
+# Default directory of the archives of `ottu_archive_webhooks`
+WEBHOOK_ARCHIVE_DIR: str = getattr(settings, "OTTU_WEBHOOK_ARCHIVE_DIR", "")
+
+# Write-behind persistence of the checkout sessions
+WRITE_BEHIND: bool = getattr(settings, "OTTU_WRITE_BEHIND", False)
+# Seconds between two flushes of the buffer
+WRITE_BEHIND_INTERVAL: float = getattr(settings, "OTTU_WRITE_BEHIND_INTERVAL", 1.0)
+# Number of buffered sessions that triggers a flush
+WRITE_BEHIND_BATCH_SIZE: int = getattr(settings, "OTTU_WRITE_BEHIND_BATCH_SIZE", 100)
+# Beyond this number of buffered sessions, sessions are saved right away
+WRITE_BEHIND_MAX_PENDING: int = getattr(
+    settings,
+    "OTTU_WRITE_BEHIND_MAX_PENDING",
+    10_000,
+)
+# Directory of the journals of the buffered sessions, replayed after a crash.
+# Empty disables the journals.
+WRITE_BEHIND_JOURNAL_DIR: str = getattr(settings, "OTTU_WRITE_BEHIND_JOURNAL_DIR", "")
+
+# States of the checkouts checked by `ottu_reconcile_checkouts`
+RECONCILE_STATES: tuple[str, ...] = getattr(
+    settings,
+    "OTTU_RECONCILE_STATES",
+    ("created", "pending", "attempted", "authorized"),
+)
+
+# Admin
+# Search the admin changelists on every column, rather than on indexed ones only
+ADMIN_FULL_SEARCH: bool = getattr(settings, "OTTU_ADMIN_FULL_SEARCH", False)
 
 # Misc
 IS_SANDBOX: bool = getattr(settings, "OTTU_IS_SANDBOX", False)
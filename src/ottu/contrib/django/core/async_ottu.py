@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from contextvars import ContextVar
+from functools import partial
+from typing import cast
+
+from django.utils.functional import SimpleLazyObject
+
+from ....async_ottu import OttuAsync as _OttuAsync
+from ....errors import APIInterruptError
+from ....session import Session as _Session
+from .ottu import Ottu, _generate_instance
+from .session import Session
+
+# The sessions to save once the current `OttuAsync` call returns
+_pending_sessions: ContextVar[list[_Session] | None] = ContextVar(
+    "ottu_pending_sessions",
+    default=None,
+)
+
+
+class DeferredOttu(Ottu):
+    """
+    The `Ottu` of `OttuAsync`. During a call of `OttuAsync`, the sessions are
+    handed back to it instead of being saved from the worker thread.
+    """
+
+    def _create_or_update_dj_session(self, session: _Session | None = None):
+        pending = _pending_sessions.get()
+        if pending is None:
+            return super()._create_or_update_dj_session(session)
+        pending.append(session or self.session)
+
+
+class OttuAsync(_OttuAsync):
+    """
+    The `OttuAsync` of the Django contrib. The API calls still run in a
+    worker thread, but the checkout sessions are saved, and the tokens of
+    `auto_debit_autoflow(...)` are looked up, with the async ORM of Django.
+    """
+
+    ottu_cls = DeferredOttu
+    _ottu: DeferredOttu
+
+    async def _call_sync(self, func, *args, **kwargs):
+        pending = []
+        reset_token = _pending_sessions.set(pending)
+        try:
+            return await super()._call_sync(func, *args, **kwargs)
+        finally:
+            _pending_sessions.reset(reset_token)
+            # Once per session, in order
+            for session in {id(session): session for session in pending}.values():
+                await self._ottu.acreate_or_update_dj_session(session)
+
+    async def auto_debit_autoflow(self, **kwargs):
+        if not kwargs.get("token"):
+            session = cast(Session, self._ottu._stateless_session)
+            try:
+                kwargs["token"] = await session.aget_token_from_db(
+                    agreement=kwargs.get("agreement") or {},
+                    customer_id=kwargs.get("customer_id"),
+                )
+            except APIInterruptError as e:
+                # Like `interruption_handler`
+                return e.as_dict()
+        return await super().auto_debit_autoflow(**kwargs)
+
+
+# Built on first use, like `ottu.contrib.django.core.ottu.ottu`
+ottu_async = cast(OttuAsync, SimpleLazyObject(partial(_generate_instance, OttuAsync)))
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from ....cards import Card as _Card
+from ....request import OttuPYResponse
+from ..models import Token
+
+
+class Card(_Card):
+    """
+    Keeps the token vault (`Token`) in sync with the cards returned by, and
+    deleted through, the API.
+    """
+
+    def _get_cards(
+        self,
+        customer_id: str | None = None,
+        pg_codes: list[str] | None = None,
+        agreement_id: str | None = None,
+    ) -> OttuPYResponse:
+        ottu_py_response = super()._get_cards(
+            customer_id=customer_id,
+            pg_codes=pg_codes,
+            agreement_id=agreement_id,
+        )
+        if (
+            ottu_py_response.success
+            and isinstance(ottu_py_response.response, list)
+            and not Token._meta.abstract
+        ):
+            Token.update_from_cards(ottu_py_response.response)
+        return ottu_py_response
+
+    def delete(
+        self,
+        token: str,
+        customer_id: str | None = None,
+    ) -> dict:
+        customer_id = customer_id or self.ottu.customer_id
+        response = super().delete(token=token, customer_id=customer_id)
+        if response["success"] and customer_id and not Token._meta.abstract:
+            Token.delete_token(customer_id=customer_id, token=token)
+        return response
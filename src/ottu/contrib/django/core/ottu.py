@@ -1,36 +1,167 @@
 from __future__ import annotations
 
+from functools import partial
+from typing import cast
+
 from django.core.exceptions import ImproperlyConfigured
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from django.utils.module_loading import import_string
 
 from ....ottu import Ottu as _Ottu
+from ....session import Session as _Session
 from .. import conf
 from ..models import Checkout
+from .cards import Card
 from .session import Session
+from .writer import (
+    CheckoutWriter,
+    aupsert_checkouts,
+    get_checkout_writer,
+    upsert_checkouts,
+)
 
 
 class Ottu(_Ottu):
     model = Checkout
     session_cls = Session
+    card_cls = Card
+
+    def __init__(
+        self,
+        *args,
+        checkout_writer: CheckoutWriter | None = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        if checkout_writer is None and conf.WRITE_BEHIND:
+            checkout_writer = get_checkout_writer()
+        # Saves the sessions in the background instead of on every API call
+        self.checkout_writer = checkout_writer
 
-    def get_or_create_session(self):
+    def get_or_create_session(self, session: _Session | None = None):
+        session = session or self.session
         instance, _ = self.model.objects.get_or_create(
-            session_id=self.session.session_id,
+            session_id=session.session_id,
+        )
+        return instance
+
+    async def aget_or_create_session(self, session: _Session | None = None):
+        session = session or self.session
+        instance, _ = await self.model.objects.aget_or_create(
+            session_id=session.session_id,
         )
         return instance
 
-    def _create_or_update_dj_session(self):
-        session_obj = self.get_or_create_session()
-        for field, value in self.session.as_dict().items():
-            setattr(session_obj, field, value)
-        session_obj.save()
+    def get_session_snapshot(self, session: _Session) -> dict:
+        """
+        The values of the model fields of `session`, as saved to its row.
+        """
+        data = session.as_dict()
+        return {
+            field.name: data[field.name]
+            for field in self.model._meta.concrete_fields
+            if field.editable and not field.primary_key and field.name in data
+        }
+
+    def _create_or_update_dj_session(self, session: _Session | None = None):
+        # `session` is passed explicitly since `self.session` may already be
+        # replaced by a concurrent call, eg: in `bulk_create(...)`.
+        session = session or self.session
+        snapshot, changed = self._get_session_changes(session)
+        if changed is not None and not changed:
+            return
+        using = router.db_for_write(self.model)
+        if self.checkout_writer is not None:
+            # Buffered once committed, like a synchronous write would be
+            transaction.on_commit(
+                partial(
+                    self.checkout_writer.add,
+                    session,
+                    snapshot,
+                    taken_at=timezone.now(),
+                ),
+                using=using,
+            )
+            return
+        if changed is None or not self._update_dj_session(
+            session.session_id,
+            changed,
+        ):
+            self._upsert_dj_session(session.session_id, snapshot)
+
+        def remember():
+            session._saved_snapshot = snapshot
+
+        # Once committed, so that a rolled back write is not skipped next time
+        transaction.on_commit(remember, using=using)
+
+    async def acreate_or_update_dj_session(self, session: _Session | None = None):
+        """
+        Async version of `_create_or_update_dj_session(...)`, see `OttuAsync`.
+        """
+        session = session or self.session
+        snapshot, changed = self._get_session_changes(session)
+        if changed is not None and not changed:
+            return
+        if self.checkout_writer is not None:
+            self.checkout_writer.add(session, snapshot)
+            return
+        if changed is None or not await self._aupdate_dj_session(
+            session.session_id,
+            changed,
+        ):
+            await aupsert_checkouts(self.model, {session.session_id: snapshot})
+        # The async queries run in autocommit mode, the write is committed
+        session._saved_snapshot = snapshot  # type: ignore[union-attr]
+
+    def _get_session_changes(self, session: _Session) -> tuple[dict, dict | None]:
+        """
+        Returns the snapshot of `session`, and the values that changed since
+        this process last saved it (`None` if it did not).
+        """
+        snapshot = self.get_session_snapshot(session)
+        saved = getattr(session, "_saved_snapshot", None)
+        if saved is None:
+            return snapshot, None
+        changed = {
+            field: value
+            for field, value in snapshot.items()
+            if field not in saved or saved[field] != value
+        }
+        return snapshot, changed
 
-    def _update_session(self, session: Session):  # type: ignore[override]
+    def _get_update_values(self, values: dict) -> dict:
+        values = {**values, "updated_at": timezone.now()}
+        if "agreement" in values:
+            values["agreement_id"] = self.model.get_agreement_id(values["agreement"])
+        return values
+
+    def _update_dj_session(self, session_id: str | None, values: dict) -> bool:
+        """
+        Updates the given columns only, returns whether the row exists.
+        """
+        queryset = self.model.objects.filter(pk=session_id)
+        return bool(queryset.update(**self._get_update_values(values)))
+
+    async def _aupdate_dj_session(self, session_id: str | None, values: dict) -> bool:
+        queryset = self.model.objects.filter(pk=session_id)
+        return bool(await queryset.aupdate(**self._get_update_values(values)))
+
+    def _upsert_dj_session(self, session_id: str | None, values: dict) -> None:
+        upsert_checkouts(self.model, {session_id: values})
+
+    def _set_session_data(self, data: dict) -> None:
+        # The checkout is saved right away, so `lazy_sessions` has no effect
+        self._update_session(self._get_or_update_session(data))
+
+    def _update_session(self, session: _Session) -> None:
         super()._update_session(session)
-        self._create_or_update_dj_session()
+        self._create_or_update_dj_session(session)
 
 
-def _generate_instance():
+def _generate_instance(ottu_cls=Ottu):
     try:
         auth_conf = conf.AUTH.copy()
         auth_cls = import_string(auth_conf["class"])
@@ -46,11 +177,29 @@ def _generate_instance():
         raise ImproperlyConfigured("The 'class' key is not a valid import path")
     auth_conf.pop("class")
     auth_instance = auth_cls(**auth_conf)
-    return Ottu(
+    return ottu_cls(
         merchant_id=conf.MERCHANT_ID,
         auth=auth_instance,
         is_sandbox=conf.IS_SANDBOX,
     )
 
 
-ottu = _generate_instance()
+# Built on first use rather than at import time, so that importing this
+# module (eg: from `urls.py`) neither reads the `OTTU_*` settings nor opens
+# a connection pool in processes that never talk to Ottu.
+ottu = cast(Ottu, SimpleLazyObject(_generate_instance))
+
+
+def init_worker(**kwargs) -> None:
+    """
+    Builds `ottu` and prepares its connection pool in a freshly forked worker
+    process, ahead of its first task. Both happen anyway on first use, this
+    only moves that cost out of the task.
+
+    Usage, for prefork Celery workers:
+        from celery.signals import worker_process_init
+        from ottu.contrib.django.core.ottu import init_worker
+
+        worker_process_init.connect(init_worker)
+    """
+    ottu.request_session
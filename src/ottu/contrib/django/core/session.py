@@ -1,12 +1,18 @@
 from __future__ import annotations
 
+from collections.abc import Iterable
+
 from ....errors import APIInterruptError
 from ....session import Session as _Session
 from .. import conf
-from ..models import Checkout
+from ..models import TOKEN_BATCH_SIZE, Checkout, Token
 
 
 class Session(_Session):
+    # The values last saved to the checkout row by this process,
+    # see `Ottu._create_or_update_dj_session(...)`
+    _saved_snapshot: dict | None = None
+
     def create(self, *args, **kwargs):
         if conf.WEBHOOK_URL and not kwargs.get("webhook_url"):
             kwargs["webhook_url"] = conf.WEBHOOK_URL
@@ -14,18 +20,129 @@ class Session(_Session):
 
     def get_token_from_db(self, agreement, customer_id) -> str:
         """
-        Get the token from the database
+        Get the token of the customer for the agreement from the token vault
+        (`Token`). Tokens that are not in the vault yet are looked up in the
+        most recent checkouts, and saved to the vault. A token that is deleted
+        or expired in the vault is never used.
+        """
+        agreement_id = str(agreement.get("id") or "")
+        token = None
+        if agreement_id:
+            known = False
+            if not Token._meta.abstract:
+                known, token = Token.lookup_token(customer_id, agreement_id)
+            if not known:
+                token = self._get_token_from_checkouts(customer_id, agreement_id)
+        if token:
+            return token
+        raise self._token_not_found()
+
+    async def aget_token_from_db(self, agreement, customer_id) -> str:
         """
-        instance = Checkout.objects.filter(
-            customer_id=customer_id,
-            agreement__id=agreement.get("id"),
-        ).first()
-        if instance:
-            return instance.token
-        raise APIInterruptError(
+        Async version of `get_token_from_db(...)`.
+        """
+        agreement_id = str(agreement.get("id") or "")
+        token = None
+        if agreement_id:
+            known = False
+            if not Token._meta.abstract:
+                known, token = await Token.alookup_token(customer_id, agreement_id)
+            if not known:
+                token = await self._aget_token_from_checkouts(
+                    customer_id,
+                    agreement_id,
+                )
+        if token:
+            return token
+        raise self._token_not_found()
+
+    @staticmethod
+    def _token_not_found() -> APIInterruptError:
+        return APIInterruptError(
             success=False,
             status_code=400,
             endpoint="",
             response={},
             error={"detail": "Token not found in the database"},
         )
+
+    def get_tokens_from_db(
+        self,
+        pairs: Iterable[tuple[str, str]],
+    ) -> dict[tuple[str, str], str]:
+        """
+        Batched `get_token_from_db(...)`: the tokens of all the pairs are read
+        from the vault at once, then the missing ones from the checkouts.
+        """
+        requested = {
+            (str(customer_id), str(agreement_id))
+            for customer_id, agreement_id in pairs
+            if agreement_id
+        }
+        tokens: dict[tuple[str, str], str] = {}
+        known: set[tuple[str, str]] = set()
+        if not Token._meta.abstract:
+            tokens, known = Token.lookup_tokens(requested)
+        # Only the pairs that the vault does not have in any state
+        missing = requested - known
+        if missing:
+            tokens.update(self._get_tokens_from_checkouts(missing))
+        return tokens
+
+    def _get_tokens_from_checkouts(
+        self,
+        pairs: set[tuple[str, str]],
+    ) -> dict[tuple[str, str], str]:
+        tokens: dict[tuple[str, str], str] = {}
+        pair_list = list(pairs)
+        for start in range(0, len(pair_list), TOKEN_BATCH_SIZE):
+            batch = set(pair_list[start : start + TOKEN_BATCH_SIZE])
+            rows = (
+                Checkout.objects.filter(
+                    customer_id__in={customer_id for customer_id, _ in batch},
+                    agreement_id__in={agreement_id for _, agreement_id in batch},
+                )
+                .exclude(token="")
+                # The first row of every pair is its most recent
+                .order_by("customer_id", "agreement_id", "-created_at")
+                .values_list("customer_id", "agreement_id", "token")
+            )
+            for customer_id, agreement_id, token in rows:
+                pair = (customer_id, agreement_id)
+                if pair in batch and pair not in tokens:
+                    tokens[pair] = token
+        if tokens and not Token._meta.abstract:
+            # Unless the pairs were added to the vault meanwhile
+            tokens = Token.add_tokens(tokens)
+        return tokens
+
+    def _get_token_from_checkouts(
+        self,
+        customer_id: str,
+        agreement_id: str,
+    ) -> str | None:
+        token = self._get_checkout_tokens(customer_id, agreement_id).first()
+        if token and not Token._meta.abstract:
+            # Unless the pair was added to the vault meanwhile
+            token = Token.add_token(customer_id, agreement_id, token)
+        return token
+
+    async def _aget_token_from_checkouts(
+        self,
+        customer_id: str,
+        agreement_id: str,
+    ) -> str | None:
+        token = await self._get_checkout_tokens(customer_id, agreement_id).afirst()
+        if token and not Token._meta.abstract:
+            token = await Token.aadd_token(customer_id, agreement_id, token)
+        return token
+
+    @staticmethod
+    def _get_checkout_tokens(customer_id: str, agreement_id: str):
+        # Served by the `ottu_checkout_token_idx` index
+        return (
+            Checkout.objects.filter(customer_id=customer_id, agreement_id=agreement_id)
+            .exclude(token="")
+            .order_by("-created_at")
+            .values_list("token", flat=True)
+        )
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+
+from .. import conf
+
+
+class TokenCache:
+    """
+    In-process cache of the active tokens, by `(customer_id, agreement_id)`.
+
+    Entries expire after `ttl` seconds, which bounds how long a token that was
+    replaced or deleted by another process may still be served. Writes made
+    through the `Token` model in this process invalidate their entry right
+    away. At most `max_size` entries are kept (least recently used first).
+    """
+
+    def __init__(self, ttl: float = 60, max_size: int = 10_000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[str, str], tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, customer_id: str, agreement_id: str) -> str | None:
+        key = (customer_id, agreement_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, customer_id: str, agreement_id: str, token: str) -> None:
+        if not self.ttl or not self.max_size:
+            return
+        key = (customer_id, agreement_id)
+        with self._lock:
+            self._entries[key] = (token, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, customer_id: str, agreement_id: str) -> None:
+        with self._lock:
+            self._entries.pop((customer_id, agreement_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+token_cache = TokenCache(ttl=conf.TOKEN_CACHE_TTL, max_size=conf.TOKEN_CACHE_SIZE)
@@ -0,0 +1,506 @@
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import threading
+import uuid
+import weakref
+from collections.abc import Mapping
+from datetime import datetime
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connections, router, transaction
+from django.utils import timezone
+
+from .. import conf
+from ..models import Checkout
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger("ottu-py")
+
+
+def _group_checkouts(
+    model,
+    snapshots: Mapping[str | None, dict],
+) -> dict[tuple[str, ...], list]:
+    # Rows are grouped by their fields, so that a missing value is never
+    # overwritten with the default of the field
+    groups: dict[tuple[str, ...], list] = {}
+    for session_id, values in snapshots.items():
+        instance = model(session_id=session_id, **values)
+        instance.agreement_id = model.get_agreement_id(instance.agreement)
+        groups.setdefault(tuple(sorted(values)), []).append(instance)
+    return groups
+
+
+def _get_update_fields(fields: tuple[str, ...]) -> list[str]:
+    update_fields = [*fields, "updated_at"]
+    if "agreement" in fields:
+        update_fields.append("agreement_id")
+    return update_fields
+
+
+def _get_upsert_kwargs(features, fields: tuple[str, ...]) -> dict | None:
+    """
+    The `bulk_create(...)` arguments of an upsert of `fields`, `None` if the
+    database does not support it.
+    """
+    update_fields = _get_update_fields(fields)
+    if features.supports_update_conflicts_with_target:
+        return {
+            "update_conflicts": True,
+            "unique_fields": ["session_id"],
+            "update_fields": update_fields,
+        }
+    if features.supports_update_conflicts:
+        # MySQL, which does not accept `unique_fields`
+        return {"update_conflicts": True, "update_fields": update_fields}
+    return None
+
+
+def upsert_checkouts(model, snapshots: Mapping[str | None, dict]) -> None:
+    """
+    Creates or updates the rows of many sessions (`{session_id: values}`)
+    with one `INSERT ... ON CONFLICT` per set of fields, where the database
+    supports it.
+    """
+    using = router.db_for_write(model)
+    features = connections[using].features
+    for fields, instances in _group_checkouts(model, snapshots).items():
+        upsert_kwargs = _get_upsert_kwargs(features, fields)
+        if upsert_kwargs is not None:
+            model.objects.using(using).bulk_create(instances, **upsert_kwargs)
+            continue
+        for instance in instances:
+            model.objects.using(using).update_or_create(
+                session_id=instance.session_id,
+                defaults={field: getattr(instance, field) for field in fields},
+            )
+
+
+async def aupsert_checkouts(model, snapshots: Mapping[str | None, dict]) -> None:
+    """
+    Async version of `upsert_checkouts(...)`.
+    """
+    using = router.db_for_write(model)
+    features = connections[using].features
+    for fields, instances in _group_checkouts(model, snapshots).items():
+        upsert_kwargs = _get_upsert_kwargs(features, fields)
+        if upsert_kwargs is not None:
+            await model.objects.using(using).abulk_create(instances, **upsert_kwargs)
+            continue
+        for instance in instances:
+            await model.objects.using(using).aupdate_or_create(
+                session_id=instance.session_id,
+                defaults={field: getattr(instance, field) for field in fields},
+            )
+
+
+def write_checkouts(
+    model,
+    entries: Mapping[str, tuple[datetime, dict]],
+) -> set[str]:
+    """
+    Creates or updates the rows of many sessions from snapshots taken at a
+    known time (`{session_id: (taken_at, values)}`). A row updated after its
+    snapshot was taken, eg: by a webhook, is left as is.
+
+    Returns the IDs of the sessions that were written.
+    """
+    using = router.db_for_write(model)
+    queryset = model.objects.using(using)
+    with transaction.atomic(using=using):
+        updated_at = dict(
+            queryset.select_for_update()
+            .filter(pk__in=list(entries))
+            .values_list("pk", "updated_at"),
+        )
+        written = {
+            session_id: entry
+            for session_id, entry in entries.items()
+            if session_id not in updated_at or updated_at[session_id] <= entry[0]
+        }
+        groups = _group_checkouts(
+            model,
+            {session_id: values for session_id, (_, values) in written.items()},
+        )
+        new = [
+            instance
+            for instances in groups.values()
+            for instance in instances
+            if instance.session_id not in updated_at
+        ]
+        if new:
+            queryset.bulk_create(new, ignore_conflicts=True)
+        for fields, instances in groups.items():
+            for instance in instances:
+                # Rather than the time of the write (`auto_now`), so that the
+                # snapshots taken before it are still written
+                instance.updated_at = written[instance.session_id][0]
+            queryset.bulk_update(instances, _get_update_fields(fields))
+    return set(written)
+
+
+class CheckoutJournal:
+    """
+    Append-only file of the snapshots buffered by a `CheckoutWriter`, so that
+    the ones a process did not save before it died are saved by the next one.
+
+    Each process appends to its own file and keeps it locked: the file of a
+    dead process is unlocked, and is replayed then deleted by `recover(...)`.
+    The file is emptied whenever all the snapshots it lists are saved. Lines
+    are handed to the OS as they are written, so they survive the crash of
+    the process (including `SIGKILL`), but not the one of the host.
+    """
+
+    prefix = "checkouts-"
+    suffix = ".jsonl"
+
+    def __init__(self, directory: str):
+        if fcntl is None:
+            raise ImproperlyConfigured(
+                "`OTTU_WRITE_BEHIND_JOURNAL_DIR` is not supported on this platform",
+            )
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(
+            directory,
+            f"{self.prefix}{os.getpid()}-{uuid.uuid4().hex}{self.suffix}",
+        )
+        self._file = open(self.path, "a", encoding="utf-8")
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+
+    def append(self, session_id: str, taken_at: datetime, snapshot: dict) -> None:
+        record = {
+            "session_id": session_id,
+            "taken_at": taken_at.isoformat(),
+            "snapshot": snapshot,
+        }
+        self._file.write(json.dumps(record, cls=DjangoJSONEncoder) + "\n")
+        self._file.flush()
+
+    def clear(self) -> None:
+        self._file.truncate(0)
+
+    def detach(self) -> None:
+        """
+        Closes the file without unlocking it, eg: in a forked child process,
+        where the file still belongs to the parent.
+        """
+        if not self._file.closed:
+            self._file.close()
+
+    def close(self, delete: bool = True) -> None:
+        """
+        Closes the file, and deletes it unless it still lists snapshots that
+        were not saved.
+        """
+        if self._file.closed:
+            return
+        if delete:
+            os.unlink(self.path)
+        self._file.close()
+
+    @classmethod
+    def read(cls, file) -> dict[str, tuple[datetime, dict]]:
+        """
+        The latest snapshot of each session listed in `file`.
+        """
+        entries: dict[str, tuple[datetime, dict]] = {}
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # The last line, cut short by the crash
+                continue
+            taken_at = datetime.fromisoformat(record["taken_at"])
+            previous = entries.get(record["session_id"])
+            if previous is None or previous[0] <= taken_at:
+                entries[record["session_id"]] = (taken_at, record["snapshot"])
+        return entries
+
+    @classmethod
+    def recover(cls, model, directory: str, batch_size: int = 100) -> int:
+        """
+        Saves the snapshots listed in the journals of the dead processes, and
+        deletes these journals. Returns the number of sessions written.
+        """
+        if fcntl is None or not os.path.isdir(directory):
+            return 0
+        count = 0
+        for name in sorted(os.listdir(directory)):
+            if not (name.startswith(cls.prefix) and name.endswith(cls.suffix)):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                file = open(path, encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            with file:
+                try:
+                    fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # The journal of a running process
+                    continue
+                if os.fstat(file.fileno()).st_nlink == 0:
+                    # Replayed by another process in the meantime
+                    continue
+                entries = list(cls.read(file).items())
+                try:
+                    for start in range(0, len(entries), batch_size):
+                        batch = dict(entries[start : start + batch_size])
+                        count += len(write_checkouts(model, batch))
+                except Exception:
+                    # Kept for the next process
+                    logger.exception("Replaying the journal %s failed", path)
+                    continue
+                os.unlink(path)
+            logger.info("Replayed the journal %s", path)
+        return count
+
+
+# The writers of the process, see `flush_session(...)`
+_writers: weakref.WeakSet[CheckoutWriter] = weakref.WeakSet()
+
+
+class CheckoutWriter:
+    """
+    Write-behind persistence of the checkout sessions.
+
+    `add(...)` only buffers the snapshot of a session (the latest one wins),
+    and a background thread saves the buffer in batches: every `interval`
+    seconds, or as soon as `batch_size` sessions are buffered. A snapshot
+    never overwrites a row updated after it was taken, eg: by a webhook.
+
+    Failed batches are kept and retried, unless a newer snapshot of the same
+    session was buffered in the meantime. If more than `max_pending` sessions
+    are buffered (eg: the database is down), new snapshots are saved right
+    away instead. The buffer is flushed when the process exits.
+
+    If the process dies before (eg: `SIGKILL`, OOM killer), the buffered
+    snapshots are lost unless `journal_dir` is set: they are then also
+    appended to a `CheckoutJournal`, replayed by the next writer started
+    with the same `journal_dir`.
+    """
+
+    def __init__(
+        self,
+        model,
+        interval: float = 1.0,
+        batch_size: int = 100,
+        max_pending: int = 10_000,
+        journal_dir: str | None = None,
+    ):
+        self.model = model
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.journal_dir = journal_dir
+        # `{session_id: (session, taken_at, snapshot)}`
+        self._pending: dict[str, tuple[object, datetime, dict]] = {}
+        # The batches being written
+        self._in_flight: dict[str, tuple[object, datetime, dict]] = {}
+        self._lock = threading.Lock()
+        # Notified whenever a batch is written or failed
+        self._written = threading.Condition(self._lock)
+        # Serializes the flushes of the thread, `close()` and the fallback
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread: threading.Thread | None = None
+        self._pid = os.getpid()
+        self._journal = CheckoutJournal(journal_dir) if journal_dir else None
+        _writers.add(self)
+        atexit.register(self.close)
+
+    def add(self, session, snapshot: dict, taken_at: datetime | None = None) -> None:
+        """
+        Buffers `snapshot`, the values of `session` at `taken_at` (now by
+        default).
+        """
+        taken_at = taken_at or timezone.now()
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset_after_fork()
+            overflow = len(self._pending) >= self.max_pending
+            if not overflow and not self._closed:
+                self._pending[session.session_id] = (session, taken_at, snapshot)
+                if self._journal is not None:
+                    self._journal.append(session.session_id, taken_at, snapshot)
+                if len(self._pending) >= self.batch_size:
+                    self._wake.set()
+        if overflow or self._closed:
+            logger.warning(
+                "Write-behind buffer unavailable, saving session %s right away",
+                session.session_id,
+            )
+            self._write({session.session_id: (session, taken_at, snapshot)})
+            return
+        self._ensure_thread()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._pending or session_id in self._in_flight
+
+    def flush(self) -> None:
+        """
+        Saves everything that is buffered, in batches of `batch_size`.
+        """
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+                keys = list(self._pending)[: self.batch_size]
+                batch = {key: self._pending.pop(key) for key in keys}
+                self._in_flight.update(batch)
+            if not self._save(batch):
+                return
+
+    def flush_session(self, session_id: str) -> None:
+        """
+        Saves the buffered snapshot of `session_id` right away, and waits for
+        it if it is already being saved.
+        """
+        with self._lock:
+            while session_id in self._in_flight:
+                self._written.wait()
+            if session_id not in self._pending:
+                return
+            batch = {session_id: self._pending.pop(session_id)}
+            self._in_flight.update(batch)
+        self._save(batch)
+
+    def recover(self) -> int:
+        """
+        Saves the snapshots left in the journals of the dead processes.
+        """
+        if not self.journal_dir:
+            return 0
+        return CheckoutJournal.recover(self.model, self.journal_dir, self.batch_size)
+
+    def _save(self, batch: dict[str, tuple[object, datetime, dict]]) -> bool:
+        """
+        Writes an in-flight `batch`, which is buffered again if that fails.
+        """
+        try:
+            self._write(batch)
+        except Exception:
+            logger.exception("Saving %s checkout sessions failed", len(batch))
+            failed = True
+        else:
+            failed = False
+        with self._lock:
+            for key, entry in batch.items():
+                del self._in_flight[key]
+                if failed:
+                    # A newer snapshot supersedes the failed one
+                    self._pending.setdefault(key, entry)
+            if self._journal is not None and not self._pending and not self._in_flight:
+                self._journal.clear()
+            self._written.notify_all()
+        return not failed
+
+    def _write(self, batch: dict[str, tuple[object, datetime, dict]]) -> None:
+        with self._flush_lock:
+            write_checkouts(
+                self.model,
+                {
+                    session_id: (taken_at, snapshot)
+                    for session_id, (_, taken_at, snapshot) in batch.items()
+                },
+            )
+        for session, _, snapshot in batch.values():
+            session._saved_snapshot = snapshot  # type: ignore[attr-defined]
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                name="ottu-checkout-writer",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            self.recover()
+        except Exception:
+            logger.exception("Replaying the write-behind journals failed")
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._pending:
+                # Honours `CONN_MAX_AGE`, like the request cycle does
+                close_old_connections()
+                self.flush()
+
+    def _reset_after_fork(self) -> None:
+        # The parent process saves the sessions it buffered, and keeps its
+        # journal
+        self._pending.clear()
+        self._in_flight.clear()
+        self._thread = None
+        self._pid = os.getpid()
+        if self._journal is not None:
+            self._journal.detach()
+        if self.journal_dir:
+            self._journal = CheckoutJournal(self.journal_dir)
+
+    def close(self) -> None:
+        """
+        Stops the thread and saves the remaining sessions. The journal is
+        kept if some of them could not be saved.
+        """
+        self._closed = True
+        self._wake.set()
+        if self._pid == os.getpid():
+            self.flush()
+            if self._journal is not None:
+                self._journal.close(delete=not self._pending)
+
+
+def flush_session(session_id: str) -> None:
+    """
+    Saves the buffered snapshot of `session_id`, if any, eg: so that a webhook
+    of the session finds its row.
+    """
+    for writer in list(_writers):
+        if session_id in writer:
+            writer.flush_session(session_id)
+
+
+def has_pending_session(session_id: str) -> bool:
+    return any(session_id in writer for writer in list(_writers))
+
+
+_writer: CheckoutWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def get_checkout_writer() -> CheckoutWriter:
+    """
+    The write-behind writer shared by the `Ottu` instances of the process.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = CheckoutWriter(
+                model=Checkout,
+                interval=conf.WRITE_BEHIND_INTERVAL,
+                batch_size=conf.WRITE_BEHIND_BATCH_SIZE,
+                max_pending=conf.WRITE_BEHIND_MAX_PENDING,
+                journal_dir=conf.WRITE_BEHIND_JOURNAL_DIR or None,
+            )
+        return _writer
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ... import conf
+from ...archive import archive_webhooks
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves the webhooks older than --days to a gzip compressed JSON Lines "
+        "file of --directory, and deletes them from the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=conf.WEBHOOK_RETENTION_DAYS,
+            help="Age of the archived webhooks (default: OTTU_WEBHOOK_RETENTION_DAYS)",
+        )
+        parser.add_argument(
+            "--directory",
+            default=conf.WEBHOOK_ARCHIVE_DIR,
+            help="Directory of the archives (default: OTTU_WEBHOOK_ARCHIVE_DIR)",
+        )
+        parser.add_argument(
+            "--no-archive",
+            action="store_true",
+            help="Delete the webhooks without archiving them",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--model",
+            default="ottu.Webhook",
+            help="The webhook model, with `OTTU_ABSTRACT_WEBHOOK_MODEL`",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the webhooks that would be archived",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options["model"])
+        except (LookupError, ValueError) as exc:
+            raise CommandError(str(exc))
+        if options["days"] < 0 or options["batch_size"] < 1:
+            raise CommandError("--days and --batch-size must be positive")
+        directory = None if options["no_archive"] else options["directory"]
+        if not options["no_archive"] and not directory:
+            raise CommandError(
+                "Set --directory (or OTTU_WEBHOOK_ARCHIVE_DIR), or pass --no-archive",
+            )
+
+        before = timezone.now() - timedelta(days=options["days"])
+        if options["dry_run"]:
+            count = model.objects.filter(timestamp__lt=before).count()
+            self.stdout.write(f"{count} webhooks older than {before} to archive")
+            return
+
+        summary = archive_webhooks(
+            model,
+            before=before,
+            directory=directory,
+            batch_size=options["batch_size"],
+        )
+        if summary.path is not None:
+            self.stdout.write(f"Archived {summary.rows} webhooks to {summary.path}")
+        else:
+            self.stdout.write(f"Deleted {summary.rows} webhooks")
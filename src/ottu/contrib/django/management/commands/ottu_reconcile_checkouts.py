@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import json
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from .....bulk import JSONLinesSink
+from ... import conf
+from ...core.ottu import ottu
+from ...reconcile import CheckoutReconciler
+
+
+class Command(BaseCommand):
+    help = (
+        "Retrieves the checkouts that are not in a final state from Ottu, and "
+        "updates those that changed. Prints a JSON summary."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--states",
+            nargs="+",
+            default=list(conf.RECONCILE_STATES),
+            help="States of the checked checkouts (default: OTTU_RECONCILE_STATES)",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=0,
+            help="Skip the checkouts created in the last given minutes",
+        )
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--rate-limit",
+            type=float,
+            default=None,
+            help="Maximum number of requests per second",
+        )
+        parser.add_argument(
+            "--output",
+            help="JSON Lines file of the changed and failed checkouts",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only compare, nothing is saved",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--chunk-size and --concurrency must be positive")
+        reconciler = CheckoutReconciler(
+            ottu,
+            states=options["states"],
+            chunk_size=options["chunk_size"],
+            concurrency=options["concurrency"],
+            rate_limit=options["rate_limit"],
+            min_age=timedelta(minutes=options["min_age"]),
+        )
+        output = options["output"]
+        with JSONLinesSink(output) if output else nullcontext() as sink:
+            summary = reconciler.run(sink=sink, dry_run=options["dry_run"])
+        self.stdout.write(json.dumps(summary.as_dict()))
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:57
+
+from django.db import migrations, models
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast
+
+from ottu.contrib.django.operations import AddIndexConcurrently
+
+BATCH_SIZE = 10_000
+
+
+def populate_agreement_id(apps, schema_editor):
+    """
+    Copies `agreement["id"]` into `agreement_id`, in batches of primary keys
+    so that large tables are not locked by one long running `UPDATE`.
+    """
+    Checkout = apps.get_model("ottu", "Checkout")
+    # `agreement__id=None` matches a JSON `null`
+    queryset = (
+        Checkout.objects.filter(agreement__has_key="id")
+        .exclude(agreement__id=None)
+        .order_by("pk")
+    )
+    last_pk = None
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        pks = list(batch.values_list("pk", flat=True)[:BATCH_SIZE])
+        if not pks:
+            break
+        Checkout.objects.filter(pk__in=pks).update(
+            agreement_id=Cast(
+                KeyTextTransform("id", "agreement"),
+                models.CharField(),
+            ),
+        )
+        last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+    # Every batch of the backfill is committed on its own, instead of holding
+    # the locks of the whole table until the end. Required by the concurrent
+    # index too, which cannot be built in a transaction.
+    atomic = False
+
+    dependencies = [
+        ("ottu", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="checkout",
+            name="agreement_id",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=250,
+                verbose_name="Agreement ID",
+            ),
+        ),
+        migrations.RunPython(populate_agreement_id, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name="checkout",
+            index=models.Index(
+                fields=["customer_id", "agreement_id", "-created_at"],
+                name="ottu_checkout_token_idx",
+            ),
+        ),
+    ]
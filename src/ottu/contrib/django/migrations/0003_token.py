@@ -0,0 +1,112 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:01
+
+from django.db import migrations, models
+
+BATCH_SIZE = 10_000
+
+
+def populate_tokens(apps, schema_editor):
+    """
+    Fills the vault with the most recent token of every customer/agreement
+    pair, read in index order (`ottu_checkout_token_idx`).
+    """
+    Checkout = apps.get_model("ottu", "Checkout")
+    Token = apps.get_model("ottu", "Token")
+    rows = (
+        Checkout.objects.exclude(customer_id="")
+        .exclude(agreement_id="")
+        .exclude(token="")
+        .order_by("customer_id", "agreement_id", "-created_at")
+        .values_list("customer_id", "agreement_id", "token")
+    )
+    tokens = []
+    last_key = None
+    for customer_id, agreement_id, token in rows.iterator(chunk_size=BATCH_SIZE):
+        if (customer_id, agreement_id) == last_key:
+            continue
+        last_key = (customer_id, agreement_id)
+        tokens.append(
+            Token(customer_id=customer_id, agreement_id=agreement_id, token=token),
+        )
+        if len(tokens) >= BATCH_SIZE:
+            Token.objects.bulk_create(tokens, ignore_conflicts=True)
+            tokens = []
+    Token.objects.bulk_create(tokens, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ottu", "0002_checkout_token_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Token",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "customer_id",
+                    models.CharField(max_length=250, verbose_name="Customer ID"),
+                ),
+                (
+                    "agreement_id",
+                    models.CharField(max_length=250, verbose_name="Agreement ID"),
+                ),
+                (
+                    "pg_code",
+                    models.CharField(
+                        blank=True, max_length=250, verbose_name="PG Code"
+                    ),
+                ),
+                ("token", models.CharField(max_length=250, verbose_name="Token")),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("active", "Active"),
+                            ("expired", "Expired"),
+                            ("deleted", "Deleted"),
+                        ],
+                        default="active",
+                        max_length=20,
+                        verbose_name="State",
+                    ),
+                ),
+                (
+                    "last_used",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Last Used"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created At"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Updated At"),
+                ),
+            ],
+            options={
+                "verbose_name": "Token",
+                "verbose_name_plural": "Tokens",
+                "abstract": False,
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="token",
+            constraint=models.UniqueConstraint(
+                fields=("customer_id", "agreement_id"),
+                name="ottu_token_customer_agreement_uniq",
+            ),
+        ),
+        migrations.RunPython(populate_tokens, migrations.RunPython.noop),
+    ]
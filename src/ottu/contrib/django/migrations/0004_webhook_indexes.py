@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:15
+
+from django.db import migrations, models
+
+from ottu.contrib.django.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # The indexes are built concurrently on PostgreSQL, outside a transaction
+    atomic = False
+
+    dependencies = [
+        ("ottu", "0003_token"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="webhook",
+            index=models.Index(fields=["session_id"], name="ottu_webhook_session_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="webhook",
+            index=models.Index(fields=["timestamp"], name="ottu_webhook_timestamp_idx"),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:17
+
+from django.db import migrations, models
+
+from ottu.contrib.django.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # The indexes are built concurrently on PostgreSQL, outside a transaction
+    atomic = False
+
+    dependencies = [
+        ("ottu", "0004_webhook_indexes"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="checkout",
+            index=models.Index(
+                fields=["created_at", "session_id"], name="ottu_checkout_created_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="checkout",
+            index=models.Index(
+                fields=["state", "created_at"], name="ottu_checkout_state_idx"
+            ),
+        ),
+    ]
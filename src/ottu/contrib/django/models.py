@@ -1,9 +1,17 @@
 from __future__ import annotations
 
-from django.db import models
+from collections.abc import Iterable, Mapping
+
+from asgiref.sync import sync_to_async
+from django.db import models, transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from . import conf
+from .core.tokens import token_cache
+
+# Maximum number of pairs per query of `Token.get_tokens(...)`
+TOKEN_BATCH_SIZE = 500
 
 
 class Checkout(models.Model):
@@ -16,6 +24,13 @@ class Checkout(models.Model):
     customer_id = models.CharField(_("Customer ID"), max_length=250, blank=True)
     token = models.CharField(_("Token"), max_length=250, blank=True)
     agreement = models.JSONField(_("Agreement"), blank=True, default=dict)
+    # Copy of `agreement["id"]`, so that the tokens can be looked up by index
+    agreement_id = models.CharField(
+        _("Agreement ID"),
+        max_length=250,
+        blank=True,
+        editable=False,
+    )
     extra_params = models.JSONField(_("Extra Params"), blank=True, default=dict)
     created_at = models.DateTimeField(_("Created At"), auto_now_add=True)
     updated_at = models.DateTimeField(_("Updated At"), auto_now=True)
@@ -24,10 +39,39 @@ class Checkout(models.Model):
         verbose_name = _("Checkout")
         verbose_name_plural = _("Checkout")
         abstract = conf.ABSTRACT_CHECKOUT_MODEL
+        indexes = [
+            # Serves `Session.get_token_from_db(...)`
+            models.Index(
+                fields=["customer_id", "agreement_id", "-created_at"],
+                name="ottu_checkout_token_idx",
+            ),
+            # Serve the ordering, the date hierarchy and the state filter of
+            # the admin
+            models.Index(
+                fields=["created_at", "session_id"],
+                name="ottu_checkout_created_idx",
+            ),
+            models.Index(
+                fields=["state", "created_at"],
+                name="ottu_checkout_state_idx",
+            ),
+        ]
 
     def __str__(self):
         return str(self.session_id)
 
+    @staticmethod
+    def get_agreement_id(agreement) -> str:
+        agreement = agreement if isinstance(agreement, dict) else {}
+        return str(agreement.get("id") or "")
+
+    def save(self, *args, **kwargs):
+        self.agreement_id = self.get_agreement_id(self.agreement)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "agreement" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "agreement_id"}
+        super().save(*args, **kwargs)
+
 
 class Webhook(models.Model):
     session_id = models.CharField(_("Session ID"), max_length=250)
@@ -47,16 +91,25 @@ class Webhook(models.Model):
         verbose_name = _("Webhook")
         verbose_name_plural = _("Webhooks")
         abstract = conf.ABSTRACT_WEBHOOK_MODEL
+        indexes = [
+            models.Index(fields=["session_id"], name="ottu_webhook_session_idx"),
+            # Serves the archiving of the old rows, see `ottu_archive_webhooks`
+            models.Index(fields=["timestamp"], name="ottu_webhook_timestamp_idx"),
+        ]
 
     def __str__(self):
         return str(self.session_id)
 
     @classmethod
     def create_from_webhook(cls, data):
+        from .core.writer import flush_session
+
         session_id = data.get("session_id", "")
 
         checkout = None
         if session_id:
+            # The session may still be buffered by the write-behind writer
+            flush_session(session_id)
             checkout = Checkout.objects.filter(session_id=session_id).first()
 
         instance = cls.objects.create(
@@ -69,4 +122,348 @@ class Webhook(models.Model):
             for field, value in data.items():
                 setattr(checkout, field, value)
             checkout.save()
+        if not Token._meta.abstract:
+            Token.update_from_webhook(data)
+        return instance
+
+    @classmethod
+    async def acreate_from_webhook(cls, data):
+        """
+        Async version of `create_from_webhook(...)`.
+        """
+        from .core.writer import flush_session, has_pending_session
+
+        session_id = data.get("session_id", "")
+
+        checkout = None
+        if session_id:
+            if has_pending_session(session_id):
+                await sync_to_async(flush_session)(session_id)
+            checkout = await Checkout.objects.filter(session_id=session_id).afirst()
+
+        instance = await cls.objects.acreate(
+            session_id=session_id,
+            checkout=checkout,
+            payload=data,
+        )
+
+        if checkout:
+            for field, value in data.items():
+                setattr(checkout, field, value)
+            await checkout.asave()
+        if not Token._meta.abstract:
+            await Token.aupdate_from_webhook(data)
+        return instance
+
+
+class Token(models.Model):
+    """
+    The current token of a customer for an agreement, maintained from the
+    webhooks and the `Card` responses.
+    """
+
+    class State(models.TextChoices):
+        ACTIVE = "active", _("Active")
+        EXPIRED = "expired", _("Expired")
+        DELETED = "deleted", _("Deleted")
+
+    customer_id = models.CharField(_("Customer ID"), max_length=250)
+    agreement_id = models.CharField(_("Agreement ID"), max_length=250)
+    pg_code = models.CharField(_("PG Code"), max_length=250, blank=True)
+    token = models.CharField(_("Token"), max_length=250)
+    state = models.CharField(
+        _("State"),
+        max_length=20,
+        choices=State.choices,
+        default=State.ACTIVE,
+    )
+    last_used = models.DateTimeField(_("Last Used"), blank=True, null=True)
+    created_at = models.DateTimeField(_("Created At"), auto_now_add=True)
+    updated_at = models.DateTimeField(_("Updated At"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("Token")
+        verbose_name_plural = _("Tokens")
+        abstract = conf.ABSTRACT_TOKEN_MODEL
+        constraints = [
+            models.UniqueConstraint(
+                fields=["customer_id", "agreement_id"],
+                name="ottu_token_customer_agreement_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_id}:{self.agreement_id}"
+
+    @classmethod
+    def get_token(cls, customer_id: str, agreement_id: str) -> str | None:
+        """
+        Returns the active token of the customer for the agreement, if any.
+        """
+        return cls.lookup_token(customer_id, agreement_id)[1]
+
+    @classmethod
+    def lookup_token(
+        cls,
+        customer_id: str,
+        agreement_id: str,
+    ) -> tuple[bool, str | None]:
+        """
+        Returns whether the vault has the pair, in any state, and its token
+        if it is active. A deleted or expired pair must not be looked up
+        anywhere else.
+        """
+        token = token_cache.get(customer_id, agreement_id)
+        if token is not None:
+            return True, token
+        row = cls._get_vault_row(customer_id, agreement_id).first()
+        return cls._read_vault_row(customer_id, agreement_id, row)
+
+    @classmethod
+    async def alookup_token(
+        cls,
+        customer_id: str,
+        agreement_id: str,
+    ) -> tuple[bool, str | None]:
+        """
+        Async version of `lookup_token(...)`.
+        """
+        token = token_cache.get(customer_id, agreement_id)
+        if token is not None:
+            return True, token
+        row = await cls._get_vault_row(customer_id, agreement_id).afirst()
+        return cls._read_vault_row(customer_id, agreement_id, row)
+
+    @classmethod
+    async def aget_token(cls, customer_id: str, agreement_id: str) -> str | None:
+        """
+        Async version of `get_token(...)`.
+        """
+        return (await cls.alookup_token(customer_id, agreement_id))[1]
+
+    @classmethod
+    def _get_vault_row(cls, customer_id: str, agreement_id: str):
+        return cls.objects.filter(
+            customer_id=customer_id,
+            agreement_id=agreement_id,
+        ).values_list("token", "state")
+
+    @classmethod
+    def _read_vault_row(
+        cls,
+        customer_id: str,
+        agreement_id: str,
+        row: tuple[str, str] | None,
+    ) -> tuple[bool, str | None]:
+        if row is None:
+            return False, None
+        token, state = row
+        if state != cls.State.ACTIVE or not token:
+            return True, None
+        token_cache.set(customer_id, agreement_id, token)
+        return True, token
+
+    @classmethod
+    def get_tokens(
+        cls,
+        pairs: Iterable[tuple[str, str]],
+    ) -> dict[tuple[str, str], str]:
+        """
+        Returns the active tokens of many `(customer_id, agreement_id)` pairs,
+        with one query per `TOKEN_BATCH_SIZE` pairs that are not cached.
+        """
+        return cls.lookup_tokens(pairs)[0]
+
+    @classmethod
+    def lookup_tokens(
+        cls,
+        pairs: Iterable[tuple[str, str]],
+    ) -> tuple[dict[tuple[str, str], str], set[tuple[str, str]]]:
+        """
+        Batched `lookup_token(...)`: returns the active tokens, and the pairs
+        that the vault has in any state.
+        """
+        tokens = {}
+        known = set()
+        missing = []
+        for customer_id, agreement_id in pairs:
+            token = token_cache.get(customer_id, agreement_id)
+            if token is None:
+                missing.append((customer_id, agreement_id))
+            else:
+                tokens[(customer_id, agreement_id)] = token
+                known.add((customer_id, agreement_id))
+        for start in range(0, len(missing), TOKEN_BATCH_SIZE):
+            batch = set(missing[start : start + TOKEN_BATCH_SIZE])
+            # Both lists are matched on the unique index, the few rows of
+            # other combinations are dropped below
+            rows = cls.objects.filter(
+                customer_id__in={customer_id for customer_id, _ in batch},
+                agreement_id__in={agreement_id for _, agreement_id in batch},
+            ).values_list("customer_id", "agreement_id", "token", "state")
+            for customer_id, agreement_id, token, state in rows:
+                pair = (customer_id, agreement_id)
+                if pair not in batch:
+                    continue
+                known.add(pair)
+                if state == cls.State.ACTIVE and token:
+                    tokens[pair] = token
+                    token_cache.set(customer_id, agreement_id, token)
+        return tokens, known
+
+    @classmethod
+    def save_token(
+        cls,
+        customer_id: str,
+        agreement_id: str,
+        token: str,
+        **defaults,
+    ) -> Token:
+        instance, _ = cls.objects.update_or_create(
+            customer_id=customer_id,
+            agreement_id=agreement_id,
+            defaults={"token": token, **defaults},
+        )
+        cls._invalidate(customer_id, agreement_id)
+        return instance
+
+    @classmethod
+    def add_token(cls, customer_id: str, agreement_id: str, token: str) -> str | None:
+        """
+        Adds the token of a pair that is not in the vault yet, an existing row
+        (eg: a deleted token) is left as is. Returns the active token.
+        """
+        instance, _ = cls.objects.get_or_create(
+            customer_id=customer_id,
+            agreement_id=agreement_id,
+            defaults={"token": token},
+        )
+        return instance.token if instance.state == cls.State.ACTIVE else None
+
+    @classmethod
+    def add_tokens(
+        cls,
+        tokens: Mapping[tuple[str, str], str],
+    ) -> dict[tuple[str, str], str]:
+        """
+        Batched `add_token(...)`: the pairs are inserted at once, the existing
+        rows are left as is, then the active tokens are read back.
+        """
+        cls.objects.bulk_create(
+            [
+                cls(customer_id=customer_id, agreement_id=agreement_id, token=token)
+                for (customer_id, agreement_id), token in tokens.items()
+            ],
+            batch_size=TOKEN_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        return cls.get_tokens(tokens)
+
+    @classmethod
+    async def aadd_token(
+        cls,
+        customer_id: str,
+        agreement_id: str,
+        token: str,
+    ) -> str | None:
+        """
+        Async version of `add_token(...)`.
+        """
+        instance, _ = await cls.objects.aget_or_create(
+            customer_id=customer_id,
+            agreement_id=agreement_id,
+            defaults={"token": token},
+        )
+        return instance.token if instance.state == cls.State.ACTIVE else None
+
+    @classmethod
+    async def asave_token(
+        cls,
+        customer_id: str,
+        agreement_id: str,
+        token: str,
+        **defaults,
+    ) -> Token:
+        """
+        Async version of `save_token(...)`.
+        """
+        instance, _ = await cls.objects.aupdate_or_create(
+            customer_id=customer_id,
+            agreement_id=agreement_id,
+            defaults={"token": token, **defaults},
+        )
+        # The async queries run in autocommit mode, the write is committed
+        token_cache.invalidate(customer_id, agreement_id)
         return instance
+
+    @classmethod
+    def update_from_webhook(cls, data: dict) -> Token | None:
+        values = cls._get_webhook_token(data)
+        return cls.save_token(**values) if values else None
+
+    @classmethod
+    async def aupdate_from_webhook(cls, data: dict) -> Token | None:
+        values = cls._get_webhook_token(data)
+        return await cls.asave_token(**values) if values else None
+
+    @classmethod
+    def _get_webhook_token(cls, data: dict) -> dict | None:
+        """
+        The `save_token(...)` arguments of the token of a webhook, if any.
+        """
+        token = data.get("token")
+        agreement = data.get("agreement")
+        if not token or not isinstance(agreement, dict) or not agreement.get("id"):
+            return None
+        pg_code = data.get("pg_code") or ""
+        customer_id = data.get("customer_id") or ""
+        # The tokenization webhooks send the card details
+        if isinstance(token, dict):
+            pg_code = token.get("pg_code") or pg_code
+            customer_id = token.get("customer_id") or customer_id
+            token = token.get("token")
+        if not token or not customer_id:
+            return None
+        return {
+            "customer_id": customer_id,
+            "agreement_id": str(agreement["id"]),
+            "token": token,
+            "pg_code": pg_code,
+            "state": cls.State.ACTIVE,
+            "last_used": timezone.now(),
+        }
+
+    @classmethod
+    def update_from_cards(cls, cards: list[dict]) -> None:
+        """
+        Saves the tokens of a `Card.get_cards(...)` response, one per agreement
+        of every card.
+        """
+        for card in cards:
+            if not card.get("token") or not card.get("customer_id"):
+                continue
+            state = cls.State.EXPIRED if card.get("is_expired") else cls.State.ACTIVE
+            for agreement_id in card.get("agreements") or []:
+                cls.save_token(
+                    customer_id=card["customer_id"],
+                    agreement_id=str(agreement_id),
+                    token=card["token"],
+                    pg_code=card.get("pg_code") or "",
+                    state=state,
+                )
+
+    @classmethod
+    def delete_token(cls, customer_id: str, token: str) -> None:
+        queryset = cls.objects.filter(customer_id=customer_id, token=token)
+        agreement_ids = list(queryset.values_list("agreement_id", flat=True))
+        queryset.update(state=cls.State.DELETED, updated_at=timezone.now())
+        for agreement_id in agreement_ids:
+            cls._invalidate(customer_id, agreement_id)
+
+    @staticmethod
+    def _invalidate(customer_id: str, agreement_id: str) -> None:
+        token_cache.invalidate(customer_id, agreement_id)
+        # Again once committed, in case a concurrent read cached the old token
+        transaction.on_commit(
+            lambda: token_cache.invalidate(customer_id, agreement_id),
+        )
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from django.db import migrations
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """
+    Builds the index without locking the table against writes on PostgreSQL
+    (`CREATE INDEX CONCURRENTLY`), like `AddIndex` on the other databases.
+    The migration must set `atomic = False`, since PostgreSQL cannot build an
+    index concurrently in a transaction.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
@@ -0,0 +1,245 @@
+"""
+Reconciliation of the local `Checkout` rows with their session at Ottu, see
+the `ottu_reconcile_checkouts` management command.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import Counter
+from collections.abc import Callable, Collection, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.db import router, transaction
+from django.utils import timezone
+
+from ...bulk import RateLimiter
+from ...enums import HTTPMethod
+from . import conf
+
+logger = logging.getLogger("ottu-py")
+
+
+@dataclass
+class ReconcileResult:
+    """
+    A checkout whose state differs at Ottu, or that could not be retrieved.
+    """
+
+    session_id: str
+    state: str
+    remote_state: str | None = None
+    changed_fields: list[str] = field(default_factory=list)
+    error: str | None = None
+
+    def as_dict(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "state": self.state,
+            "remote_state": self.remote_state,
+            "changed_fields": self.changed_fields,
+            "error": self.error,
+        }
+
+
+@dataclass
+class ReconcileSummary:
+    """
+    Counters of a `CheckoutReconciler.run()`. `transitions` counts the changed
+    checkouts by `"<local state> -> <state at Ottu>"`. In a dry run, `updated`
+    stays `0`. `skipped` counts the rows changed locally (eg: by a webhook)
+    while their session was being retrieved.
+    """
+
+    checked: int = 0
+    unchanged: int = 0
+    changed: int = 0
+    updated: int = 0
+    skipped: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    transitions: Counter = field(default_factory=Counter)
+
+    def as_dict(self) -> dict:
+        return {
+            "checked": self.checked,
+            "unchanged": self.unchanged,
+            "changed": self.changed,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "elapsed": self.elapsed,
+            "transitions": dict(self.transitions),
+        }
+
+
+class CheckoutReconciler:
+    """
+    Retrieves the session of every checkout in one of `states` from Ottu, and
+    updates the checkouts that differ.
+
+    The rows are read `chunk_size` at a time, by primary key, so that only one
+    chunk is held in memory. The sessions of a chunk are retrieved by up to
+    `concurrency` threads, at most `rate_limit` per second, and the changed
+    rows of the chunk are saved with one `bulk_update(...)`.
+    """
+
+    def __init__(
+        self,
+        ottu,
+        states: Collection[str] = conf.RECONCILE_STATES,
+        chunk_size: int = 500,
+        concurrency: int = 8,
+        rate_limit: float | None = None,
+        min_age: timedelta | None = None,
+    ):
+        self.ottu = ottu
+        self.model = ottu.model
+        self.states = list(states)
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+        # Sessions younger than this are likely still in progress
+        self.min_age = min_age
+        self.fields = [
+            model_field.name
+            for model_field in self.model._meta.concrete_fields
+            if model_field.editable and not model_field.primary_key
+        ]
+
+    def get_queryset(self):
+        queryset = self.model.objects.filter(state__in=self.states)
+        if self.min_age:
+            queryset = queryset.filter(created_at__lt=timezone.now() - self.min_age)
+        return queryset.order_by("pk")
+
+    def iter_chunks(self) -> Iterator[list[dict]]:
+        queryset = self.get_queryset().values("pk", *self.fields)
+        last_pk = None
+        while True:
+            chunk_qs = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            chunk = list(chunk_qs[: self.chunk_size])
+            if not chunk:
+                return
+            yield chunk
+            last_pk = chunk[-1]["pk"]
+
+    def retrieve(self, session_id: str) -> dict:
+        """
+        The session at Ottu, as its `Checkout` fields. Unlike
+        `Session.retrieve(...)`, this neither saves nor keeps the session.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        response = self.ottu.send_request(
+            path=f"{self.ottu.session_cls.url_session_create}{session_id}",
+            method=HTTPMethod.GET,
+        )
+        if not response.success:
+            raise RuntimeError(
+                f"Retrieving the session failed ({response.status_code}): "
+                f"{response.error}",
+            )
+        session = self.ottu.session_cls(ottu=self.ottu, **response.response)
+        return self.ottu.get_session_snapshot(session)
+
+    def _retrieve(self, session_id: str) -> dict | Exception:
+        try:
+            return self.retrieve(session_id)
+        except Exception as exc:
+            logger.warning("Reconciling checkout %s failed: %s", session_id, exc)
+            return exc
+
+    def run(
+        self,
+        sink: Callable[[ReconcileResult], None] | None = None,
+        dry_run: bool = False,
+    ) -> ReconcileSummary:
+        """
+        :param sink: Called with the `ReconcileResult` of every changed or
+            failed checkout, eg: `JSONLinesSink(path)`
+        :param dry_run: Only compare, nothing is saved
+        """
+        summary = ReconcileSummary()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for chunk in self.iter_chunks():
+                session_ids = [row["pk"] for row in chunk]
+                remotes = executor.map(self._retrieve, session_ids)
+                changes: dict[str, tuple[dict, dict]] = {}
+                for row, remote in zip(chunk, remotes):
+                    summary.checked += 1
+                    result = self.compare(row, remote)
+                    if result is None:
+                        summary.unchanged += 1
+                        continue
+                    if isinstance(remote, Exception):
+                        summary.failed += 1
+                    else:
+                        summary.changed += 1
+                        summary.transitions[
+                            f"{result.state} -> {result.remote_state}"
+                        ] += 1
+                        changes[row["pk"]] = (row, remote)
+                    if sink is not None:
+                        sink(result)
+                if changes and not dry_run:
+                    updated = self.save(changes)
+                    summary.updated += updated
+                    summary.skipped += len(changes) - updated
+        summary.elapsed = time.perf_counter() - start
+        return summary
+
+    def compare(self, row: dict, remote: dict | Exception) -> ReconcileResult | None:
+        if isinstance(remote, Exception):
+            return ReconcileResult(
+                session_id=row["pk"],
+                state=row["state"],
+                error=str(remote),
+            )
+        changed_fields = [
+            name for name, value in remote.items() if row.get(name) != value
+        ]
+        if not changed_fields:
+            return None
+        return ReconcileResult(
+            session_id=row["pk"],
+            state=row["state"],
+            remote_state=remote.get("state", row["state"]),
+            changed_fields=changed_fields,
+        )
+
+    def save(self, changes: dict[str, tuple[dict, dict]]) -> int:
+        """
+        Saves the sessions at Ottu over their rows, unless the state of a row
+        changed since it was read. Returns the number of updated rows.
+        """
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            current_states = dict(
+                self.model.objects.select_for_update()
+                .filter(pk__in=list(changes))
+                .values_list("pk", "state"),
+            )
+            instances = []
+            update_fields = {"updated_at"}
+            now = timezone.now()
+            for pk, (row, remote) in changes.items():
+                if current_states.get(pk) != row["state"]:
+                    continue
+                values = {name: row[name] for name in self.fields}
+                values.update(remote)
+                instance = self.model(pk=pk, **values)
+                instance.agreement_id = self.model.get_agreement_id(instance.agreement)
+                instance.updated_at = now
+                instances.append(instance)
+                update_fields.update(
+                    name for name, value in remote.items() if row.get(name) != value
+                )
+            if "agreement" in update_fields:
+                update_fields.add("agreement_id")
+            if instances:
+                self.model.objects.bulk_update(instances, sorted(update_fields))
+        return len(instances)
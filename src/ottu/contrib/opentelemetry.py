@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+except ImportError:
+    raise ImportError(
+        "opentelemetry-api is required for OpenTelemetry tracing. "
+        "Install with: pip install 'ottu-py[opentelemetry]'",
+    )
+
+from ..hooks import RequestEvent, RequestHook
+
+
+class OpenTelemetryHook(RequestHook):
+    """
+    Wraps every request sent to Ottu in an OpenTelemetry client span.
+
+    Usage:
+        ottu = Ottu(merchant_id=..., auth=..., hooks=[OpenTelemetryHook()])
+    """
+
+    span_key = "otel_span"
+
+    def __init__(self, tracer_provider=None):
+        self.tracer = trace.get_tracer("ottu-py", tracer_provider=tracer_provider)
+
+    def on_request(self, event: RequestEvent) -> None:
+        event.context[self.span_key] = self.tracer.start_span(
+            f"{event.method} {event.path_template}",
+            kind=SpanKind.CLIENT,
+            attributes={
+                "http.request.method": event.method,
+                "server.address": event.merchant_id,
+                "url.path": event.path,
+                "ottu.endpoint": event.path_template,
+                "ottu.attempt": event.attempt,
+            },
+        )
+
+    def on_response(self, event: RequestEvent) -> None:
+        span = event.context.pop(self.span_key, None)
+        if span is None:
+            return
+        span.set_attribute("http.response.status_code", event.status_code)
+        span.set_attribute("http.request.body.size", event.request_bytes or 0)
+        span.set_attribute("http.response.body.size", event.response_bytes or 0)
+        if event.status_code and event.status_code >= 400:
+            span.set_status(Status(StatusCode.ERROR))
+        span.end()
+
+    def on_error(self, event: RequestEvent) -> None:
+        span = event.context.pop(self.span_key, None)
+        if span is None:
+            return
+        if event.error is not None:
+            span.record_exception(event.error)
+            span.set_attribute("error.type", type(event.error).__name__)
+        span.set_status(Status(StatusCode.ERROR))
+        span.end()
+
+    def on_retry(self, event: RequestEvent) -> None:
+        span = event.context.get(self.span_key)
+        if span is not None:
+            span.add_event("retry", {"ottu.attempt": event.attempt})
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+try:
+    from prometheus_client import REGISTRY, Counter, Histogram
+except ImportError:
+    raise ImportError(
+        "prometheus-client is required for Prometheus metrics. "
+        "Install with: pip install 'ottu-py[prometheus]'",
+    )
+
+from ..hooks import RequestEvent, RequestHook
+
+
+class PrometheusHook(RequestHook):
+    """
+    Exposes Prometheus counters and histograms for every request sent to Ottu,
+    labelled by merchant, HTTP method and endpoint (path template).
+
+    Usage:
+        ottu = Ottu(merchant_id=..., auth=..., hooks=[PrometheusHook()])
+
+    Create the hook once per process and share it between the `Ottu` instances,
+    since the metrics can only be registered once per registry.
+    """
+
+    labels = ("merchant_id", "method", "endpoint")
+
+    def __init__(self, namespace: str = "ottu", registry=REGISTRY, buckets=None):
+        histogram_kwargs = {"buckets": buckets} if buckets else {}
+        self.requests = Counter(
+            "requests_total",
+            "Number of responses received from Ottu.",
+            [*self.labels, "status_code"],
+            namespace=namespace,
+            registry=registry,
+        )
+        self.errors = Counter(
+            "request_errors_total",
+            "Number of requests to Ottu that failed without a response.",
+            [*self.labels, "error"],
+            namespace=namespace,
+            registry=registry,
+        )
+        self.retries = Counter(
+            "request_retries_total",
+            "Number of retried requests to Ottu.",
+            self.labels,
+            namespace=namespace,
+            registry=registry,
+        )
+        self.latency = Histogram(
+            "request_duration_seconds",
+            "Time spent waiting for Ottu to respond.",
+            self.labels,
+            namespace=namespace,
+            registry=registry,
+            **histogram_kwargs,
+        )
+        self.request_bytes = Counter(
+            "request_bytes_total",
+            "Bytes sent to Ottu.",
+            self.labels,
+            namespace=namespace,
+            registry=registry,
+        )
+        self.response_bytes = Counter(
+            "response_bytes_total",
+            "Bytes received from Ottu.",
+            self.labels,
+            namespace=namespace,
+            registry=registry,
+        )
+
+    def get_labels(self, event: RequestEvent) -> tuple[str, str, str]:
+        return event.merchant_id, event.method, event.path_template
+
+    def on_response(self, event: RequestEvent) -> None:
+        labels = self.get_labels(event)
+        self.requests.labels(*labels, str(event.status_code)).inc()
+        if event.latency is not None:
+            self.latency.labels(*labels).observe(event.latency)
+        self.request_bytes.labels(*labels).inc(event.request_bytes or 0)
+        self.response_bytes.labels(*labels).inc(event.response_bytes or 0)
+
+    def on_error(self, event: RequestEvent) -> None:
+        labels = self.get_labels(event)
+        self.errors.labels(*labels, type(event.error).__name__).inc()
+        if event.latency is not None:
+            self.latency.labels(*labels).observe(event.latency)
+
+    def on_retry(self, event: RequestEvent) -> None:
+        self.retries.labels(*self.get_labels(event)).inc()
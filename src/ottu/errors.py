@@ -29,3 +29,7 @@ class ValidationError(OttuBaseError):
 
 class WebhookProcessingError(OttuBaseError):
     pass
+
+
+class WebhookPayloadTooLargeError(WebhookProcessingError):
+    pass
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import logging
+import re
+import threading
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any
+
+logger = logging.getLogger("ottu-py")
+
+# Path segments that look like identifiers (session IDs, card tokens, ...)
+_ID_SEGMENT = re.compile(r"^(?=.*\d)[\w-]{8,}$")
+
+
+def get_path_template(path: str) -> str:
+    """
+    Replaces identifier-like path segments with `{id}` so that
+    the path can be used as a low-cardinality metric label.
+
+    Eg: /b/checkout/v1/pymt-txn/10039bbdadb8ef80 -> /b/checkout/v1/pymt-txn/{id}
+    """
+    return "/".join(
+        "{id}" if _ID_SEGMENT.match(segment) else segment for segment in path.split("/")
+    )
+
+
+@dataclass
+class RequestEvent:
+    """
+    A single request to Ottu, as seen by the hooks.
+
+    The same instance is passed to every hook call of a request, so hooks can
+    keep per-request state (eg: a tracing span) in `context`.
+    """
+
+    merchant_id: str
+    method: str
+    path: str
+    attempt: int = 1
+    status_code: int | None = None
+    # Seconds spent waiting for the HTTP response
+    latency: float | None = None
+    request_bytes: int | None = None
+    response_bytes: int | None = None
+    error: Exception | None = None
+    context: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def path_template(self) -> str:
+        return get_path_template(self.path)
+
+
+@dataclass
+class AutoflowEvent:
+    """
+    Per-stage timings (in seconds) of a single `checkout_autoflow(...)`
+    or `auto_debit_autoflow(...)` call.
+
+    Possible stages are `token_lookup`, `payment_methods`, `session_create`
+    and `auto_debit`, plus `total`. Stages that were skipped (eg: token passed
+    by the caller) or never reached (an earlier stage failed) are absent.
+    """
+
+    merchant_id: str
+    flow: str
+    timings: dict[str, float]
+    success: bool
+
+
+class RequestHook:
+    """
+    Base class for the request instrumentation hooks. Override the methods
+    you are interested in and pass the instance to `Ottu(hooks=[...])`.
+    """
+
+    def on_request(self, event: RequestEvent) -> None:
+        """Called right before the request is sent."""
+
+    def on_response(self, event: RequestEvent) -> None:
+        """Called when a response (of any status code) is received."""
+
+    def on_error(self, event: RequestEvent) -> None:
+        """Called when the request fails without a response (timeouts, etc)."""
+
+    def on_retry(self, event: RequestEvent) -> None:
+        """Called by request handlers that retry, before each new attempt."""
+
+    def on_autoflow(self, event: AutoflowEvent) -> None:
+        """Called when an autoflow operation finishes, successfully or not."""
+
+
+class AutoflowStats(RequestHook):
+    """
+    Aggregates the autoflow stage timings across calls.
+
+    Usage:
+        stats = AutoflowStats()
+        ottu = Ottu(merchant_id=..., auth=..., hooks=[stats])
+        ...
+        stats.summary()
+        # {"auto_debit_autoflow": {"token_lookup": {"count": 10, "p50": ...}, ...}}
+    """
+
+    def __init__(self, max_samples: int = 1000):
+        self.max_samples = max_samples
+        self._samples: dict[tuple[str, str], deque[float]] = defaultdict(
+            lambda: deque(maxlen=self.max_samples),
+        )
+        self._counts: dict[tuple[str, str], int] = defaultdict(int)
+        self._totals: dict[tuple[str, str], float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def on_autoflow(self, event: AutoflowEvent) -> None:
+        with self._lock:
+            for stage, duration in event.timings.items():
+                key = (event.flow, stage)
+                self._samples[key].append(duration)
+                self._counts[key] += 1
+                self._totals[key] += duration
+
+    @staticmethod
+    def _percentile(samples: list[float], percent: float) -> float:
+        index = round(percent / 100 * (len(samples) - 1))
+        return samples[index]
+
+    def summary(self) -> dict[str, dict[str, dict[str, float]]]:
+        """
+        Returns `count`, `mean`, `max` and `p50`/`p90`/`p99` of each stage,
+        grouped by flow. Percentiles and `max` cover the last `max_samples` calls.
+        """
+        result: dict[str, dict[str, dict[str, float]]] = defaultdict(dict)
+        with self._lock:
+            for (flow, stage), recent in self._samples.items():
+                samples = sorted(recent)
+                result[flow][stage] = {
+                    "count": self._counts[(flow, stage)],
+                    "mean": self._totals[(flow, stage)] / self._counts[(flow, stage)],
+                    "max": samples[-1],
+                    "p50": self._percentile(samples, 50),
+                    "p90": self._percentile(samples, 90),
+                    "p99": self._percentile(samples, 99),
+                }
+        return dict(result)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._totals.clear()
+
+
+def emit(hooks, name: str, event: RequestEvent | AutoflowEvent) -> None:
+    """
+    Calls `name` on every hook. A failing hook never breaks the request.
+    """
+    for hook in hooks:
+        try:
+            getattr(hook, name)(event)
+        except Exception:
+            logger.exception("Request hook %r failed on %s", hook, name)
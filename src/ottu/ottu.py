@@ -1,21 +1,61 @@
 from __future__ import annotations
 
+import os
+import weakref
+from collections.abc import Callable, Sequence
+from contextvars import ContextVar
+from types import TracebackType
+
 import httpx
 from httpx import Auth
 
 from . import urls
+from .attachments import AttachmentCache
 from .cards import Card
 from .enums import HTTPMethod, TxnType
+from .hooks import RequestHook
 from .request import OttuPYResponse, RequestResponseHandler
-from .session import Session
+from .session import Attachment, Session
 from .utils.helpers import remove_empty_values
 
 
+class _SessionKey:
+    """
+    Identifies a `(session, session_data)` state of an `Ottu` instance, see
+    `_session_keys`.
+    """
+
+    __slots__ = ("__weakref__",)
+
+
+# The current state of every `isolate_sessions` instance, as
+# `{weakref(instance): key}`. The states themselves are held by the instances
+# (`Ottu._session_states`), so that a context never keeps an instance alive:
+# a state drops with the last context holding its key, and a key with its
+# instance.
+_session_keys: ContextVar[dict[weakref.ref, _SessionKey]] = ContextVar(
+    "ottu_session_keys",
+    default={},
+)
+
+
 class Ottu:
     _session: Session | None = None
+    # Response of the last session call, when `lazy_sessions` is enabled
+    _session_data: dict | None = None
+    _session_handle: Session | None = None
+    # Per thread/task `(session, session_data)`, when `isolate_sessions` is enabled
+    _session_states: (
+        weakref.WeakKeyDictionary[
+            _SessionKey,
+            tuple[Session | None, dict | None],
+        ]
+        | None
+    ) = None
     _card: Card | None = None
     default_timeout: int = 30
     session_cls: type[Session] = Session
+    card_cls: type[Card] = Card
     request_response_handler: type[RequestResponseHandler] = RequestResponseHandler
 
     def __init__(
@@ -25,6 +65,12 @@ class Ottu:
         customer_id: str | None = None,
         is_sandbox: bool = True,
         timeout: int | None = None,
+        hooks: Sequence[RequestHook] | None = None,
+        attachment_cache: AttachmentCache | None = None,
+        lazy_sessions: bool = False,
+        isolate_sessions: bool = False,
+        transport: httpx.BaseTransport | None = None,
+        client_factory: Callable[[], httpx.Client] | None = None,
     ) -> None:
         self.merchant_id = merchant_id
         self.host_url = f"https://{merchant_id}"
@@ -33,12 +79,99 @@ class Ottu:
         self.is_sandbox = is_sandbox
         self.env_type = "sandbox" if is_sandbox else "production"
         self.timeout = timeout or self.default_timeout
+        self.hooks = list(hooks or [])
+        self.attachment_cache = attachment_cache
+        self.lazy_sessions = lazy_sessions
+        # Identity map, so that every session ID has at most one live `Session`
+        self._sessions: weakref.WeakValueDictionary[
+            str,
+            Session,
+        ] = weakref.WeakValueDictionary()
+        if isolate_sessions:
+            self._session_ref = weakref.ref(self)
+            self._session_states = weakref.WeakKeyDictionary()
+
+        # Builds the client instead of `httpx.Client(auth=auth, transport=...)`,
+        # in every process the instance is used in, see `_reset_after_fork()`
+        self.client_factory = client_factory
 
         # Other initializations
-        self.request_session = self.__create_session()
+        if client_factory is None:
+            self._set_client(self.__create_session(transport=transport), transport)
+        else:
+            self._set_client(client_factory())
+
+    def __create_session(
+        self,
+        transport: httpx.BaseTransport | None = None,
+    ) -> httpx.Client:
+        return httpx.Client(auth=self.auth, transport=transport)
+
+    def _set_client(
+        self,
+        client: httpx.Client,
+        transport: httpx.BaseTransport | None = None,
+    ) -> None:
+        self._request_session = client
+        # The process the connections were opened in, see `request_session`
+        self._pid = os.getpid()
+        # A shared transport (eg: of `OttuRegistry`) is closed by its owner
+        self._owns_transport = transport is None
+        # Closes the client if the instance is garbage collected without `close()`
+        self._finalizer = weakref.finalize(self, client.close)
+        if not self._owns_transport:
+            self._finalizer.detach()
+
+    @property
+    def request_session(self) -> httpx.Client:
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+        return self._request_session
+
+    @request_session.setter
+    def request_session(self, client: httpx.Client) -> None:
+        # The previous client is left open, it may still be used elsewhere
+        self._finalizer.detach()
+        self._set_client(client)
+
+    def _reset_after_fork(self) -> None:
+        """
+        Replaces the client inherited from the parent process. Its sockets are
+        shared with the parent, so they are dropped without being closed
+        (closing them could break the connections of the parent). A shared
+        transport is not inherited either, the child gets its own pool.
+
+        The new client is built by `client_factory`, if any, so that it keeps
+        the settings of the parent's client (eg: a custom transport).
+        """
+        self._finalizer.detach()
+        if self.client_factory is None:
+            self._set_client(self.__create_session())
+        else:
+            self._set_client(self.client_factory())
+
+    def close(self) -> None:
+        """
+        Closes the connection pool and the token client of the auth, if any.
+        Safe to call more than once.
+        """
+        self._finalizer.detach()
+        if self._owns_transport:
+            self.request_session.close()
+        close_auth = getattr(self.auth, "close", None)
+        if callable(close_auth):
+            close_auth()
+
+    def __enter__(self):
+        return self
 
-    def __create_session(self) -> httpx.Client:
-        return httpx.Client(auth=self.auth)
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.close()
 
     def send_request(
         self,
@@ -51,6 +184,7 @@ class Ottu:
             method=method,
             url=f"{self.host_url}{path}",
             timeout=self.timeout,
+            hooks=self.hooks,
             **request_params,
         ).process()
 
@@ -58,12 +192,85 @@ class Ottu:
 
     @property
     def session(self):
-        if self._session is None:
-            self._session = self.session_cls(ottu=self)
-        return self._session
+        session, data = self._get_session_state()
+        if data is not None:
+            self._set_session_state(session, None)
+            self._update_session(self._get_or_update_session(data))
+            session, _ = self._get_session_state()
+        if session is None:
+            session = self.session_cls(ottu=self)
+            self._set_session_state(session, None)
+        return session
+
+    @property
+    def isolate_sessions(self) -> bool:
+        return self._session_states is not None
+
+    def _get_session_state(self) -> tuple[Session | None, dict | None]:
+        if self._session_states is None:
+            return self._session, self._session_data
+        key = _session_keys.get().get(self._session_ref)
+        if key is None:
+            return None, None
+        return self._session_states.get(key, (None, None))
+
+    def _set_session_state(self, session: Session | None, data: dict | None) -> None:
+        if self._session_states is None:
+            self._session, self._session_data = session, data
+            return
+        # A new key and mapping are set (never mutated), since the value of a
+        # context variable is shared with the tasks/contexts copied from this
+        # one. The keys of the collected instances are dropped on the way.
+        key = _SessionKey()
+        self._session_states[key] = (session, data)
+        keys = {
+            ref: other
+            for ref, other in _session_keys.get().items()
+            if ref() is not None
+        }
+        keys[self._session_ref] = key
+        _session_keys.set(keys)
+
+    @property
+    def _stateless_session(self) -> Session:
+        """
+        A `Session` without data, for the calls that do not depend on the
+        current session (eg: creating a new one). Unlike `self.session`, this
+        never builds a pending `lazy_sessions` response.
+        """
+        if self._session_handle is None:
+            self._session_handle = self.session_cls(ottu=self)
+        return self._session_handle
 
     def _update_session(self, session: Session) -> None:
-        self._session = session
+        self._set_session_state(session, None)
+
+    def _get_or_update_session(self, data: dict) -> Session:
+        """
+        Returns the `Session` of `data["session_id"]`, updated in place
+        if it already exists.
+        """
+        session_id = data.get("session_id")
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None:
+            session = self.session_cls(ottu=self, **data)
+            if session_id:
+                self._sessions[session_id] = session
+        else:
+            session._set_fields(data)
+        return session
+
+    def _set_session_data(self, data: dict) -> None:
+        """
+        Called with the response of a successful session call.
+        With `lazy_sessions`, the `Session` is only built when
+        `ottu.session` is accessed.
+        """
+        if self.lazy_sessions:
+            session, _ = self._get_session_state()
+            self._set_session_state(session, data)
+        else:
+            self._update_session(self._get_or_update_session(data))
 
     def checkout(
         self,
@@ -80,7 +287,7 @@ class Ottu:
         customer_last_name: str | None = None,
         agreement: dict | None = None,
         card_acceptance_criteria: dict | None = None,
-        attachment: str | None = None,
+        attachment: Attachment | None = None,
         billing_address: dict | None = None,
         due_datetime: str | None = None,
         email_recipients: list[str] | None = None,
@@ -104,7 +311,7 @@ class Ottu:
         """
         a proxy method to `Session.create(...)`
         """
-        return self.session.create(
+        return self._stateless_session.create(
             txn_type=txn_type,
             amount=amount,
             currency_code=currency_code,
@@ -144,12 +351,12 @@ class Ottu:
         token: str,
         session_id: str,
     ):
-        return self.session.auto_debit(token=token, session_id=session_id)
+        return self._stateless_session.auto_debit(token=token, session_id=session_id)
 
     @property
     def cards(self) -> Card:
         if self._card is None:
-            self._card = Card(ottu=self)
+            self._card = self.card_cls(ottu=self)
         return self._card
 
     def checkout_autoflow(
@@ -166,7 +373,7 @@ class Ottu:
         customer_last_name: str | None = None,
         agreement: dict | None = None,
         card_acceptance_criteria: dict | None = None,
-        attachment: str | None = None,
+        attachment: Attachment | None = None,
         billing_address: dict | None = None,
         due_datetime: str | None = None,
         email_recipients: list[str] | None = None,
@@ -235,7 +442,7 @@ class Ottu:
         customer_first_name: str | None = None,
         customer_last_name: str | None = None,
         card_acceptance_criteria: dict | None = None,
-        attachment: str | None = None,
+        attachment: Attachment | None = None,
         billing_address: dict | None = None,
         due_datetime: str | None = None,
         email_recipients: list[str] | None = None,
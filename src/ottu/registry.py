@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+from httpx import Auth
+
+from .ottu import Ottu
+
+# Keys the hashes of `get_auth_key(...)`, which are then only comparable
+# within the process
+_AUTH_KEY_SECRET = os.urandom(32)
+
+
+def get_auth_key(auth: Auth) -> tuple:
+    """
+    Identifies the credentials of an auth instance, so that equal auth
+    objects (eg: `APIKeyAuth("key")` created on every request) share a client.
+
+    The credentials are the `credential_fields` attributes of the auth class,
+    or else its public attributes: the private ones are runtime state (eg:
+    the token client of the Keycloak auth) that must not change the key.
+    They are hashed, so that the registry does not hold them in clear.
+    """
+    fields = getattr(auth, "credential_fields", None)
+    if fields is None:
+        fields = sorted(
+            name
+            for name, value in vars(auth).items()
+            if not name.startswith("_") and not isinstance(value, httpx.Client)
+        )
+    digest = hmac.new(_AUTH_KEY_SECRET, digestmod=hashlib.sha256)
+    for name in fields:
+        digest.update(repr((name, getattr(auth, name, None))).encode())
+    return type(auth).__module__, type(auth).__qualname__, digest.hexdigest()
+
+
+class OttuRegistry:
+    """
+    Caches `Ottu` instances by `(merchant_id, auth, is_sandbox)`.
+
+    All the instances share a single HTTP transport, that is, one connection
+    pool. Instances that were not used for `idle_timeout` seconds are dropped,
+    and at most `max_clients` instances are kept (least recently used first).
+    The instances are created with `isolate_sessions=True` by default, since
+    they are shared by the threads/tasks of the application.
+
+    Usage:
+        registry = OttuRegistry(idle_timeout=600, timeout=10)
+
+        def view(request):
+            ottu = registry.get(merchant_id=..., auth=APIKeyAuth(...))
+            ottu.checkout(...)
+
+        # on shutdown
+        registry.close()
+    """
+
+    ottu_cls: type[Ottu] = Ottu
+
+    def __init__(
+        self,
+        idle_timeout: float | None = 300,
+        max_clients: int | None = None,
+        transport: httpx.BaseTransport | None = None,
+        **ottu_kwargs,
+    ):
+        self.idle_timeout = idle_timeout
+        self.max_clients = max_clients
+        # Only a transport created here is closed by `close()`
+        self._owns_transport = transport is None
+        self.transport = transport or httpx.HTTPTransport()
+        self.ottu_kwargs = {"isolate_sessions": True, **ottu_kwargs}
+        self._clients: OrderedDict[tuple, tuple[Ottu, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._pid = os.getpid()
+
+    def get_key(self, merchant_id: str, auth: Auth, is_sandbox: bool) -> tuple:
+        return merchant_id, get_auth_key(auth), is_sandbox
+
+    def get(self, merchant_id: str, auth: Auth, is_sandbox: bool = True) -> Ottu:
+        key = self.get_key(merchant_id, auth, is_sandbox)
+        now = time.monotonic()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The registry is closed")
+            if self._pid != os.getpid():
+                self._reset_after_fork()
+            self._evict_idle(now)
+            entry = self._clients.get(key)
+            if entry is None:
+                ottu = self.ottu_cls(
+                    merchant_id=merchant_id,
+                    auth=auth,
+                    is_sandbox=is_sandbox,
+                    transport=self.transport,
+                    **self.ottu_kwargs,
+                )
+            else:
+                ottu = entry[0]
+            self._clients[key] = (ottu, now)
+            self._clients.move_to_end(key)
+            if self.max_clients is not None:
+                while len(self._clients) > self.max_clients:
+                    _, (evicted, _) = self._clients.popitem(last=False)
+                    evicted.close()
+        return ottu
+
+    def _reset_after_fork(self) -> None:
+        # The instances and the pool inherited from the parent process share
+        # their sockets with it, they are dropped without being closed.
+        self._clients.clear()
+        self.transport = httpx.HTTPTransport()
+        self._owns_transport = True
+        self._pid = os.getpid()
+
+    def _evict_idle(self, now: float) -> None:
+        if self.idle_timeout is None:
+            return
+        # Ordered from the least recently used
+        while self._clients:
+            key, (_, last_used) = next(iter(self._clients.items()))
+            if now - last_used < self.idle_timeout:
+                break
+            ottu, _ = self._clients.pop(key)
+            ottu.close()
+
+    def evict_idle(self) -> None:
+        with self._lock:
+            self._evict_idle(time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def close(self) -> None:
+        """
+        Closes all the instances and the shared connection pool.
+        """
+        with self._lock:
+            self._closed = True
+            for ottu, _ in self._clients.values():
+                # Leaves the shared transport open, see `Ottu.close()`
+                ottu.close()
+            self._clients.clear()
+        if self._owns_transport:
+            self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
 import logging
+import random
+import time
+from collections.abc import Sequence
 from json import JSONDecodeError
 from urllib.parse import urlparse
 
 import httpx
 
+from .hooks import RequestEvent, RequestHook, emit
 from .mixins import ResponseMixin
 
 logger = logging.getLogger("ottu-py")
@@ -18,17 +22,37 @@ class OttuPYResponse(ResponseMixin):
 class BaseRequestResponseHandler:
     """Base class for shared functionality between sync and async handlers."""
 
+    # Logging
+    # Fraction of successful request/response pairs to log. Errors are always logged.
+    log_sample_rate: float = 1.0
+    # Maximum length of each logged request argument, `None` disables truncation.
+    log_max_length: int | None = 1000
+    # Keys (case-insensitive) whose values are masked in request bodies and headers.
+    log_redacted_fields: frozenset[str] = frozenset(
+        {
+            "authorization",
+            "token",
+            "password",
+            "client_secret",
+            "api_key",
+            "signature",
+        },
+    )
+
     def __init__(
         self,
         session: httpx.Client | httpx.AsyncClient,
         method: str,
         url: str,
+        hooks: Sequence[RequestHook] = (),
         **kwargs,
     ):
         self.session = session
         self.method = method
         self.url = url
+        self.hooks = hooks
         self.kwargs = kwargs
+        self._sampled: bool | None = None
 
     @property
     def path(self) -> str:
@@ -37,6 +61,25 @@ class BaseRequestResponseHandler:
         """
         return urlparse(self.url).path
 
+    def create_event(self) -> RequestEvent:
+        parsed_url = urlparse(self.url)
+        return RequestEvent(
+            merchant_id=parsed_url.netloc,
+            method=getattr(self.method, "value", self.method),
+            path=parsed_url.path,
+        )
+
+    def _emit_response(self, event: RequestEvent, response: httpx.Response) -> None:
+        event.status_code = response.status_code
+        request_bytes = response.request.headers.get("Content-Length")
+        event.request_bytes = int(request_bytes) if request_bytes else 0
+        event.response_bytes = len(response.content)
+        emit(self.hooks, "on_response", event)
+
+    def _emit_error(self, event: RequestEvent, exc: Exception) -> None:
+        event.error = exc
+        emit(self.hooks, "on_error", event)
+
     def _process_response(self, response: httpx.Response) -> dict:
         if response.status_code == 204:
             return {}
@@ -100,21 +143,109 @@ class BaseRequestResponseHandler:
             error={"detail": str(exc)},
         )
 
+    @property
+    def sampled(self) -> bool:
+        """
+        Whether this request/response pair is picked by `log_sample_rate`.
+        Decided once, so that a request and its response are logged together.
+        """
+        if self._sampled is None:
+            self._sampled = (
+                self.log_sample_rate >= 1 or random.random() < self.log_sample_rate
+            )
+        return self._sampled
+
+    def should_log(self, level: int) -> bool:
+        if not logger.isEnabledFor(level):
+            return False
+        return level >= logging.WARNING or self.sampled
+
+    @property
+    def log_extra(self) -> dict:
+        return {
+            "ottu_method": getattr(self.method, "value", self.method),
+            "ottu_path": self.path,
+        }
+
+    def _redact(self, value):
+        if isinstance(value, dict):
+            return {
+                k: (
+                    "********"
+                    if str(k).lower() in self.log_redacted_fields
+                    else self._redact(v)
+                )
+                for k, v in value.items()
+            }
+        if isinstance(value, (list, tuple)):
+            return [self._redact(v) for v in value]
+        if isinstance(value, str):
+            return self._truncate(value)
+        return value
+
+    def _describe_file(self, value) -> str:
+        # `(filename, content, ...)` tuple or a bare file-like/bytes object
+        if isinstance(value, tuple):
+            name, content = value[0], value[1]
+        else:
+            name, content = "", value
+        if isinstance(content, bytes | bytearray | memoryview):
+            return f"<file {name!r} ({len(content)} bytes)>"
+        return f"<file {name!r}>"
+
+    def _truncate(self, text: str) -> str:
+        if self.log_max_length is not None and len(text) > self.log_max_length:
+            return f"{text[:self.log_max_length]}...<truncated {len(text)} chars>"
+        return text
+
+    def get_log_kwargs(self) -> dict:
+        """
+        Returns `self.kwargs` in a form that is safe to log: secrets are masked,
+        attachments and raw bodies are summarized and long strings are truncated.
+        """
+        log_kwargs = {}
+        for key, value in self.kwargs.items():
+            if key == "files" and isinstance(value, dict):
+                value = {k: self._describe_file(v) for k, v in value.items()}
+            elif key in ("content", "data") and isinstance(value, bytes | str):
+                value = f"<{len(value)} bytes>"
+            else:
+                value = self._redact(value)
+            log_kwargs[key] = value
+        return log_kwargs
+
     def _log_request(self):
+        if not self.should_log(logging.INFO):
+            return
         logger.info(
-            f"Sending {self.method} request to {self.url} with args {self.kwargs}",
+            "Sending %s request to %s with args %s",
+            self.method,
+            self.url,
+            self.get_log_kwargs(),
+            extra=self.log_extra,
         )
 
     def _log_response(self, response: OttuPYResponse):
+        level = logging.INFO if response.success else logging.ERROR
+        if not self.should_log(level):
+            return
+        extra = {**self.log_extra, "ottu_status_code": response.status_code}
         if response.success:
             logger.info(
-                f"Received {response.status_code} response "
-                f"from {self.url} with args {self.kwargs}",
+                "Received %s response from %s with args %s",
+                response.status_code,
+                self.url,
+                self.get_log_kwargs(),
+                extra=extra,
             )
         else:
             logger.error(
-                f"Received {response.status_code} response "
-                f"from {self.url} with args {self.kwargs}. Error: {response.error}",
+                "Received %s response from %s with args %s. Error: %s",
+                response.status_code,
+                self.url,
+                self.get_log_kwargs(),
+                self._redact(response.error),
+                extra=extra,
             )
 
 
@@ -125,14 +256,35 @@ class RequestResponseHandler(BaseRequestResponseHandler):
         super().__init__(session, method, url, **kwargs)
         self.session: httpx.Client = session
 
-    def _process(self) -> OttuPYResponse:
+    def _send(self) -> httpx.Response:
+        if not self.hooks:
+            return self.session.request(
+                method=self.method,
+                url=self.url,
+                **self.kwargs,
+            )
+
+        event = self.create_event()
+        emit(self.hooks, "on_request", event)
+        start = time.perf_counter()
         try:
-            self._log_request()
             response = self.session.request(
                 method=self.method,
                 url=self.url,
                 **self.kwargs,
             )
+        except Exception as exc:
+            event.latency = time.perf_counter() - start
+            self._emit_error(event, exc)
+            raise
+        event.latency = time.perf_counter() - start
+        self._emit_response(event, response)
+        return response
+
+    def _process(self) -> OttuPYResponse:
+        try:
+            self._log_request()
+            response = self._send()
             return self.process_response(response)
         except httpx.HTTPError as exc:
             return self.process_httpx_error(exc)
@@ -1,11 +1,19 @@
 from __future__ import annotations
 
+import io
 import logging
+import os
+import time
 import typing
+from collections.abc import Callable, Collection, Iterable, Iterator
+from contextlib import contextmanager
 
+from .attachments import AttachmentCache
+from .bulk import BulkAutoDebit, BulkCheckout, BulkResult, BulkSummary
 from .decorators import interruption_handler
 from .enums import HTTPMethod, TxnType
 from .errors import APIInterruptError, ValidationError
+from .hooks import AutoflowEvent, emit
 from .mixins import AsDictMixin
 from .request import OttuPYResponse
 from .utils.dataclasses import dynamic_dataclass
@@ -16,6 +24,10 @@ if typing.TYPE_CHECKING:
 
 logger = logging.getLogger("ottu-py")
 
+# A path, raw bytes, a binary file-like object, an iterable of byte chunks
+# or a ready-made `(filename, content)` tuple as accepted by httpx.
+Attachment = str | os.PathLike | bytes | typing.IO[bytes] | Iterable[bytes] | tuple
+
 
 @dynamic_dataclass
 class PaymentMethod(AsDictMixin):
@@ -35,6 +47,54 @@ class PaymentMethod(AsDictMixin):
         return f"PaymentMethod({self.code or '######'})"
 
 
+class IterableReader(io.RawIOBase):
+    """
+    Read-only, non-seekable file-like view over an iterable of byte chunks,
+    so that generators can be streamed as multipart uploads.
+    """
+
+    def __init__(self, iterable: Iterable[bytes]):
+        self._iterator = iter(iterable)
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = bytes(next(self._iterator))
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class StageTimer:
+    """
+    Collects the duration of the named stages of an autoflow operation.
+    """
+
+    def __init__(self):
+        self.timings: dict[str, float] = {}
+        self.success = False
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+    def stop(self) -> dict[str, float]:
+        self.timings["total"] = time.perf_counter() - self._start
+        return self.timings
+
+
 class Session:
     url_session_create = "/b/checkout/v1/pymt-txn/"
     url_ops = "/b/pbl/v2/operation/"
@@ -63,7 +123,6 @@ class Session:
     notifications: dict | None = None
     operation: str | None = None
     order_no: str | None = None
-    payment_methods: list[PaymentMethod] | None = None
     pg_codes: list[str] | None = None
     qr_code_url: str | None = None
     redirect_url: str | None = None
@@ -74,19 +133,32 @@ class Session:
     vendor_name: str | None = None
     webhook_url: str | None = None
 
+    # Raw `payment_methods` of the response until they are accessed
+    _payment_methods: list | None = None
+
     def __init__(self, ottu: Ottu, **data):
         self.ottu = ottu
+        self._set_fields(data)
+
+    def _set_fields(self, data: dict) -> None:
         for field, value in data.items():
             setattr(self, field, value)
 
-        payment_methods = getattr(self, "payment_methods", [])
-        if payment_methods:
-            self.payment_methods = [
+    @property
+    def payment_methods(self) -> list[PaymentMethod] | None:
+        payment_methods = self._payment_methods
+        if payment_methods and isinstance(payment_methods[0], dict):
+            payment_methods = self._payment_methods = [
                 PaymentMethod(
                     **payment_method,
                 )
                 for payment_method in payment_methods
             ]
+        return payment_methods
+
+    @payment_methods.setter
+    def payment_methods(self, value: list | None) -> None:
+        self._payment_methods = value
 
     def __repr__(self):
         return f"Session({self.session_id or '######'})"
@@ -133,11 +205,78 @@ class Session:
             {field: getattr(self, field, "") for field in fields},
         )
 
-    def __path_to_file(self, path: str) -> tuple[str, bytes]:
-        with open(path, "rb") as f:
-            content = f.read()
-            name = f.name or "attachment.pdf"
-        return name, content
+    @contextmanager
+    def _open_attachment(self, attachment: Attachment) -> Iterator[tuple]:
+        """
+        Yields an httpx `(filename, content)` file tuple for the attachment.
+
+        Files are passed to httpx as open handles, which streams them in chunks
+        instead of reading the whole file into memory.
+        """
+        if isinstance(attachment, tuple):
+            yield attachment
+        elif isinstance(attachment, (str, os.PathLike)):
+            with open(attachment, "rb") as f:
+                yield f.name or "attachment.pdf", f
+        elif isinstance(attachment, (bytes, bytearray, memoryview)):
+            yield "attachment.pdf", bytes(attachment)
+        elif hasattr(attachment, "read"):
+            name = os.path.basename(str(getattr(attachment, "name", "") or ""))
+            yield name or "attachment.pdf", attachment
+        else:
+            yield "attachment.pdf", IterableReader(attachment)
+
+    def _send_session_request(
+        self,
+        path: str,
+        method: str,
+        payload: dict,
+        attachment: Attachment | None = None,
+    ) -> OttuPYResponse:
+        if not attachment:
+            return self.ottu.send_request(path=path, method=method, json=payload)
+        cache = self.ottu.attachment_cache
+        if cache is not None and cache.supports(attachment):
+            return self._send_cached_attachment(
+                cache=cache,
+                path=path,
+                method=method,
+                payload=payload,
+                attachment=attachment,
+            )
+        with self._open_attachment(attachment) as file:
+            return self.ottu.send_request(
+                path=path,
+                method=method,
+                data=payload,
+                files={"attachment": file},
+            )
+
+    def _send_cached_attachment(
+        self,
+        cache: AttachmentCache,
+        path: str,
+        method: str,
+        payload: dict,
+        attachment: str | os.PathLike | bytes,
+    ) -> OttuPYResponse:
+        cached = cache.get(attachment)
+        reference = cache.get_reference(cached.digest)
+        if reference and cache.reference_field:
+            return self.ottu.send_request(
+                path=path,
+                method=method,
+                json={**payload, cache.reference_field: reference},
+            )
+        response = self.ottu.send_request(
+            path=path,
+            method=method,
+            data=payload,
+            files={"attachment": (cached.filename, cached.content)},
+        )
+        if response.success and isinstance(response.response, dict):
+            cache.remember_upload(cached.digest, response.response.get("attachment"))
+        return response
 
     def create(
         self,
@@ -154,7 +293,7 @@ class Session:
         customer_last_name: str | None = None,
         agreement: dict | None = None,
         card_acceptance_criteria: dict | None = None,
-        attachment: str | None = None,
+        attachment: Attachment | None = None,
         billing_address: dict | None = None,
         due_datetime: str | None = None,
         email_recipients: list[str] | None = None,
@@ -188,7 +327,7 @@ class Session:
         :param customer_last_name: Customer last name
         :param agreement: Agreement
         :param card_acceptance_criteria: Card acceptance criteria
-        :param attachment: Path to attachment
+        :param attachment: Path, bytes, binary file object or iterable of bytes
         :param billing_address: Billing address
         :param due_datetime: Due datetime
         :param email_recipients: Email recipients
@@ -252,28 +391,86 @@ class Session:
         }
         payload = remove_empty_values(payload)
         payload.update(kwargs)  # `kwargs` may contain `None` values
-        if attachment:
-            json_or_form = {
-                "data": payload,
-                "files": {"attachment": self.__path_to_file(path=attachment)},
-            }
-        else:
-            json_or_form = {
-                "json": payload,
-            }
-        ottu_py_response = self.ottu.send_request(
+        ottu_py_response = self._send_session_request(
             path=self.url_session_create,
             method=HTTPMethod.POST,
-            **json_or_form,
-        )
-        session = Session(
-            ottu=self.ottu,
-            **ottu_py_response.response,
+            payload=payload,
+            attachment=attachment,
         )
         if ottu_py_response.success:
-            self.ottu._update_session(session)
+            self.ottu._set_session_data(ottu_py_response.response)
         return ottu_py_response.as_dict()
 
+    def bulk_create(
+        self,
+        records: Iterable[dict],
+        sink: Callable[[BulkResult], None] | None = None,
+        concurrency: int = 8,
+        rate_limit: float | None = None,
+        completed: Collection[str] | None = None,
+        key_field: str = "order_no",
+        dry_run: bool = False,
+    ) -> BulkSummary:
+        """
+        Creates a checkout session for every record, concurrently.
+        :param records: Iterable of `create(...)` keyword arguments. `txn_type`
+            may be given as a string, eg: "payment_request"
+        :param sink: Called (from the calling thread) with the `BulkResult` of
+            every record as soon as it is known, eg: `JSONLinesSink(path)`
+        :param concurrency: Maximum number of requests in flight
+        :param rate_limit: Maximum number of requests per second
+        :param completed: Keys of the records to skip, eg: the successful
+            records of an interrupted run, see `load_completed_keys(path)`
+        :param key_field: Record field that identifies a record, falls back
+            to the position of the record in `records`
+        :param dry_run: Only validate the records, nothing is sent to Ottu
+        :return: BulkSummary
+        """
+        bulk = BulkCheckout(
+            session=self,
+            concurrency=concurrency,
+            rate_limit=rate_limit,
+            key_field=key_field,
+        )
+        return bulk.run(
+            records=records,
+            sink=sink,
+            completed=completed,
+            dry_run=dry_run,
+        )
+
+    def bulk_auto_debit(
+        self,
+        records: Iterable[dict],
+        sink: Callable[[BulkResult], None] | None = None,
+        concurrency: int = 8,
+        rate_limit: float | None = None,
+        completed: Collection[str] | None = None,
+        key_field: str = "order_no",
+        dry_run: bool = False,
+        token_batch_size: int = 500,
+    ) -> BulkSummary:
+        """
+        Runs `auto_debit_autoflow(...)` for every record, concurrently, eg: to
+        renew subscriptions. The tokens that are not given in the records are
+        fetched with one `get_tokens_from_db(...)` call per `token_batch_size`
+        records. The other parameters are the same as `bulk_create(...)`.
+        :return: BulkSummary
+        """
+        bulk = BulkAutoDebit(
+            session=self,
+            concurrency=concurrency,
+            rate_limit=rate_limit,
+            key_field=key_field,
+            token_batch_size=token_batch_size,
+        )
+        return bulk.run(
+            records=records,
+            sink=sink,
+            completed=completed,
+            dry_run=dry_run,
+        )
+
     def retrieve(self, session_id: str) -> dict:
         """
         Retrieves a checkout session.
@@ -283,12 +480,8 @@ class Session:
             path=f"{self.url_session_create}{session_id}",
             method=HTTPMethod.GET,
         )
-        session = Session(
-            ottu=self.ottu,
-            **ottu_py_response.response,
-        )
         if ottu_py_response.success:
-            self.ottu._update_session(session)
+            self.ottu._set_session_data(ottu_py_response.response)
         return ottu_py_response.as_dict()
 
     def refresh(self, session_id: str | None = None) -> dict | None:
@@ -313,7 +506,7 @@ class Session:
         customer_phone: str | None = None,
         customer_first_name: str | None = None,
         customer_last_name: str | None = None,
-        attachment: str | None = None,
+        attachment: Attachment | None = None,
         billing_address: dict | None = None,
         due_datetime: str | None = None,
         email_recipients: list[str] | None = None,
@@ -362,23 +555,14 @@ class Session:
         }
         payload = remove_empty_values(payload)
         payload.update(kwargs)  # `kwargs` may contain `None` values
-        if attachment:
-            json_or_form = {
-                "data": payload,
-                "files": {"attachment": self.__path_to_file(path=attachment)},
-            }
-        else:
-            json_or_form = {
-                "json": payload,
-            }
-        ottu_py_response = self.ottu.send_request(
+        ottu_py_response = self._send_session_request(
             path=f"{self.url_session_create}{self.session_id}",
             method=HTTPMethod.PATCH,
-            **json_or_form,
+            payload=payload,
+            attachment=attachment,
         )
-        session = Session(ottu=self.ottu, **ottu_py_response.response)
         if ottu_py_response.success:
-            self.ottu._update_session(session)
+            self.ottu._set_session_data(ottu_py_response.response)
         return ottu_py_response.as_dict()
 
     def auto_debit(self, token: str, session_id: str) -> dict:
@@ -578,6 +762,49 @@ class Session:
     def get_token_from_db(self, agreement, customer_id) -> str:
         raise NotImplementedError("Please implement this method in your subclass")
 
+    def get_tokens_from_db(
+        self,
+        pairs: Iterable[tuple[str, str]],
+    ) -> dict[tuple[str, str], str]:
+        """
+        Resolves the tokens of many `(customer_id, agreement_id)` pairs.
+        Returns a mapping of the pairs to their token, the pairs without a
+        token are left out.
+
+        This calls `get_token_from_db(...)` for every pair, override it to
+        fetch all the tokens at once.
+        """
+        tokens = {}
+        for customer_id, agreement_id in pairs:
+            try:
+                tokens[(customer_id, agreement_id)] = self.get_token_from_db(
+                    agreement={"id": agreement_id},
+                    customer_id=customer_id,
+                )
+            except APIInterruptError:
+                continue
+        return tokens
+
+    @contextmanager
+    def _autoflow_timer(self, flow: str) -> Iterator[StageTimer]:
+        """
+        Times the stages of an autoflow operation and reports them to
+        the `on_autoflow` hooks of the `Ottu` instance, even on failure.
+        """
+        timer = StageTimer()
+        try:
+            yield timer
+        finally:
+            timings = timer.stop()
+            if self.ottu.hooks:
+                event = AutoflowEvent(
+                    merchant_id=self.ottu.merchant_id,
+                    flow=flow,
+                    timings=timings,
+                    success=timer.success,
+                )
+                emit(self.ottu.hooks, "on_autoflow", event)
+
     @interruption_handler
     def checkout_autoflow(
         self,
@@ -593,7 +820,7 @@ class Session:
         customer_last_name: str | None = None,
         agreement: dict | None = None,
         card_acceptance_criteria: dict | None = None,
-        attachment: str | None = None,
+        attachment: Attachment | None = None,
         billing_address: dict | None = None,
         due_datetime: str | None = None,
         email_recipients: list[str] | None = None,
@@ -614,42 +841,47 @@ class Session:
         include_sdk_setup_preload: bool | None = None,
         checkout_extra_args: dict | None = None,
     ):
-        pg_codes = self.get_pg_codes(plugin=txn_type, currency=currency_code)
-        checkout_extra_args = checkout_extra_args or {}
-        return self.create(
-            txn_type=txn_type,
-            amount=amount,
-            currency_code=currency_code,
-            pg_codes=pg_codes,
-            payment_type=payment_type,
-            customer_id=customer_id,
-            customer_email=customer_email,
-            customer_phone=customer_phone,
-            customer_first_name=customer_first_name,
-            customer_last_name=customer_last_name,
-            agreement=agreement,
-            card_acceptance_criteria=card_acceptance_criteria,
-            attachment=attachment,
-            billing_address=billing_address,
-            due_datetime=due_datetime,
-            email_recipients=email_recipients,
-            expiration_time=expiration_time,
-            extra=extra,
-            generate_qr_code=generate_qr_code,
-            language=language,
-            mode=mode,
-            notifications=notifications,
-            order_no=order_no,
-            product_type=product_type,
-            redirect_url=redirect_url,
-            shopping_address=shopping_address,
-            shortify_attachment_url=shortify_attachment_url,
-            shortify_checkout_url=shortify_checkout_url,
-            vendor_name=vendor_name,
-            webhook_url=webhook_url,
-            include_sdk_setup_preload=include_sdk_setup_preload,
-            **checkout_extra_args,
-        )
+        with self._autoflow_timer(flow="checkout_autoflow") as timer:
+            with timer.stage("payment_methods"):
+                pg_codes = self.get_pg_codes(plugin=txn_type, currency=currency_code)
+            checkout_extra_args = checkout_extra_args or {}
+            with timer.stage("session_create"):
+                response = self.create(
+                    txn_type=txn_type,
+                    amount=amount,
+                    currency_code=currency_code,
+                    pg_codes=pg_codes,
+                    payment_type=payment_type,
+                    customer_id=customer_id,
+                    customer_email=customer_email,
+                    customer_phone=customer_phone,
+                    customer_first_name=customer_first_name,
+                    customer_last_name=customer_last_name,
+                    agreement=agreement,
+                    card_acceptance_criteria=card_acceptance_criteria,
+                    attachment=attachment,
+                    billing_address=billing_address,
+                    due_datetime=due_datetime,
+                    email_recipients=email_recipients,
+                    expiration_time=expiration_time,
+                    extra=extra,
+                    generate_qr_code=generate_qr_code,
+                    language=language,
+                    mode=mode,
+                    notifications=notifications,
+                    order_no=order_no,
+                    product_type=product_type,
+                    redirect_url=redirect_url,
+                    shopping_address=shopping_address,
+                    shortify_attachment_url=shortify_attachment_url,
+                    shortify_checkout_url=shortify_checkout_url,
+                    vendor_name=vendor_name,
+                    webhook_url=webhook_url,
+                    include_sdk_setup_preload=include_sdk_setup_preload,
+                    **checkout_extra_args,
+                )
+            timer.success = response["success"]
+            return response
 
     @interruption_handler
     def auto_debit_autoflow(
@@ -666,7 +898,7 @@ class Session:
         customer_first_name: str | None = None,
         customer_last_name: str | None = None,
         card_acceptance_criteria: dict | None = None,
-        attachment: str | None = None,
+        attachment: Attachment | None = None,
         billing_address: dict | None = None,
         due_datetime: str | None = None,
         email_recipients: list[str] | None = None,
@@ -693,48 +925,58 @@ class Session:
         identifying the "latest" payment method and the token.
         """
         checkout_extra_args = checkout_extra_args or {}
-        if not token:
-            token = self.get_token_from_db(agreement=agreement, customer_id=customer_id)
-        if not pg_codes:
-            pg_codes = self.get_auto_debit_pg_codes(
-                plugin=txn_type,
-                currency=currency_code,
-            )
-        checkout_response = self.create(
-            txn_type=txn_type,
-            amount=amount,
-            currency_code=currency_code,
-            pg_codes=pg_codes,
-            payment_type="auto_debit",
-            customer_id=customer_id,
-            customer_email=customer_email,
-            customer_phone=customer_phone,
-            customer_first_name=customer_first_name,
-            customer_last_name=customer_last_name,
-            agreement=agreement,
-            card_acceptance_criteria=card_acceptance_criteria,
-            attachment=attachment,
-            billing_address=billing_address,
-            due_datetime=due_datetime,
-            email_recipients=email_recipients,
-            expiration_time=expiration_time,
-            extra=extra,
-            generate_qr_code=generate_qr_code,
-            language=language,
-            mode=mode,
-            notifications=notifications,
-            order_no=order_no,
-            product_type=product_type,
-            redirect_url=redirect_url,
-            shopping_address=shopping_address,
-            shortify_attachment_url=shortify_attachment_url,
-            shortify_checkout_url=shortify_checkout_url,
-            vendor_name=vendor_name,
-            webhook_url=webhook_url,
-            include_sdk_setup_preload=include_sdk_setup_preload,
-            **checkout_extra_args,
-        )
-        if not checkout_response["success"]:
-            raise APIInterruptError(**checkout_response)
-        session_id = checkout_response["response"]["session_id"]
-        return self.auto_debit(token=token, session_id=session_id)
+        with self._autoflow_timer(flow="auto_debit_autoflow") as timer:
+            if not token:
+                with timer.stage("token_lookup"):
+                    token = self.get_token_from_db(
+                        agreement=agreement,
+                        customer_id=customer_id,
+                    )
+            if not pg_codes:
+                with timer.stage("payment_methods"):
+                    pg_codes = self.get_auto_debit_pg_codes(
+                        plugin=txn_type,
+                        currency=currency_code,
+                    )
+            with timer.stage("session_create"):
+                checkout_response = self.create(
+                    txn_type=txn_type,
+                    amount=amount,
+                    currency_code=currency_code,
+                    pg_codes=pg_codes,
+                    payment_type="auto_debit",
+                    customer_id=customer_id,
+                    customer_email=customer_email,
+                    customer_phone=customer_phone,
+                    customer_first_name=customer_first_name,
+                    customer_last_name=customer_last_name,
+                    agreement=agreement,
+                    card_acceptance_criteria=card_acceptance_criteria,
+                    attachment=attachment,
+                    billing_address=billing_address,
+                    due_datetime=due_datetime,
+                    email_recipients=email_recipients,
+                    expiration_time=expiration_time,
+                    extra=extra,
+                    generate_qr_code=generate_qr_code,
+                    language=language,
+                    mode=mode,
+                    notifications=notifications,
+                    order_no=order_no,
+                    product_type=product_type,
+                    redirect_url=redirect_url,
+                    shopping_address=shopping_address,
+                    shortify_attachment_url=shortify_attachment_url,
+                    shortify_checkout_url=shortify_checkout_url,
+                    vendor_name=vendor_name,
+                    webhook_url=webhook_url,
+                    include_sdk_setup_preload=include_sdk_setup_preload,
+                    **checkout_extra_args,
+                )
+            if not checkout_response["success"]:
+                raise APIInterruptError(**checkout_response)
+            session_id = checkout_response["response"]["session_id"]
+            with timer.stage("auto_debit"):
+                response = self.auto_debit(token=token, session_id=session_id)
+            timer.success = response["success"]
+            return response
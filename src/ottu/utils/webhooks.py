@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import hashlib
 import hmac
+import threading
 
 # Standard 18 flat top-level fields — the default signing contract used by all
 # Ottu merchants. ``key+value`` concatenation, no delimiter, sorted by field name.
@@ -103,3 +104,78 @@ def calculate_subscription_hmac_signature(payload: dict, hmac_key: str) -> str:
         parts.append(f"{path}={value}")
     message = "\n".join(parts)
     return _hmac_digest(message, hmac_key)
+
+
+# Scheme name -> signer. Order is the default probing order, which matches the
+# order `verify_signature` tries the schemes in.
+SIGNATURE_SCHEMES = {
+    "standard": calculate_hmac_signature,
+    "subscription": calculate_subscription_hmac_signature,
+}
+
+
+class SignatureVerifier:
+    """
+    Adaptive drop-in for `verify_signature(...)`.
+
+    Remembers which scheme last verified a webhook for a given webhook key,
+    merchant (``extra.merchant_id``) and ``payment_type`` and tries that scheme
+    first next time. For merchants that only ever send subscription webhooks this
+    avoids computing the standard HMAC on every call.
+
+    ``counters`` holds how many payloads matched each scheme, plus the number of
+    payloads that could not be verified (``"unverified"``).
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.counters: dict[str, int] = dict.fromkeys(
+            [*SIGNATURE_SCHEMES, "unverified"],
+            0,
+        )
+        self._preferred: dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_cache_key(payload: dict, webhook_key: str) -> tuple:
+        merchant_id = _resolve_path(payload, "extra.merchant_id")
+        if merchant_id is _MISSING:
+            merchant_id = None
+        return webhook_key, merchant_id, payload.get("payment_type")
+
+    def get_schemes(self, cache_key: tuple) -> list[str]:
+        preferred = self._preferred.get(cache_key)
+        if preferred is None:
+            return list(SIGNATURE_SCHEMES)
+        return [preferred, *(s for s in SIGNATURE_SCHEMES if s != preferred)]
+
+    def remember(self, cache_key: tuple, scheme: str) -> None:
+        with self._lock:
+            self.counters[scheme] += 1
+            if self._preferred.get(cache_key) == scheme:
+                return
+            if cache_key not in self._preferred:
+                while len(self._preferred) >= self.max_entries:
+                    # Drop the oldest entry; dicts preserve insertion order.
+                    self._preferred.pop(next(iter(self._preferred)))
+            self._preferred[cache_key] = scheme
+
+    def verify(self, payload: dict, signature: str, webhook_key: str) -> bool:
+        cache_key = self.get_cache_key(payload=payload, webhook_key=webhook_key)
+        for scheme in self.get_schemes(cache_key):
+            calculated = SIGNATURE_SCHEMES[scheme](
+                payload=payload,
+                hmac_key=webhook_key,
+            )
+            if hmac.compare_digest(calculated, signature):
+                self.remember(cache_key=cache_key, scheme=scheme)
+                return True
+        with self._lock:
+            self.counters["unverified"] += 1
+        return False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._preferred.clear()
+            for scheme in self.counters:
+                self.counters[scheme] = 0
@@ -1,8 +1,11 @@
+import asyncio
+
 import pytest
 
 from ottu import OttuAsync
 from ottu.enums import TxnType
 from tests.test_ottu.test_ottu.mixins import OttuAutoDebitMixin, OttuCheckoutMixin
+from tests.test_ottu.test_ottu.test_ottu import add_session_callback
 
 
 class TestOttuAsyncAutoDebit(OttuAutoDebitMixin):
@@ -391,3 +394,28 @@ class TestAsyncSessionPSQ:
         assert response["status_code"] == status_code
         assert response["error"] == {"detail": "error from upstream"}
         assert response["response"] == {}
+
+
+class TestOttuAsyncSessionIsolation:
+    @pytest.mark.asyncio
+    async def test_tasks(self, httpx_mock, auth_api_key, payload_minimal_checkout):
+        add_session_callback(httpx_mock)
+        ottu = OttuAsync(
+            merchant_id="test.ottu.dev",
+            auth=auth_api_key,
+            isolate_sessions=True,
+        )
+        created = asyncio.Event()
+
+        async def checkout(order_no):
+            await ottu.checkout(order_no=order_no, **payload_minimal_checkout)
+            if order_no == "2":
+                created.set()
+            else:
+                # the other task creates its session in the meantime
+                await created.wait()
+            return ottu.session.session_id
+
+        async with ottu:
+            results = await asyncio.gather(checkout("1"), checkout("2"))
+        assert results == ["session-1", "session-2"]
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from benchmarks import token_lookup
+from benchmarks.__main__ import main
+from benchmarks.suite import BENCHMARKS, BenchmarkConfig, find_regressions, run
+
+
+class TestBenchmarks:
+    def test_run_all(self):
+        record = run(BenchmarkConfig(iterations=3, warmup=1, concurrency=2))
+        assert set(record["results"]) == set(BENCHMARKS)
+        for result in record["results"].values():
+            assert result["iterations"] == 3
+            assert result["ops_per_sec"] > 0
+            assert result["p50_us"] <= result["p99_us"]
+
+    def test_find_regressions(self):
+        baseline = {"results": {"checkout": {"p50_us": 100.0, "ops_per_sec": 50.0}}}
+        record = {"results": {"checkout": {"p50_us": 130.0, "ops_per_sec": 45.0}}}
+        assert find_regressions(record, baseline, max_regression=0.5) == []
+        assert len(find_regressions(record, baseline, max_regression=0.25)) == 1
+        assert (
+            find_regressions(
+                record,
+                baseline,
+                max_regression=0.05,
+                metric="ops_per_sec",
+            )
+            != []
+        )
+
+    def test_new_benchmark_is_not_a_regression(self):
+        record = {"results": {"checkout": {"p50_us": 130.0}}}
+        assert find_regressions(record, {}, max_regression=0) == []
+
+    def test_cli_history(self, tmp_path):
+        history = tmp_path / "history.jsonl"
+        args = [
+            "--only",
+            "session_init",
+            "--iterations",
+            "3",
+            "--warmup",
+            "0",
+            "--history",
+            str(history),
+        ]
+        assert main(args) == 0
+        assert main([*args, "--max-regression", "1000"]) == 0
+        records = [json.loads(line) for line in history.read_text().splitlines()]
+        assert len(records) == 2
+        assert "session_init" in records[-1]["results"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_token_lookup():
+    results = token_lookup.run([20, 40], lookups=3)
+    assert [result["rows"] for result in results] == [20, 40]
+    assert all(result["indexed_us"] > 0 for result in results)
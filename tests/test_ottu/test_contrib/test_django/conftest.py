@@ -1,5 +1,7 @@
 import pytest
 
+from ottu.contrib.django.core.tokens import token_cache
+
 
 @pytest.fixture
 def ottu():
@@ -17,3 +19,11 @@ def custom_wh_error(settings):
 def settings_without_auth(settings):
     settings.OTTU_AUTH = None
     return settings
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    # The cache outlives the rolled back test transactions
+    token_cache.clear()
+    yield
+    token_cache.clear()
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.urls import path
 
-from .views import WebhookViewReceiveView
+from .views import AsyncWebhookViewReceiveView, WebhookViewReceiveView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -10,4 +10,9 @@ urlpatterns = [
         WebhookViewReceiveView.as_view(),
         name="webhook-receiver",
     ),
+    path(
+        "async-webhook-receiver/",
+        AsyncWebhookViewReceiveView.as_view(),
+        name="async-webhook-receiver",
+    ),
 ]
@@ -1,6 +1,9 @@
 from django.conf import settings
 
-from ottu.contrib.django.views import WebhookViewAbstractView
+from ottu.contrib.django.views import (
+    AsyncWebhookViewAbstractView,
+    WebhookViewAbstractView,
+)
 
 
 class WebhookViewReceiveView(WebhookViewAbstractView):
@@ -8,3 +11,10 @@ class WebhookViewReceiveView(WebhookViewAbstractView):
         if getattr(settings, "OTTU_RAISE_WH_ERROR", False):
             raise self.WebHookError("This is test error", status_code=400)
         return super().process_data()
+
+
+class AsyncWebhookViewReceiveView(AsyncWebhookViewAbstractView):
+    def process_data(self):
+        if getattr(settings, "OTTU_RAISE_WH_ERROR", False):
+            raise self.WebHookError("This is test error", status_code=400)
+        return super().process_data()
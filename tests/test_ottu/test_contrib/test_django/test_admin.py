@@ -0,0 +1,85 @@
+import importlib
+
+import pytest
+from django.contrib.admin import AdminSite, site
+
+from ottu.contrib.django import admin
+from ottu.contrib.django.models import Checkout, Token, Webhook
+
+pytestmark = pytest.mark.django_db
+
+
+class TestEstimatedCountPaginator:
+    def test_estimate(self, mocker):
+        mocker.patch.object(admin, "estimate_count", return_value=1_000_000)
+        Checkout.objects.create(session_id="s-1", state="paid")
+        paginator = admin.EstimatedCountPaginator(Checkout.objects.order_by("pk"), 100)
+        assert paginator.count == 1_000_000
+
+        # Filtered querysets are counted
+        paginator = admin.EstimatedCountPaginator(
+            Checkout.objects.filter(state="paid").order_by("pk"),
+            100,
+        )
+        assert paginator.count == 1
+
+    def test_small_table(self, mocker):
+        mocker.patch.object(admin, "estimate_count", return_value=50)
+        Checkout.objects.create(session_id="s-1")
+        paginator = admin.EstimatedCountPaginator(Checkout.objects.order_by("pk"), 100)
+        assert paginator.count == 1
+
+    def test_without_estimate(self):
+        # SQLite keeps no estimate
+        assert admin.estimate_count(Checkout) is None
+
+
+class TestChangelist:
+    @pytest.fixture(autouse=True)
+    def setup(self, rf, admin_user):
+        self.rf = rf
+        self.admin_user = admin_user
+
+    def get_changelist(self, model, **params):
+        request = self.rf.get("/", params)
+        request.user = self.admin_user
+        response = site._registry[model].changelist_view(request)
+        assert response.status_code == 200
+        return response.context_data["cl"]
+
+    def test_webhook_columns(self):
+        Webhook.objects.create(session_id="s-1", payload={"large": "payload"})
+        changelist = self.get_changelist(Webhook)
+        assert '"payload"' not in str(changelist.result_list.query)
+        assert [obj.session_id for obj in changelist.result_list] == ["s-1"]
+
+    def test_checkout_search(self):
+        Checkout.objects.create(session_id="abc-1", customer_id="customer-1")
+        Checkout.objects.create(session_id="xabc-2", customer_id="customer-2")
+
+        changelist = self.get_changelist(Checkout, q="abc")
+        assert [obj.pk for obj in changelist.result_list] == ["abc-1"]
+        changelist = self.get_changelist(Checkout, q="customer-2")
+        assert [obj.pk for obj in changelist.result_list] == ["xabc-2"]
+        # Not a prefix of an indexed column
+        assert self.get_changelist(Checkout, q="customer").result_count == 0
+
+    def test_full_search(self, mocker):
+        mocker.patch.object(admin.conf, "ADMIN_FULL_SEARCH", True)
+        Checkout.objects.create(session_id="s-1", customer_id="customer-1")
+        assert self.get_changelist(Checkout, q="customer").result_count == 1
+
+    @pytest.mark.parametrize("model", [Checkout, Webhook, Token])
+    def test_changelist(self, model):
+        assert self.get_changelist(model).result_count == 0
+
+
+def test_abstract_token_model(mocker):
+    # Registering an abstract model raises `ImproperlyConfigured`
+    new_site = AdminSite()
+    mocker.patch("django.contrib.admin.site", new_site)
+    mocker.patch("django.contrib.admin.sites.site", new_site)
+    mocker.patch.object(Token._meta, "abstract", True)
+    importlib.reload(admin)
+    assert Checkout in new_site._registry
+    assert Token not in new_site._registry
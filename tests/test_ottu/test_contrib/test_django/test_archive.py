@@ -0,0 +1,95 @@
+import gzip
+import json
+from datetime import timedelta
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+
+from ottu.contrib.django.archive import archive_webhooks
+from ottu.contrib.django.models import Webhook
+
+pytestmark = pytest.mark.django_db
+
+
+def create_webhooks(count, days):
+    webhooks = Webhook.objects.bulk_create(
+        Webhook(session_id=f"s-{days}-{index}", payload={"index": index})
+        for index in range(count)
+    )
+    # `auto_now_add` ignores the given value
+    Webhook.objects.filter(pk__in=[webhook.pk for webhook in webhooks]).update(
+        timestamp=timezone.now() - timedelta(days=days),
+    )
+
+
+class TestArchiveWebhooks:
+    def test_archive(self, tmp_path, mocker):
+        create_webhooks(5, days=100)
+        create_webhooks(2, days=1)
+        write = mocker.spy(gzip, "compress")
+
+        summary = archive_webhooks(
+            Webhook,
+            before=timezone.now() - timedelta(days=90),
+            directory=tmp_path,
+            batch_size=2,
+        )
+
+        assert (summary.rows, summary.batches) == (5, 3)
+        assert write.call_count == 3
+        with gzip.open(summary.path, "rt") as file:
+            rows = [json.loads(line) for line in file]
+        assert [row["payload"] for row in rows] == [
+            {"index": index} for index in range(5)
+        ]
+        assert Webhook.objects.count() == 2
+
+    def test_directory_is_created(self, tmp_path):
+        create_webhooks(1, days=100)
+        directory = tmp_path / "archives" / "webhooks"
+        summary = archive_webhooks(Webhook, before=timezone.now(), directory=directory)
+        assert summary.path.parent == directory
+        assert summary.path.exists()
+
+    def test_failed_write_keeps_the_rows(self, tmp_path, mocker):
+        create_webhooks(3, days=100)
+        mocker.patch("ottu.contrib.django.archive._write_member", side_effect=OSError)
+        with pytest.raises(OSError):
+            archive_webhooks(Webhook, before=timezone.now(), directory=tmp_path)
+        assert Webhook.objects.count() == 3
+
+    def test_delete_only(self):
+        create_webhooks(3, days=100)
+        summary = archive_webhooks(Webhook, before=timezone.now())
+        assert summary.rows == 3
+        assert summary.path is None
+        assert not Webhook.objects.exists()
+
+
+class TestArchiveCommand:
+    def test_command(self, tmp_path, capsys):
+        create_webhooks(3, days=100)
+        create_webhooks(1, days=1)
+        call_command("ottu_archive_webhooks", "--directory", str(tmp_path))
+        assert "Archived 3 webhooks" in capsys.readouterr().out
+        assert len(list(tmp_path.iterdir())) == 1
+        assert Webhook.objects.count() == 1
+
+    def test_dry_run(self, tmp_path, capsys):
+        create_webhooks(3, days=100)
+        call_command(
+            "ottu_archive_webhooks",
+            "--directory",
+            str(tmp_path),
+            "--days",
+            "30",
+            "--dry-run",
+        )
+        assert capsys.readouterr().out.startswith("3 webhooks")
+        assert Webhook.objects.count() == 3
+
+    def test_requires_directory(self):
+        with pytest.raises(CommandError):
+            call_command("ottu_archive_webhooks")
+        call_command("ottu_archive_webhooks", "--no-archive")
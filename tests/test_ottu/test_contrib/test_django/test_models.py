@@ -1,10 +1,18 @@
+import importlib
 import json
+from datetime import timedelta
 
 import pytest
+from django.apps import apps
+from django.db import migrations
+from django.utils import timezone
 
-from ottu.contrib.django.models import Checkout, Webhook
+from ottu.contrib.django.core.tokens import TokenCache, token_cache
+from ottu.contrib.django.models import Checkout, Token, Webhook
+from ottu.contrib.django.operations import AddIndexConcurrently
 from ottu.json import PaymentMethodEncoder
 from ottu.session import PaymentMethod
+from tests import fake_data
 
 pytestmark = pytest.mark.django_db
 
@@ -29,6 +37,196 @@ class TestWebhookNModel:
         assert webhook.checkout == checkout
         assert webhook.checkout.state == response_checkout["state"]
 
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_acreate_from_webhook(self, response_checkout):
+        session_id = response_checkout["session_id"]
+        checkout = await Checkout.objects.acreate(session_id=session_id)
+        data = {
+            **response_checkout,
+            "agreement": {"id": "agreement-1"},
+            "token": "token-1",
+        }
+
+        webhook = await Webhook.acreate_from_webhook(data)
+
+        assert webhook.checkout == checkout
+        await checkout.arefresh_from_db()
+        assert checkout.state == response_checkout["state"]
+        assert checkout.agreement_id == "agreement-1"
+        customer_id = response_checkout["customer_id"]
+        assert await Token.aget_token(customer_id, "agreement-1") == "token-1"
+
+
+class TestCheckoutAgreementID:
+    def test_save(self):
+        checkout = Checkout.objects.create(session_id="s-1", agreement={"id": 12})
+        assert checkout.agreement_id == "12"
+
+        checkout.agreement = {}
+        checkout.save(update_fields=["agreement"])
+        checkout.refresh_from_db()
+        assert checkout.agreement_id == ""
+
+    def test_migration_backfill(self):
+        migration = importlib.import_module(
+            "ottu.contrib.django.migrations.0002_checkout_token_index",
+        )
+        Checkout.objects.create(session_id="s-1", agreement={"id": "agreement-1"})
+        Checkout.objects.create(session_id="s-2", agreement={"id": None})
+        Checkout.objects.create(session_id="s-3")
+        Checkout.objects.update(agreement_id="stale")
+
+        migration.populate_agreement_id(apps, None)
+        assert dict(Checkout.objects.values_list("session_id", "agreement_id")) == {
+            "s-1": "agreement-1",
+            "s-2": "stale",
+            "s-3": "stale",
+        }
+
+    @pytest.mark.parametrize("vendor", ["postgresql", "sqlite"])
+    def test_migration_index(self, mocker, vendor):
+        migration = importlib.import_module(
+            "ottu.contrib.django.migrations.0002_checkout_token_index",
+        )
+        assert migration.Migration.atomic is False
+        operation = migration.Migration.operations[-1]
+        schema_editor = mocker.MagicMock()
+        schema_editor.connection.vendor = vendor
+        schema_editor.connection.alias = "default"
+        state = mocker.MagicMock()
+
+        operation.database_forwards("ottu", schema_editor, state, state)
+        operation.database_backwards("ottu", schema_editor, state, state)
+
+        model = state.apps.get_model.return_value
+        if vendor == "postgresql":
+            schema_editor.add_index.assert_called_once_with(
+                model,
+                operation.index,
+                concurrently=True,
+            )
+            schema_editor.remove_index.assert_called_once_with(
+                model,
+                operation.index,
+                concurrently=True,
+            )
+        else:
+            schema_editor.add_index.assert_called_once_with(model, operation.index)
+            schema_editor.remove_index.assert_called_once_with(model, operation.index)
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        "0002_checkout_token_index",
+        "0004_webhook_indexes",
+        "0005_checkout_admin_indexes",
+    ],
+)
+def test_migration_indexes_are_concurrent(name):
+    migration = importlib.import_module(f"ottu.contrib.django.migrations.{name}")
+    assert migration.Migration.atomic is False
+    indexes = [
+        operation
+        for operation in migration.Migration.operations
+        if isinstance(operation, migrations.AddIndex)
+    ]
+    assert indexes
+    assert all(isinstance(index, AddIndexConcurrently) for index in indexes)
+
+
+class TestToken:
+    webhook = {
+        **fake_data.webhook_payload,
+        "session_id": "s-1",
+        "customer_id": "customer-1",
+        "agreement": {"id": "agreement-1"},
+        "token": {"token": "token-1", "pg_code": "knet", "customer_id": "customer-1"},
+    }
+
+    def test_update_from_webhook(self):
+        Webhook.create_from_webhook(self.webhook)
+        token = Token.objects.get()
+        assert (token.customer_id, token.agreement_id) == ("customer-1", "agreement-1")
+        assert (token.token, token.pg_code) == ("token-1", "knet")
+        assert token.last_used is not None
+
+        # Replaces the token of the agreement
+        Webhook.create_from_webhook({**self.webhook, "token": "token-2"})
+        assert Token.get_token("customer-1", "agreement-1") == "token-2"
+        assert Token.objects.count() == 1
+
+    def test_webhook_without_agreement(self):
+        Webhook.create_from_webhook({**self.webhook, "agreement": {}})
+        assert not Token.objects.exists()
+
+    def test_update_from_cards(self):
+        cards = [
+            *fake_data.response_user_cards,
+            {"customer_id": "c", "token": "t", "agreements": ["a"], "is_expired": True},
+        ]
+        Token.update_from_cards(cards)
+        card = fake_data.response_user_cards[0]
+        for agreement_id in card["agreements"]:
+            assert Token.get_token(card["customer_id"], agreement_id) == card["token"]
+        # Expired
+        assert Token.get_token("c", "a") is None
+
+    def test_cache(self, django_assert_num_queries):
+        Token.save_token(customer_id="c", agreement_id="a", token="t")
+        with django_assert_num_queries(1):
+            assert Token.get_token("c", "a") == "t"
+            assert Token.get_token("c", "a") == "t"
+        assert token_cache.hits == 1
+
+        Token.delete_token(customer_id="c", token="t")
+        assert Token.get_token("c", "a") is None
+
+    def test_migration_backfill(self):
+        migration = importlib.import_module("ottu.contrib.django.migrations.0003_token")
+        now = timezone.now()
+        for session_id, token, created_at in [
+            ("s-1", "old", now - timedelta(days=1)),
+            ("s-2", "new", now),
+            ("s-3", "", now + timedelta(days=1)),
+        ]:
+            Checkout.objects.create(
+                session_id=session_id,
+                customer_id="c",
+                agreement={"id": "a"},
+                token=token,
+            )
+            Checkout.objects.filter(pk=session_id).update(created_at=created_at)
+        Checkout.objects.create(session_id="s-4", customer_id="c", token="no-agreement")
+
+        migration.populate_tokens(apps, None)
+        assert list(Token.objects.values_list("agreement_id", "token")) == [
+            ("a", "new")
+        ]
+
+
+class TestTokenCache:
+    def test_expiry(self, mocker):
+        monotonic = mocker.patch(
+            "ottu.contrib.django.core.tokens.time.monotonic",
+            return_value=0,
+        )
+        cache = TokenCache(ttl=10)
+        cache.set("c", "a", "t")
+        assert cache.get("c", "a") == "t"
+        monotonic.return_value = 11
+        assert cache.get("c", "a") is None
+
+    def test_max_size(self):
+        cache = TokenCache(max_size=2)
+        cache.set("c", "a-1", "t")
+        cache.set("c", "a-2", "t")
+        cache.get("c", "a-1")
+        cache.set("c", "a-3", "t")
+        assert cache.get("c", "a-2") is None
+        assert cache.get("c", "a-1") == "t"
+
 
 class TestPaymentMethodEncoder:
     def test_success(self):
@@ -1,9 +1,21 @@
+import os
+import subprocess
+import sys
+from datetime import timedelta
+from types import SimpleNamespace
+
 import pytest
 from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from ottu.auth import BasicAuth
-from ottu.contrib.django.core.ottu import _generate_instance
-from ottu.contrib.django.models import Checkout
+from ottu.contrib.django.core.ottu import Ottu, _generate_instance
+from ottu.contrib.django.core.session import Session
+from ottu.contrib.django.core.writer import CheckoutJournal, CheckoutWriter
+from ottu.contrib.django.models import Checkout, Token, Webhook
+from tests import fake_data
 
 pytestmark = pytest.mark.django_db
 
@@ -169,3 +181,368 @@ class TestOttuCheckoutModel:
             "response": response_auto_debit,
         }
         assert response == expected_response
+
+
+class TestCheckoutPersistence:
+    url = "https://test.ottu.dev/b/checkout/v1/pymt-txn/"
+
+    @pytest.fixture(autouse=True)
+    def setup(self, django_capture_on_commit_callbacks):
+        self.capture_on_commit_callbacks = django_capture_on_commit_callbacks
+
+    def retrieve(self, httpx_mock, ottu, **changes):
+        session_id = fake_data.response_checkout["session_id"]
+        httpx_mock.add_response(
+            url=f"{self.url}{session_id}",
+            method="GET",
+            json={**fake_data.response_checkout, **changes},
+        )
+        with self.capture_on_commit_callbacks(execute=True):
+            with CaptureQueriesContext(connection) as context:
+                ottu.session.retrieve(session_id)
+        return [query["sql"] for query in context.captured_queries]
+
+    def test_writes(self, httpx_mock, ottu):
+        # A single upsert
+        queries = self.retrieve(httpx_mock, ottu)
+        assert len(queries) == 1
+        assert "ON CONFLICT" in queries[0]
+        checkout = Checkout.objects.get()
+        assert checkout.state == fake_data.response_checkout["state"]
+
+        # Nothing changed
+        assert self.retrieve(httpx_mock, ottu) == []
+
+        # Only the changed column
+        (query,) = self.retrieve(httpx_mock, ottu, state="paid")
+        assert query.startswith("UPDATE")
+        assert '"state"' in query
+        assert '"amount"' not in query
+        checkout.refresh_from_db()
+        assert checkout.state == "paid"
+        assert checkout.updated_at > checkout.created_at
+
+    def test_deleted_row_is_created_again(self, httpx_mock, ottu):
+        self.retrieve(httpx_mock, ottu)
+        Checkout.objects.all().delete()
+        self.retrieve(httpx_mock, ottu, state="paid")
+        assert Checkout.objects.get().state == "paid"
+
+    def test_rolled_back_write_is_repeated(self, httpx_mock, ottu):
+        session_id = fake_data.response_checkout["session_id"]
+        httpx_mock.add_response(
+            url=f"{self.url}{session_id}",
+            json=fake_data.response_checkout,
+        )
+        with self.capture_on_commit_callbacks(execute=True):
+            with pytest.raises(RuntimeError):
+                with transaction.atomic():
+                    ottu.session.retrieve(session_id)
+                    raise RuntimeError
+            ottu.session.retrieve(session_id)
+        assert Checkout.objects.exists()
+
+
+class TestCheckoutWriter:
+    @pytest.fixture(autouse=True)
+    def setup(self, mocker):
+        # Flushed by the tests rather than by the thread
+        mocker.patch.object(CheckoutWriter, "_ensure_thread")
+
+    @staticmethod
+    def session(session_id):
+        return SimpleNamespace(session_id=session_id)
+
+    def test_coalesces_and_writes_in_batches(self):
+        writer = CheckoutWriter(Checkout, batch_size=2)
+        session_a, session_b = self.session("a"), self.session("b")
+        writer.add(session_a, {"state": "created"})
+        writer.add(session_a, {"state": "paid"})
+        writer.add(session_b, {"state": "created"})
+        assert len(writer) == 2
+
+        with CaptureQueriesContext(connection) as context:
+            writer.flush()
+        statements = [query["sql"].split()[0] for query in context.captured_queries]
+        assert statements.count("INSERT") == 1
+        assert statements.count("UPDATE") == 1
+        assert len(writer) == 0
+        assert dict(Checkout.objects.values_list("session_id", "state")) == {
+            "a": "paid",
+            "b": "created",
+        }
+        assert session_a._saved_snapshot == {"state": "paid"}
+
+    def test_failed_batch_is_retried(self, mocker):
+        writer = CheckoutWriter(Checkout)
+        session = self.session("a")
+        writer.add(session, {"state": "created"})
+        upsert = mocker.patch(
+            "ottu.contrib.django.core.writer.write_checkouts",
+            side_effect=RuntimeError,
+        )
+        writer.flush()
+        assert len(writer) == 1
+        assert not Checkout.objects.exists()
+
+        upsert.side_effect = None
+        writer.flush()
+        assert len(writer) == 0
+        assert upsert.call_count == 2
+
+    def test_stale_snapshot_is_skipped(self):
+        writer = CheckoutWriter(Checkout)
+        taken_at = timezone.now()
+        writer.add(self.session("a"), {"state": "created"}, taken_at=taken_at)
+        # Eg: a webhook processed after the snapshot was taken
+        Checkout.objects.create(session_id="a", state="paid")
+        writer.add(
+            self.session("b"),
+            {"state": "created"},
+            taken_at=taken_at - timedelta(seconds=1),
+        )
+        writer.flush()
+        assert dict(Checkout.objects.values_list("session_id", "state")) == {
+            "a": "paid",
+            "b": "created",
+        }
+
+        # Newer snapshots are still written
+        writer.add(self.session("a"), {"state": "refunded"})
+        writer.add(self.session("b"), {"state": "paid"})
+        writer.flush()
+        assert dict(Checkout.objects.values_list("session_id", "state")) == {
+            "a": "refunded",
+            "b": "paid",
+        }
+
+    def test_webhook_flushes_its_session(self, response_checkout):
+        writer = CheckoutWriter(Checkout)
+        session_id = response_checkout["session_id"]
+        writer.add(self.session(session_id), {"state": "created", "amount": "10"})
+        writer.add(self.session("other"), {"state": "created"})
+
+        webhook = Webhook.create_from_webhook(response_checkout)
+        assert webhook.checkout.session_id == session_id
+        assert session_id not in writer
+        assert len(writer) == 1
+
+        # The buffered snapshot is older than the webhook
+        writer.add(
+            self.session(session_id),
+            {"state": "created"},
+            taken_at=webhook.checkout.updated_at - timedelta(seconds=1),
+        )
+        writer.flush()
+        assert Checkout.objects.get(pk=session_id).state == response_checkout["state"]
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_async_webhook_flushes_its_session(self, response_checkout):
+        writer = CheckoutWriter(Checkout)
+        session_id = response_checkout["session_id"]
+        writer.add(self.session(session_id), {"state": "created"})
+
+        webhook = await Webhook.acreate_from_webhook(response_checkout)
+        assert webhook.checkout.session_id == session_id
+        assert len(writer) == 0
+
+    def test_journal_is_replayed(self, tmp_path):
+        writer = CheckoutWriter(Checkout, journal_dir=str(tmp_path))
+        writer.add(self.session("a"), {"state": "created"})
+        writer.add(self.session("a"), {"state": "paid"})
+        writer.add(self.session("b"), {"state": "created"})
+        journal = writer._journal.path
+        with open(journal, "a") as file:
+            # Cut short by the crash
+            file.write('{"session_id": "c", "tak')
+
+        # Locked by the live writer
+        assert CheckoutJournal.recover(Checkout, str(tmp_path)) == 0
+
+        # Eg: SIGKILL, the buffer and the lock are gone
+        writer._journal.detach()
+        writer._pending.clear()
+        new_writer = CheckoutWriter(Checkout, journal_dir=str(tmp_path))
+        assert new_writer.recover() == 2
+        assert dict(Checkout.objects.values_list("session_id", "state")) == {
+            "a": "paid",
+            "b": "created",
+        }
+        assert not os.path.exists(journal)
+        assert os.listdir(tmp_path) == [os.path.basename(new_writer._journal.path)]
+
+    def test_journal_is_cleared(self, tmp_path):
+        writer = CheckoutWriter(Checkout, journal_dir=str(tmp_path))
+        writer.add(self.session("a"), {"state": "created"})
+        assert os.path.getsize(writer._journal.path) > 0
+
+        writer.flush()
+        assert os.path.getsize(writer._journal.path) == 0
+        writer.close()
+        assert os.listdir(tmp_path) == []
+
+    def test_overflow_is_written_right_away(self):
+        writer = CheckoutWriter(Checkout, max_pending=1)
+        writer.add(self.session("a"), {"state": "created"})
+        writer.add(self.session("b"), {"state": "created"})
+        assert len(writer) == 1
+        assert list(Checkout.objects.values_list("session_id", flat=True)) == ["b"]
+
+        writer.close()
+        assert Checkout.objects.count() == 2
+
+    def test_ottu_buffers_committed_sessions(
+        self,
+        httpx_mock,
+        django_capture_on_commit_callbacks,
+    ):
+        from ottu.contrib.django.core.ottu import Ottu
+
+        writer = CheckoutWriter(Checkout)
+        ottu = Ottu(
+            merchant_id="test.ottu.dev",
+            auth=BasicAuth(username="user", password="pass"),
+            checkout_writer=writer,
+        )
+        session_id = fake_data.response_checkout["session_id"]
+        httpx_mock.add_response(
+            url=f"https://test.ottu.dev/b/checkout/v1/pymt-txn/{session_id}",
+            json=fake_data.response_checkout,
+        )
+        with django_capture_on_commit_callbacks(execute=True):
+            with CaptureQueriesContext(connection) as context:
+                ottu.session.retrieve(session_id)
+        assert context.captured_queries == []
+        assert len(writer) == 1
+
+        writer.flush()
+        assert Checkout.objects.get().state == fake_data.response_checkout["state"]
+
+
+@pytest.mark.django_db(transaction=True)
+class TestOttuAsync:
+    url = "https://test.ottu.dev/b/checkout/v1/pymt-txn/"
+
+    @pytest.fixture
+    def ottu_async(self):
+        from ottu.contrib.django.core.async_ottu import OttuAsync
+
+        return _generate_instance(OttuAsync)
+
+    @pytest.mark.asyncio
+    async def test_retrieve(self, httpx_mock, ottu_async, mocker):
+        sync_write = mocker.spy(Ottu, "_upsert_dj_session")
+        session_id = fake_data.response_checkout["session_id"]
+        httpx_mock.add_response(
+            url=f"{self.url}{session_id}",
+            json=fake_data.response_checkout,
+        )
+        await ottu_async.session.retrieve(session_id)
+
+        checkout = await Checkout.objects.aget()
+        assert checkout.state == fake_data.response_checkout["state"]
+        assert ottu_async._ottu.session._saved_snapshot is not None
+        sync_write.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_auto_debit_autoflow(
+        self,
+        httpx_mock,
+        mocker,
+        response_payment_methods,
+        payload_auto_debit_autoflow,
+        response_checkout,
+        response_auto_debit,
+        ottu_async,
+    ):
+        sync_lookup = mocker.spy(Session, "get_token_from_db")
+        await Token.objects.acreate(
+            customer_id=response_checkout["customer_id"],
+            agreement_id="test-agreement-id",
+            token="test-token",
+        )
+        httpx_mock.add_response(
+            url="https://test.ottu.dev/b/pbl/v2/payment-methods/",
+            method="POST",
+            json=response_payment_methods,
+        )
+        httpx_mock.add_response(url=self.url, method="POST", json=response_checkout)
+        httpx_mock.add_response(
+            url="https://test.ottu.dev/b/pbl/v2/auto-debit/",
+            method="POST",
+            json=response_auto_debit,
+        )
+
+        response = await ottu_async.auto_debit_autoflow(**payload_auto_debit_autoflow)
+
+        assert response["success"] is True
+        assert response["response"] == response_auto_debit
+        sync_lookup.assert_not_called()
+        checkout = await Checkout.objects.aget()
+        assert checkout.session_id == response_checkout["session_id"]
+
+    @pytest.mark.asyncio
+    async def test_auto_debit_autoflow_token_not_found(
+        self,
+        payload_auto_debit_autoflow,
+        ottu_async,
+    ):
+        response = await ottu_async.auto_debit_autoflow(**payload_auto_debit_autoflow)
+        assert response["status_code"] == 400
+        assert response["error"] == {"detail": "Token not found in the database"}
+
+
+class TestCards:
+    url = "https://test.ottu.dev/b/pbl/v2/card/"
+
+    def test_get_cards_updates_vault(self, httpx_mock, response_user_cards, ottu):
+        httpx_mock.add_response(url=self.url, json=response_user_cards)
+        ottu.cards.get_cards(customer_id="test-customer-jpg")
+        assert Token.objects.count() == 3
+        assert Token.get_token("test-customer-jpg", "test-auto-flow-id") == (
+            "9918766711067353"
+        )
+
+    def test_delete(self, httpx_mock, ottu):
+        Token.save_token(customer_id="c", agreement_id="a", token="t")
+        httpx_mock.add_response(
+            url=f"{self.url}t/?customer_id=c&type=production",
+            method="DELETE",
+            status_code=204,
+        )
+        assert ottu.cards.delete(token="t", customer_id="c")["success"]
+        assert Token.objects.get().state == Token.State.DELETED
+
+
+class TestInitWorker:
+    def test_init_worker(self, mocker):
+        from ottu.contrib.django.core import ottu as module
+
+        parent_client = module.ottu.request_session
+        mocker.patch("ottu.ottu.os.getpid", return_value=os.getpid() + 1)
+        module.init_worker(sender=None)
+        assert module.ottu._request_session is not parent_client
+
+
+def test_instance_is_built_on_first_use(settings):
+    # In a fresh interpreter, since the settings are read once per process
+    code = """
+import django
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+settings.OTTU_AUTH = None
+django.setup()
+from ottu.contrib.django.core.ottu import ottu
+try:
+    ottu.merchant_id
+except ImproperlyConfigured:
+    print("lazy")
+"""
+    output = subprocess.check_output(
+        [sys.executable, "-c", code],
+        env={**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE},
+        text=True,
+    )
+    assert output.strip() == "lazy"
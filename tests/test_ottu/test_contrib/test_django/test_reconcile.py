@@ -0,0 +1,99 @@
+import json
+
+import pytest
+from django.core.management import call_command
+
+from ottu.contrib.django.models import Checkout
+from ottu.contrib.django.reconcile import CheckoutReconciler
+from tests import fake_data
+
+pytestmark = pytest.mark.django_db
+
+URL = "https://test.ottu.dev/b/checkout/v1/pymt-txn/"
+
+
+def create_checkout(session_id, state):
+    return Checkout.objects.create(
+        session_id=session_id,
+        state=state,
+        type=fake_data.response_checkout["type"],
+        amount=fake_data.response_checkout["amount"],
+        currency_code=fake_data.response_checkout["currency_code"],
+        customer_id=fake_data.response_checkout["customer_id"],
+    )
+
+
+def add_session(httpx_mock, session_id, **changes):
+    httpx_mock.add_response(
+        url=f"{URL}{session_id}",
+        json={**fake_data.response_checkout, "session_id": session_id, **changes},
+    )
+
+
+@pytest.fixture
+def checkouts(httpx_mock):
+    create_checkout("s-1", "created")
+    add_session(httpx_mock, "s-1", state="paid")
+    create_checkout("s-2", "pending")
+    add_session(httpx_mock, "s-2", state="pending")
+    create_checkout("s-3", "created")
+    httpx_mock.add_response(url=f"{URL}s-3", status_code=404, json={"detail": "x"})
+    # Final, not retrieved
+    create_checkout("s-4", "paid")
+
+
+class TestCheckoutReconciler:
+    def test_run(self, ottu, checkouts):
+        results = []
+        reconciler = CheckoutReconciler(ottu, chunk_size=2, concurrency=2)
+        summary = reconciler.run(sink=results.append)
+
+        assert summary.as_dict() == {
+            "checked": 3,
+            "unchanged": 1,
+            "changed": 1,
+            "updated": 1,
+            "skipped": 0,
+            "failed": 1,
+            "elapsed": summary.elapsed,
+            "transitions": {"created -> paid": 1},
+        }
+        assert dict(Checkout.objects.values_list("session_id", "state")) == {
+            "s-1": "paid",
+            "s-2": "pending",
+            "s-3": "created",
+            "s-4": "paid",
+        }
+        changed, failed = sorted(results, key=lambda result: result.session_id)
+        assert changed.changed_fields == ["state"]
+        assert failed.error.startswith("Retrieving the session failed (404)")
+
+    def test_dry_run(self, ottu, checkouts):
+        summary = CheckoutReconciler(ottu).run(dry_run=True)
+        assert (summary.changed, summary.updated) == (1, 0)
+        assert Checkout.objects.get(session_id="s-1").state == "created"
+
+    def test_row_changed_meanwhile(self, ottu):
+        checkout = create_checkout("s-1", "created")
+        row = {
+            "pk": "s-1",
+            **Checkout.objects.values(*CheckoutReconciler(ottu).fields).get(),
+        }
+        # Eg: a webhook
+        Checkout.objects.filter(pk="s-1").update(state="paid")
+
+        updated = CheckoutReconciler(ottu).save({"s-1": (row, {"state": "failed"})})
+        assert updated == 0
+        checkout.refresh_from_db()
+        assert checkout.state == "paid"
+
+
+class TestReconcileCommand:
+    def test_command(self, checkouts, tmp_path, capsys):
+        output = tmp_path / "results.jsonl"
+        call_command("ottu_reconcile_checkouts", "--output", str(output))
+
+        summary = json.loads(capsys.readouterr().out)
+        assert (summary["changed"], summary["failed"]) == (1, 1)
+        lines = output.read_text().splitlines()
+        assert {json.loads(line)["session_id"] for line in lines} == {"s-1", "s-3"}
@@ -1,6 +1,11 @@
 import json
+from datetime import timedelta
 
 import pytest
+from django.utils import timezone
+
+from ottu.contrib.django.models import Checkout, Token
+from ottu.errors import APIInterruptError
 
 pytestmark = pytest.mark.django_db
 
@@ -60,3 +65,166 @@ class TestSession:
         content = json.loads(request.content.decode())
         webhook_url_auto = content["webhook_url"]
         assert webhook_url_auto == "https://test.client.dev/webhook-receiver-1234/"
+
+
+class TestGetTokenFromDB:
+    agreement = {"id": "agreement-1"}
+
+    def create_checkout(self, session_id, token, agreement=None, created_at=None):
+        checkout = Checkout.objects.create(
+            session_id=session_id,
+            customer_id="customer-1",
+            token=token,
+            agreement=agreement or self.agreement,
+        )
+        if created_at:
+            Checkout.objects.filter(pk=session_id).update(created_at=created_at)
+        return checkout
+
+    def test_latest_token(self, ottu):
+        now = timezone.now()
+        self.create_checkout("s-2", "new-token", created_at=now)
+        self.create_checkout("s-1", "old-token", created_at=now - timedelta(days=1))
+        # Not tokenized yet
+        self.create_checkout("s-3", "", created_at=now + timedelta(days=1))
+        self.create_checkout("s-4", "other-token", agreement={"id": "agreement-2"})
+
+        token = ottu.session.get_token_from_db(self.agreement, "customer-1")
+        assert token == "new-token"
+
+    @pytest.mark.parametrize("agreement", [{}, {"id": None}])
+    def test_agreement_without_id(self, ottu, agreement):
+        self.create_checkout("s-1", "token", agreement={"foo": "bar"})
+        with pytest.raises(APIInterruptError):
+            ottu.session.get_token_from_db(agreement, "customer-1")
+
+    def test_token_vault(self, ottu, django_assert_num_queries):
+        self.create_checkout("s-1", "checkout-token")
+        Token.save_token(
+            customer_id="customer-1", agreement_id="agreement-1", token="t"
+        )
+        with django_assert_num_queries(1):
+            assert ottu.session.get_token_from_db(self.agreement, "customer-1") == "t"
+
+    def test_token_from_checkouts_is_saved(self, ottu):
+        self.create_checkout("s-1", "checkout-token")
+        token = ottu.session.get_token_from_db(self.agreement, "customer-1")
+        assert token == "checkout-token"
+        assert Token.get_token("customer-1", "agreement-1") == "checkout-token"
+
+    def test_get_tokens_from_db(self, ottu, django_assert_num_queries):
+        for index in range(3):
+            Token.save_token(
+                customer_id=f"customer-{index}",
+                agreement_id=f"agreement-{index}",
+                token=f"token-{index}",
+            )
+        # Not part of the requested pairs
+        Token.save_token(
+            customer_id="customer-0", agreement_id="agreement-1", token="x"
+        )
+        pairs = [(f"customer-{index}", f"agreement-{index}") for index in range(4)]
+
+        with django_assert_num_queries(2):
+            # The vault, then the checkouts for `customer-3`
+            tokens = ottu.session.get_tokens_from_db(pairs)
+        assert tokens == {
+            pair: f"token-{index}" for index, pair in enumerate(pairs[:3])
+        }
+
+        # Cached
+        with django_assert_num_queries(0):
+            ottu.session.get_tokens_from_db(pairs[:3])
+
+    def test_get_tokens_from_checkouts(self, ottu):
+        now = timezone.now()
+        self.create_checkout("s-1", "old-token", created_at=now - timedelta(days=1))
+        self.create_checkout("s-2", "new-token", created_at=now)
+        tokens = ottu.session.get_tokens_from_db([("customer-1", "agreement-1")])
+        assert tokens == {("customer-1", "agreement-1"): "new-token"}
+        assert Token.get_token("customer-1", "agreement-1") == "new-token"
+
+    def test_tokens_from_checkouts_are_saved_in_bulk(
+        self,
+        ottu,
+        django_assert_num_queries,
+    ):
+        for index in range(3):
+            Checkout.objects.create(
+                session_id=f"s-{index}",
+                customer_id=f"customer-{index}",
+                token=f"token-{index}",
+                agreement={"id": f"agreement-{index}"},
+            )
+        # Eg: deleted since the vault was read
+        Token.objects.create(
+            customer_id="customer-2",
+            agreement_id="agreement-2",
+            token="token-2",
+            state=Token.State.DELETED,
+        )
+        pairs = {(f"customer-{index}", f"agreement-{index}") for index in range(3)}
+
+        with django_assert_num_queries(3):
+            # The checkouts, one insert, and the active tokens
+            tokens = ottu.session._get_tokens_from_checkouts(pairs)
+        assert tokens == {
+            ("customer-0", "agreement-0"): "token-0",
+            ("customer-1", "agreement-1"): "token-1",
+        }
+        assert Token.objects.get(customer_id="customer-2").state == Token.State.DELETED
+
+    def test_bulk_auto_debit_missing_tokens(
+        self,
+        ottu,
+        django_assert_num_queries,
+        mocker,
+    ):
+        # Would run in the worker threads, out of reach of the query count
+        lookup = mocker.spy(type(ottu.session), "get_token_from_db")
+        records = [
+            {
+                "txn_type": "payment_request",
+                "amount": "1.000",
+                "currency_code": "KWD",
+                "customer_id": f"customer-{index}",
+                "agreement": {"id": f"agreement-{index}"},
+                "order_no": f"order-{index}",
+            }
+            for index in range(5)
+        ]
+        with django_assert_num_queries(2):
+            # The vault and the checkouts, once for the whole batch
+            summary = ottu.session.bulk_auto_debit(records)
+        assert summary.failed == 5
+        assert summary.results[0].errors == ["Token not found in the database"]
+        lookup.assert_not_called()
+
+    @pytest.mark.parametrize("state", [Token.State.DELETED, Token.State.EXPIRED])
+    def test_inactive_token_is_not_used(self, ottu, state):
+        self.create_checkout("s-1", "old-token")
+        Token.save_token(
+            customer_id="customer-1",
+            agreement_id="agreement-1",
+            token="old-token",
+        )
+        if state == Token.State.DELETED:
+            Token.delete_token(customer_id="customer-1", token="old-token")
+        else:
+            Token.objects.update(state=state)
+
+        with pytest.raises(APIInterruptError):
+            ottu.session.get_token_from_db(self.agreement, "customer-1")
+        assert ottu.session.get_tokens_from_db([("customer-1", "agreement-1")]) == {}
+        # Not restored from the checkouts either
+        assert Token.objects.get().state == state
+
+    def test_abstract_token_model(self, ottu, mocker):
+        mocker.patch.object(Token._meta, "abstract", True)
+        lookup = mocker.patch.object(Token, "lookup_token")
+        add = mocker.patch.object(Token, "add_token")
+        self.create_checkout("s-1", "checkout-token")
+        token = ottu.session.get_token_from_db(self.agreement, "customer-1")
+        assert token == "checkout-token"
+        lookup.assert_not_called()
+        add.assert_not_called()
@@ -5,6 +5,8 @@ from ottu.contrib.django.models import Webhook
 from ottu.utils.webhooks import calculate_subscription_hmac_signature
 from tests.fake_data import webhook_payload
 
+from .polls.views import AsyncWebhookViewReceiveView, WebhookViewReceiveView
+
 pytestmark = pytest.mark.django_db
 
 
@@ -80,3 +82,109 @@ class TestWebhookReceiveView:
         post_count = Webhook.objects.count()
         assert pre_count == post_count
         assert response.status_code == 401
+
+    def test_payload_too_large(self, client, mocker):
+        mocker.patch("ottu.contrib.django.views.conf.WEBHOOK_MAX_BODY_SIZE", 16)
+        pre_count = Webhook.objects.count()
+        response = client.post(
+            reverse("webhook-receiver"),
+            data=webhook_payload,
+            content_type="application/json",
+        )
+        post_count = Webhook.objects.count()
+        assert pre_count == post_count
+        assert response.status_code == 413
+        assert response.json() == {"detail": "Payload too large"}
+
+    def test_payload_too_large_without_content_length(self, rf, mocker):
+        mocker.patch("ottu.contrib.django.views.conf.WEBHOOK_MAX_BODY_SIZE", 16)
+        request = rf.post(
+            reverse("webhook-receiver"),
+            data=webhook_payload,
+            content_type="application/json",
+        )
+        request.META.pop("CONTENT_LENGTH")
+        response = WebhookViewReceiveView.as_view()(request)
+        assert response.status_code == 413
+
+    def test_zero_body_size(self, client, mocker):
+        # `0` is a limit, only `None` disables the check
+        mocker.patch("ottu.contrib.django.views.conf.WEBHOOK_MAX_BODY_SIZE", 0)
+        response = client.post(
+            reverse("webhook-receiver"),
+            data=webhook_payload,
+            content_type="application/json",
+        )
+        assert response.status_code == 413
+
+    def test_unlimited_body_size(self, client, mocker):
+        mocker.patch("ottu.contrib.django.views.conf.WEBHOOK_MAX_BODY_SIZE", None)
+        response = client.post(
+            reverse("webhook-receiver"),
+            data=webhook_payload,
+            content_type="application/json",
+        )
+        assert response.status_code == 200
+
+    def test_stdlib_json_fallback(self, client, mocker):
+        mocker.patch("ottu.contrib.django.views.orjson", None)
+        response = client.post(
+            reverse("webhook-receiver"),
+            data=webhook_payload,
+            content_type="application/json",
+        )
+        assert response.status_code == 200
+
+    def test_payload_logged_lazily(self, client, mocker):
+        mock_logger = mocker.patch("ottu.contrib.django.views.logger")
+        response = client.post(
+            reverse("webhook-receiver"),
+            data=webhook_payload,
+            content_type="application/json",
+        )
+        assert response.status_code == 200
+        # The payload is passed as an argument, so it is only
+        # formatted when a handler actually emits the record.
+        mock_logger.info.assert_called_once_with(
+            "Webhook received: %s",
+            webhook_payload,
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAsyncWebhookReceiveView:
+    @pytest.mark.asyncio
+    async def test_success(self, async_client):
+        response = await async_client.post(
+            reverse("async-webhook-receiver"),
+            data=webhook_payload,
+            content_type="application/json",
+        )
+        assert response.status_code == 200
+        assert response.json() == {"detail": "Success"}
+        assert await Webhook.objects.acount() == 1
+
+    @pytest.mark.asyncio
+    async def test_unverified(self, async_client):
+        payload = {**webhook_payload, "signature": "invalid-signature"}
+        response = await async_client.post(
+            reverse("async-webhook-receiver"),
+            data=payload,
+            content_type="application/json",
+        )
+        assert response.status_code == 401
+        assert await Webhook.objects.acount() == 0
+
+    @pytest.mark.asyncio
+    async def test_processing_error(self, async_client, custom_wh_error):
+        response = await async_client.post(
+            reverse("async-webhook-receiver"),
+            data=webhook_payload,
+            content_type="application/json",
+        )
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Failed to process webhook"}
+        assert await Webhook.objects.acount() == 0
+
+    def test_view_is_async(self):
+        assert AsyncWebhookViewReceiveView.view_is_async
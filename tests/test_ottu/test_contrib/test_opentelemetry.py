@@ -0,0 +1,63 @@
+import httpx
+import pytest
+
+from ottu import Ottu
+
+pytest.importorskip("opentelemetry.sdk")
+
+from opentelemetry.sdk.trace import TracerProvider  # noqa: E402
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor  # noqa: E402
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (  # noqa: E402
+    InMemorySpanExporter,
+)
+from opentelemetry.trace import SpanKind, StatusCode  # noqa: E402
+
+
+@pytest.fixture
+def exporter():
+    return InMemorySpanExporter()
+
+
+@pytest.fixture
+def tracer_provider(exporter):
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    return provider
+
+
+class TestOpenTelemetryHook:
+    def test_span(self, httpx_mock, auth_api_key, tracer_provider, exporter):
+        from ottu.contrib.opentelemetry import OpenTelemetryHook
+
+        httpx_mock.add_response(
+            url="https://test.ottu.dev/b/pbl/v2/payment-methods/",
+            method="POST",
+            status_code=200,
+            json={"payment_methods": []},
+        )
+        hook = OpenTelemetryHook(tracer_provider=tracer_provider)
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key, hooks=[hook])
+        ottu.get_payment_methods(plugin="payment_request")
+
+        (span,) = exporter.get_finished_spans()
+        assert span.name == "POST /b/pbl/v2/payment-methods/"
+        assert span.kind == SpanKind.CLIENT
+        assert span.attributes["server.address"] == "test.ottu.dev"
+        assert span.attributes["http.response.status_code"] == 200
+        assert span.status.status_code == StatusCode.UNSET
+
+    def test_error_span(self, mocker, auth_api_key, tracer_provider, exporter):
+        from ottu.contrib.opentelemetry import OpenTelemetryHook
+
+        mocker.patch(
+            "httpx._client.Client.request",
+            side_effect=httpx.ConnectTimeout("timeout"),
+        )
+        hook = OpenTelemetryHook(tracer_provider=tracer_provider)
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key, hooks=[hook])
+        ottu.send_request(path="/any/path", method="GET")
+
+        (span,) = exporter.get_finished_spans()
+        assert span.status.status_code == StatusCode.ERROR
+        assert span.attributes["error.type"] == "ConnectTimeout"
+        assert span.events[0].name == "exception"
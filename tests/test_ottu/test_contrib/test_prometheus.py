@@ -0,0 +1,68 @@
+import httpx
+import pytest
+
+from ottu import Ottu
+
+prometheus_client = pytest.importorskip("prometheus_client")
+
+
+@pytest.fixture
+def registry():
+    return prometheus_client.CollectorRegistry()
+
+
+class TestPrometheusHook:
+    def test_metrics(self, httpx_mock, auth_api_key, registry):
+        from ottu.contrib.prometheus import PrometheusHook
+
+        session_id = "10039bbdadb8ef80dd9e16e200c241b139684a8d"
+        httpx_mock.add_response(
+            url=f"https://test.ottu.dev/b/checkout/v1/pymt-txn/{session_id}",
+            method="GET",
+            status_code=200,
+            json={"session_id": session_id},
+        )
+        hook = PrometheusHook(registry=registry)
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key, hooks=[hook])
+        ottu.session.retrieve(session_id=session_id)
+
+        labels = {
+            "merchant_id": "test.ottu.dev",
+            "method": "GET",
+            "endpoint": "/b/checkout/v1/pymt-txn/{id}",
+        }
+        assert (
+            registry.get_sample_value(
+                "ottu_requests_total",
+                {**labels, "status_code": "200"},
+            )
+            == 1
+        )
+        assert (
+            registry.get_sample_value("ottu_request_duration_seconds_count", labels)
+            == 1
+        )
+        assert registry.get_sample_value("ottu_response_bytes_total", labels) > 0
+
+    def test_errors(self, mocker, auth_api_key, registry):
+        from ottu.contrib.prometheus import PrometheusHook
+
+        mocker.patch(
+            "httpx._client.Client.request",
+            side_effect=httpx.ConnectTimeout("timeout"),
+        )
+        hook = PrometheusHook(registry=registry)
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key, hooks=[hook])
+        ottu.send_request(path="/any/path", method="GET")
+        assert (
+            registry.get_sample_value(
+                "ottu_request_errors_total",
+                {
+                    "merchant_id": "test.ottu.dev",
+                    "method": "GET",
+                    "endpoint": "/any/path",
+                    "error": "ConnectTimeout",
+                },
+            )
+            == 1
+        )
@@ -1,3 +1,5 @@
+import os
+
 import pytest
 
 from ottu.auth import (
@@ -141,3 +143,16 @@ class TestKCAuthCache(KCAuthTestMixin):
         realm="test-realm",
         caching=True,
     )
+
+
+def test_kc_token_client_after_fork(mocker):
+    auth = KeycloakClientAuth(
+        client_id="client",
+        client_secret="secret",
+        host="sso.ottu.dev",
+        realm="test",
+    )
+    token_client = auth.token_client
+    mocker.patch("ottu.auth.os.getpid", return_value=os.getpid() + 1)
+    assert auth.token_client is not token_client
+    assert not token_client.is_closed
@@ -0,0 +1,320 @@
+import json
+import threading
+import time
+
+import httpx
+import pytest
+
+from ottu import Ottu
+from ottu.bulk import (
+    JSONLinesSink,
+    RateLimiter,
+    load_completed_keys,
+    validate_auto_debit_record,
+    validate_checkout_record,
+)
+from ottu.errors import APIInterruptError
+from ottu.session import Session
+from tests import fake_data
+
+URL = "https://test.ottu.dev/b/checkout/v1/pymt-txn/"
+
+
+def make_records(count):
+    return (
+        {
+            "txn_type": "payment_request",
+            "amount": f"{index + 1}.000",
+            "currency_code": "KWD",
+            "pg_codes": ["KNET"],
+            "order_no": f"order-{index}",
+        }
+        for index in range(count)
+    )
+
+
+def add_checkout_callback(httpx_mock, fail_order_no=None):
+    lock = threading.Lock()
+    in_flight = {"now": 0, "max": 0}
+
+    def callback(request):
+        payload = json.loads(request.content)
+        with lock:
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        time.sleep(0.005)
+        with lock:
+            in_flight["now"] -= 1
+        if payload["order_no"] == fail_order_no:
+            return httpx.Response(status_code=400, json={"amount": ["Invalid"]})
+        return httpx.Response(
+            status_code=201,
+            json={
+                **fake_data.response_checkout,
+                "session_id": f"session-{payload['order_no']}",
+                "order_no": payload["order_no"],
+            },
+        )
+
+    httpx_mock.add_callback(callback, url=URL, method="POST")
+    return in_flight
+
+
+class TestValidateCheckoutRecord:
+    def test_valid(self):
+        assert validate_checkout_record(next(make_records(1))) == []
+
+    def test_invalid(self):
+        errors = validate_checkout_record(
+            {"txn_type": "unknown", "amount": "-1", "pg_codes": "KNET"},
+        )
+        assert errors == [
+            "`currency_code` is required",
+            "`txn_type` 'unknown' is not a valid transaction type",
+            "`amount` must be greater than zero",
+            "`pg_codes` must be a list",
+        ]
+
+
+class TestBulkCreate:
+    def test_creates_sessions(self, httpx_mock, auth_api_key):
+        in_flight = add_checkout_callback(httpx_mock, fail_order_no="order-3")
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        summary = ottu.session.bulk_create(make_records(20), concurrency=4)
+
+        assert (summary.total, summary.succeeded, summary.failed) == (20, 19, 1)
+        assert len(summary.results) == 20
+        assert 1 < in_flight["max"] <= 4
+        results = {result.key: result for result in summary.results}
+        assert results["order-0"].session_id == "session-order-0"
+        assert results["order-0"].checkout_url
+        assert results["order-3"].success is False
+        assert results["order-3"].status_code == 400
+
+    def test_invalid_records_are_not_sent(self, httpx_mock, auth_api_key):
+        add_checkout_callback(httpx_mock)
+        records = [*make_records(2), {"order_no": "broken", "amount": "1"}]
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        summary = ottu.session.bulk_create(records)
+
+        assert (summary.succeeded, summary.invalid) == (2, 1)
+        assert len(httpx_mock.get_requests()) == 2
+
+    def test_dry_run(self, auth_api_key):
+        records = [*make_records(3), {"order_no": "broken"}]
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        summary = ottu.session.bulk_create(records, dry_run=True)
+        assert (summary.succeeded, summary.invalid) == (3, 1)
+
+    def test_sink_and_resume(self, httpx_mock, auth_api_key, tmp_path):
+        add_checkout_callback(httpx_mock, fail_order_no="order-1")
+        path = tmp_path / "results.jsonl"
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        with JSONLinesSink(path) as sink:
+            summary = ottu.session.bulk_create(make_records(3), sink=sink)
+        assert summary.results == []
+        assert len(path.read_text().splitlines()) == 3
+
+        # a partially written line of an interrupted run is ignored
+        with path.open("a") as f:
+            f.write('{"key": "order-')
+        completed = load_completed_keys(path)
+        assert completed == {"order-0", "order-2"}
+
+        summary = ottu.session.bulk_create(make_records(3), completed=completed)
+        assert (summary.skipped, summary.succeeded) == (2, 0)
+        assert summary.results[0].key == "order-1"
+
+    def test_interrupted_run_reports_sent_records(self, httpx_mock, auth_api_key):
+        add_checkout_callback(httpx_mock)
+
+        def records():
+            yield from make_records(3)
+            raise KeyboardInterrupt
+
+        results = []
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        with pytest.raises(KeyboardInterrupt):
+            ottu.session.bulk_create(records(), sink=results.append)
+        assert {result.key for result in results} == {"order-0", "order-1", "order-2"}
+        assert all(result.success for result in results)
+
+    def test_failing_sink_reports_sent_records(self, httpx_mock, auth_api_key):
+        add_checkout_callback(httpx_mock)
+        results = []
+
+        def sink(result):
+            if not results:
+                results.append(None)
+                raise OSError("No space left on device")
+            results.append(result)
+
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        with pytest.raises(OSError):
+            ottu.session.bulk_create(make_records(20), sink=sink, concurrency=2)
+        sent = {
+            json.loads(request.content)["order_no"]
+            for request in httpx_mock.get_requests()
+        }
+        # Including the result the sink failed on, the other records are
+        # not sent
+        assert {result.key for result in results[1:]} == sent
+        assert len(sent) < 20
+
+    def test_exception_is_reported(self, auth_api_key, mocker):
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        mocker.patch.object(
+            ottu.session,
+            "create",
+            side_effect=httpx.ConnectError("Connection refused"),
+        )
+        summary = ottu.session.bulk_create(make_records(1))
+        assert summary.failed == 1
+        assert summary.results[0].errors == ["Connection refused"]
+
+
+TOKENS = {
+    ("customer-0", "agreement-0"): "token-0",
+    ("customer-1", "agreement-1"): "token-1",
+}
+
+
+class DBSession(Session):
+    batches: list = []
+
+    def get_token_from_db(self, agreement, customer_id) -> str:
+        try:
+            return TOKENS[(customer_id, agreement["id"])]
+        except KeyError:
+            raise APIInterruptError(
+                success=False,
+                status_code=400,
+                endpoint="",
+                response={},
+                error={"detail": "Token not found in the database"},
+            )
+
+    def get_tokens_from_db(self, pairs):
+        self.batches.append(set(pairs))
+        return super().get_tokens_from_db(pairs)
+
+
+class DBOttu(Ottu):
+    session_cls = DBSession
+
+
+def add_auto_debit_callbacks(httpx_mock):
+    def checkout(request):
+        payload = json.loads(request.content)
+        return httpx.Response(
+            status_code=201,
+            json={**fake_data.response_checkout, "session_id": payload["order_no"]},
+        )
+
+    def auto_debit(request):
+        payload = json.loads(request.content)
+        return httpx.Response(
+            status_code=200,
+            json={
+                **fake_data.response_auto_debit,
+                "session_id": payload["session_id"],
+                "token": payload["token"],
+            },
+        )
+
+    httpx_mock.add_callback(checkout, url=URL, method="POST")
+    httpx_mock.add_callback(
+        auto_debit,
+        url="https://test.ottu.dev/b/pbl/v2/auto-debit/",
+        method="POST",
+    )
+
+
+class TestBulkAutoDebit:
+    def make_records(self, count):
+        return [
+            {
+                "txn_type": "payment_request",
+                "amount": "1.000",
+                "currency_code": "KWD",
+                "pg_codes": ["KNET"],
+                "customer_id": f"customer-{index}",
+                "agreement": {"id": f"agreement-{index}"},
+                "order_no": f"order-{index}",
+            }
+            for index in range(count)
+        ]
+
+    def test_validate(self):
+        assert validate_auto_debit_record(self.make_records(1)[0]) == []
+        record = {**self.make_records(1)[0], "agreement": {"type": "recurring"}}
+        assert validate_auto_debit_record(record) == [
+            "`agreement` must be an object with an `id`",
+        ]
+
+    def test_get_tokens_from_db(self, auth_api_key):
+        session = DBOttu(merchant_id="test.ottu.dev", auth=auth_api_key).session
+        tokens = session.get_tokens_from_db(
+            [("customer-0", "agreement-0"), ("customer-2", "agreement-2")],
+        )
+        assert tokens == {("customer-0", "agreement-0"): "token-0"}
+
+    def test_tokens_are_resolved_in_batches(self, httpx_mock, auth_api_key, mocker):
+        ottu = DBOttu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        mocker.patch.object(DBSession, "batches", [])
+        add_auto_debit_callbacks(httpx_mock)
+        records = self.make_records(4)
+        records[2]["token"] = "given-token"
+
+        summary = ottu.session.bulk_auto_debit(records, token_batch_size=2)
+
+        assert DBSession.batches == [
+            {("customer-0", "agreement-0"), ("customer-1", "agreement-1")},
+            {("customer-3", "agreement-3")},
+        ]
+        assert (summary.succeeded, summary.failed) == (3, 1)
+        tokens = {
+            json.loads(request.content)["token"]
+            for request in httpx_mock.get_requests()
+            if request.url.path.endswith("/auto-debit/")
+        }
+        assert tokens == {"token-0", "token-1", "given-token"}
+        failed = next(result for result in summary.results if not result.success)
+        assert failed.key == "order-3"
+        assert failed.errors == ["Token not found in the database"]
+
+    def test_token_errors_are_reported(self, httpx_mock, auth_api_key, mocker):
+        ottu = DBOttu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        mocker.patch.object(
+            DBSession,
+            "get_tokens_from_db",
+            side_effect=RuntimeError("database is down"),
+        )
+        add_auto_debit_callbacks(httpx_mock)
+        records = self.make_records(3)
+        records[1]["token"] = "given-token"
+
+        summary = ottu.session.bulk_auto_debit(records)
+
+        assert (summary.succeeded, summary.failed) == (1, 2)
+        results = {result.key: result for result in summary.results}
+        assert results["order-1"].success is True
+        assert results["order-0"].errors == ["database is down"]
+        assert results["order-2"].errors == ["database is down"]
+
+    def test_token_lookup_not_implemented(self, auth_api_key):
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        summary = ottu.session.bulk_auto_debit(self.make_records(2))
+        assert summary.failed == 2
+        assert summary.results[0].errors == [
+            "Please implement this method in your subclass",
+        ]
+
+
+class TestRateLimiter:
+    def test_spacing(self):
+        limiter = RateLimiter(rate=200)
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.acquire()
+        assert time.monotonic() - start >= 4 / 200
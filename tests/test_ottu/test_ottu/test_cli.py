@@ -0,0 +1,139 @@
+import io
+import json
+
+import httpx
+
+from ottu.cli import ProgressSink, main, parse_csv_row
+from tests import fake_data
+
+URL = "https://test.ottu.dev/b/checkout/v1/pymt-txn/"
+
+CSV = """order_no,amount,customer_phone,pg_codes,extra
+order-1,10.000,+96550000001,"knet,mpgs",
+order-2,20.000,+96550000002,,"{""campaign"": ""june""}"
+"""
+
+
+def add_checkout_callback(httpx_mock):
+    def callback(request):
+        payload = json.loads(request.content)
+        return httpx.Response(
+            status_code=201,
+            json={
+                **fake_data.response_checkout,
+                "session_id": f"session-{payload['order_no']}",
+            },
+        )
+
+    httpx_mock.add_callback(callback, url=URL, method="POST")
+
+
+def test_parse_csv_row():
+    assert parse_csv_row(
+        {"amount": "1", "pg_codes": "knet, mpgs", "extra": '{"a": 1}', "mode": ""},
+    ) == {"amount": "1", "pg_codes": ["knet", "mpgs"], "extra": {"a": 1}}
+
+
+def test_parse_csv_row_invalid_json():
+    record = parse_csv_row({"amount": "1", "extra": '{"a": 1'})
+    assert record["amount"] == "1"
+    assert record["_errors"][0].startswith("`extra` is not valid JSON")
+
+
+class TestBulkCheckout:
+    args = [
+        "bulk-checkout",
+        "--merchant-id",
+        "test.ottu.dev",
+        "--api-key",
+        "secret",
+        "--txn-type",
+        "payment_request",
+        "--currency-code",
+        "KWD",
+        "--pg-codes",
+        "knet",
+    ]
+
+    def test_csv(self, httpx_mock, tmp_path, capsys):
+        add_checkout_callback(httpx_mock)
+        path = tmp_path / "customers.csv"
+        path.write_text(CSV)
+        output = tmp_path / "results.jsonl"
+
+        assert main([*self.args, str(path), "--output", str(output)]) == 0
+
+        payloads = sorted(
+            (json.loads(request.content) for request in httpx_mock.get_requests()),
+            key=lambda payload: payload["order_no"],
+        )
+        assert payloads[0]["pg_codes"] == ["knet", "mpgs"]
+        assert payloads[1]["pg_codes"] == ["knet"]
+        assert payloads[1]["extra"] == {"campaign": "june"}
+        assert payloads[1]["type"] == "payment_request"
+        results = [json.loads(line) for line in output.read_text().splitlines()]
+        assert {result["session_id"] for result in results} == {
+            "session-order-1",
+            "session-order-2",
+        }
+        assert '"succeeded": 2' in capsys.readouterr().err
+
+        # A second run resumes from the output and sends nothing
+        assert main([*self.args, str(path), "--output", str(output)]) == 0
+        assert len(httpx_mock.get_requests()) == 2
+
+    def test_jsonl_to_stdout(self, httpx_mock, tmp_path, capsys):
+        add_checkout_callback(httpx_mock)
+        path = tmp_path / "customers.jsonl"
+        path.write_text(json.dumps({"order_no": "order-1", "amount": "1.5"}) + "\n")
+
+        assert main([*self.args, str(path)]) == 0
+        result = json.loads(capsys.readouterr().out)
+        assert result["session_id"] == "session-order-1"
+
+    def test_dry_run(self, tmp_path, capsys):
+        path = tmp_path / "customers.csv"
+        path.write_text("order_no,amount\norder-1,10\norder-2,abc\n")
+
+        assert main(["bulk-checkout", str(path), "--dry-run", "--txn-type", "x"]) == 1
+        out = capsys.readouterr().out.splitlines()
+        assert len(out) == 2
+        assert "`currency_code` is required" in out[0]
+
+    def test_invalid_json_is_reported(self, httpx_mock, tmp_path, capsys):
+        add_checkout_callback(httpx_mock)
+        path = tmp_path / "customers.jsonl"
+        path.write_text(
+            '{"order_no": "order-1", "amount": "1.5"}\n'
+            '{"order_no": "order-2", "amou\n'
+            "[1, 2]\n"
+            '{"order_no": "order-3", "amount": "2"}\n',
+        )
+
+        assert main([*self.args, str(path)]) == 1
+        out, err = capsys.readouterr()
+        results = {
+            result["key"]: result for result in map(json.loads, out.splitlines())
+        }
+        assert results["order-1"]["success"] and results["order-3"]["success"]
+        # Keyed by their position, they have no `order_no`
+        assert results["1"]["errors"][0].startswith("Not valid JSON")
+        assert results["2"]["errors"] == ["Not a JSON object"]
+        assert '"invalid": 2' in err
+        assert len(httpx_mock.get_requests()) == 2
+
+    def test_missing_credentials(self, tmp_path, capsys, monkeypatch):
+        monkeypatch.delenv("OTTU_API_KEY", raising=False)
+        path = tmp_path / "customers.jsonl"
+        path.write_text("")
+        assert main(["bulk-checkout", str(path), "--merchant-id", "m.ottu.dev"]) == 2
+        assert "Missing credentials" in capsys.readouterr().err
+
+
+def test_progress_eta():
+    stream = io.StringIO()
+    progress = ProgressSink(sink=lambda result: None, total=100, stream=stream)
+    progress.done = 50
+    progress.start -= 10
+    progress.print_progress()
+    assert stream.getvalue() == "50/100 records, 0 failed, 5.0/s, ETA 0:00:10\n"
@@ -0,0 +1,202 @@
+import httpx
+import pytest
+
+from ottu import Ottu
+from ottu.hooks import AutoflowEvent, AutoflowStats, RequestHook, get_path_template
+
+
+class RecordingHook(RequestHook):
+    def __init__(self):
+        self.calls = []
+
+    def on_request(self, event):
+        self.calls.append(("on_request", event))
+
+    def on_response(self, event):
+        self.calls.append(("on_response", event))
+
+    def on_error(self, event):
+        self.calls.append(("on_error", event))
+
+    def on_autoflow(self, event):
+        self.calls.append(("on_autoflow", event))
+
+
+class TestPathTemplate:
+    @pytest.mark.parametrize(
+        "path,expected",
+        [
+            ("/b/checkout/v1/pymt-txn/", "/b/checkout/v1/pymt-txn/"),
+            (
+                "/b/checkout/v1/pymt-txn/10039bbdadb8ef80dd9e16e200c241b139684a8d",
+                "/b/checkout/v1/pymt-txn/{id}",
+            ),
+            ("/b/pbl/v2/card/9094504640665278/", "/b/pbl/v2/card/{id}/"),
+            ("/b/pbl/v2/payment-methods/", "/b/pbl/v2/payment-methods/"),
+        ],
+    )
+    def test_get_path_template(self, path, expected):
+        assert get_path_template(path) == expected
+
+
+class TestRequestHooks:
+    def test_response_event(self, httpx_mock, auth_api_key):
+        httpx_mock.add_response(
+            url="https://test.ottu.dev/any/path",
+            method="POST",
+            status_code=201,
+            json={"message": "success"},
+        )
+        hook = RecordingHook()
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key, hooks=[hook])
+        ottu.send_request(path="/any/path", method="POST", json={"foo": "bar"})
+
+        assert [name for name, _ in hook.calls] == ["on_request", "on_response"]
+        event = hook.calls[-1][1]
+        assert hook.calls[0][1] is event
+        assert event.merchant_id == "test.ottu.dev"
+        assert event.method == "POST"
+        assert event.path == "/any/path"
+        assert event.status_code == 201
+        assert event.latency >= 0
+        assert event.request_bytes == len(b'{"foo": "bar"}')
+        assert event.response_bytes == len(b'{"message": "success"}')
+        assert event.error is None
+
+    def test_non_2xx_is_a_response(self, httpx_mock, auth_api_key):
+        httpx_mock.add_response(
+            url="https://test.ottu.dev/any/path",
+            method="GET",
+            status_code=400,
+            json={"detail": "error"},
+        )
+        hook = RecordingHook()
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key, hooks=[hook])
+        ottu.send_request(path="/any/path", method="GET")
+        assert [name for name, _ in hook.calls] == ["on_request", "on_response"]
+        assert hook.calls[-1][1].status_code == 400
+
+    def test_error_event(self, mocker, auth_api_key):
+        mocker.patch(
+            "httpx._client.Client.request",
+            side_effect=httpx.ConnectTimeout("timeout"),
+        )
+        hook = RecordingHook()
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key, hooks=[hook])
+        response = ottu.send_request(path="/any/path", method="GET")
+        assert response.status_code == 500
+        assert [name for name, _ in hook.calls] == ["on_request", "on_error"]
+        event = hook.calls[-1][1]
+        assert isinstance(event.error, httpx.ConnectTimeout)
+        assert event.status_code is None
+        assert event.latency >= 0
+
+    def test_failing_hook_does_not_break_request(self, httpx_mock, auth_api_key):
+        class BrokenHook(RequestHook):
+            def on_response(self, event):
+                raise RuntimeError("broken")
+
+        httpx_mock.add_response(
+            url="https://test.ottu.dev/any/path",
+            method="GET",
+            status_code=200,
+            json={"message": "success"},
+        )
+        ottu = Ottu(
+            merchant_id="test.ottu.dev",
+            auth=auth_api_key,
+            hooks=[BrokenHook()],
+        )
+        response = ottu.send_request(path="/any/path", method="GET")
+        assert response.success is True
+
+
+class TestAutoflowHooks:
+    def test_auto_debit_autoflow_timings(
+        self,
+        httpx_mock,
+        auth_api_key,
+        payload_auto_debit_autoflow,
+        response_payment_methods,
+        response_checkout,
+        response_auto_debit,
+    ):
+        httpx_mock.add_response(
+            url="https://test.ottu.dev/b/pbl/v2/payment-methods/",
+            method="POST",
+            status_code=200,
+            json=response_payment_methods,
+        )
+        httpx_mock.add_response(
+            url="https://test.ottu.dev/b/checkout/v1/pymt-txn/",
+            method="POST",
+            status_code=200,
+            json=response_checkout,
+        )
+        httpx_mock.add_response(
+            url="https://test.ottu.dev/b/pbl/v2/auto-debit/",
+            method="POST",
+            status_code=200,
+            json=response_auto_debit,
+        )
+        hook = RecordingHook()
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key, hooks=[hook])
+        ottu.auto_debit_autoflow(token="test-token", **payload_auto_debit_autoflow)
+
+        (event,) = [event for name, event in hook.calls if name == "on_autoflow"]
+        assert event.flow == "auto_debit_autoflow"
+        assert event.merchant_id == "test.ottu.dev"
+        assert event.success is True
+        # `token_lookup` is skipped because the token is passed explicitly
+        assert set(event.timings) == {
+            "payment_methods",
+            "session_create",
+            "auto_debit",
+            "total",
+        }
+        assert event.timings["total"] >= event.timings["session_create"]
+
+    def test_checkout_autoflow_failure(
+        self,
+        httpx_mock,
+        auth_api_key,
+        payload_checkout_autoflow,
+    ):
+        httpx_mock.add_response(
+            url="https://test.ottu.dev/b/pbl/v2/payment-methods/",
+            method="POST",
+            status_code=500,
+            json={"detail": "Internal Server Error"},
+        )
+        hook = RecordingHook()
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key, hooks=[hook])
+        response = ottu.checkout_autoflow(**payload_checkout_autoflow)
+        assert response["success"] is False
+
+        (event,) = [event for name, event in hook.calls if name == "on_autoflow"]
+        assert event.flow == "checkout_autoflow"
+        assert event.success is False
+        assert set(event.timings) == {"payment_methods", "total"}
+
+
+class TestAutoflowStats:
+    def test_summary(self):
+        stats = AutoflowStats()
+        for duration in [0.1, 0.2, 0.3, 0.4]:
+            stats.on_autoflow(
+                AutoflowEvent(
+                    merchant_id="test.ottu.dev",
+                    flow="auto_debit_autoflow",
+                    timings={"token_lookup": duration, "total": duration * 2},
+                    success=True,
+                ),
+            )
+        summary = stats.summary()["auto_debit_autoflow"]
+        assert summary["token_lookup"]["count"] == 4
+        assert summary["token_lookup"]["mean"] == pytest.approx(0.25)
+        assert summary["token_lookup"]["max"] == 0.4
+        assert summary["token_lookup"]["p50"] in (0.2, 0.3)
+        assert summary["total"]["p99"] == 0.8
+
+        stats.reset()
+        assert stats.summary() == {}
@@ -1,6 +1,20 @@
+import gc
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from inspect import signature
 
+import httpx
+import pytest
+
+from ottu.auth import KeycloakClientAuth
 from ottu.ottu import Ottu
+from tests import fake_data
 from tests.test_ottu.test_ottu.mixins import (
     MethodRefMixin,
     OttuAutoDebitMixin,
@@ -49,6 +63,328 @@ class TestOttuMisc:
         assert response.status_code == 200
 
 
+class TestImports:
+    def test_import_is_light(self):
+        code = (
+            "import sys, ottu; "
+            "print(sorted({'asgiref', 'django'} & sys.modules.keys()))"
+        )
+        output = subprocess.check_output([sys.executable, "-c", code], text=True)
+        assert output.strip() == "[]"
+
+    def test_ottu_async_is_importable(self):
+        import ottu
+        from ottu.async_ottu import OttuAsync
+
+        assert ottu.OttuAsync is OttuAsync
+        with pytest.raises(AttributeError):
+            ottu.Missing
+
+
+class TestOttuClose:
+    def test_close(self, auth_api_key):
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        ottu.close()
+        assert ottu.request_session.is_closed
+        # idempotent
+        ottu.close()
+
+    def test_context_manager(self, auth_api_key):
+        with Ottu(merchant_id="test.ottu.dev", auth=auth_api_key) as ottu:
+            assert not ottu.request_session.is_closed
+        assert ottu.request_session.is_closed
+
+    def test_finalizer(self, auth_api_key):
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        client = ottu.request_session
+        del ottu
+        gc.collect()
+        assert client.is_closed
+
+    def test_shared_transport_is_not_closed(self, auth_api_key, mocker):
+        transport = mocker.Mock(spec=httpx.BaseTransport)
+        with Ottu(merchant_id="test.ottu.dev", auth=auth_api_key, transport=transport):
+            pass
+        transport.close.assert_not_called()
+
+    def test_auth_token_client(self, httpx_mock):
+        httpx_mock.add_response(
+            url="https://sso.ottu.dev/auth/realms/test/protocol/openid-connect/token",
+            method="POST",
+            json={"access_token": "token", "expires_in": 300},
+        )
+        auth = KeycloakClientAuth(
+            client_id="client",
+            client_secret="secret",
+            host="sso.ottu.dev",
+            realm="test",
+        )
+        auth.get_token()
+        token_client = auth.token_client
+        auth.get_token()
+        assert auth.token_client is token_client
+
+        Ottu(merchant_id="test.ottu.dev", auth=auth).close()
+        assert token_client.is_closed
+        # re-created on the next use
+        assert not auth.token_client.is_closed
+
+
+class TestOttuFork:
+    def test_client_is_replaced_in_child(self, auth_api_key, mocker):
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        parent_client = ottu.request_session
+        assert ottu.request_session is parent_client
+
+        mocker.patch("ottu.ottu.os.getpid", return_value=os.getpid() + 1)
+        child_client = ottu.request_session
+        assert child_client is not parent_client
+        assert ottu.request_session is child_client
+        # the sockets shared with the parent are left alone
+        assert not parent_client.is_closed
+
+    def test_shared_transport_is_not_inherited(self, auth_api_key, mocker):
+        transport = mocker.Mock(spec=httpx.BaseTransport)
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key, transport=transport)
+        mocker.patch("ottu.ottu.os.getpid", return_value=os.getpid() + 1)
+        assert ottu.request_session._transport is not transport
+        ottu.close()
+        transport.close.assert_not_called()
+        assert ottu.request_session.is_closed
+
+    def test_client_factory(self, auth_api_key, mocker):
+        transport = httpx.MockTransport(lambda request: httpx.Response(200))
+        factory = mocker.Mock(
+            side_effect=lambda: httpx.Client(auth=auth_api_key, transport=transport),
+        )
+        ottu = Ottu(
+            merchant_id="test.ottu.dev",
+            auth=auth_api_key,
+            client_factory=factory,
+        )
+        parent_client = ottu.request_session
+        mocker.patch("ottu.ottu.os.getpid", return_value=os.getpid() + 1)
+        child_client = ottu.request_session
+        assert child_client is not parent_client
+        assert child_client._transport is transport
+        assert factory.call_count == 2
+        ottu.close()
+        assert child_client.is_closed
+
+    def test_request_session_setter(self, auth_api_key, mocker):
+        transport = mocker.Mock(spec=httpx.BaseTransport)
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key, transport=transport)
+        # Eg: set in a forked process
+        mocker.patch("ottu.ottu.os.getpid", return_value=os.getpid() + 1)
+        client = httpx.Client()
+        ottu.request_session = client
+        assert ottu.request_session is client
+        ottu.close()
+        assert client.is_closed
+        transport.close.assert_not_called()
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="Requires os.fork()")
+    def test_fork(self, auth_api_key):
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        parent_client = ottu.request_session
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            replaced = ottu.request_session is not parent_client
+            os.write(write_fd, b"1" if replaced else b"0")
+            os._exit(0)
+        os.close(write_fd)
+        os.waitpid(pid, 0)
+        assert os.read(read_fd, 1) == b"1"
+        os.close(read_fd)
+        assert ottu.request_session is parent_client
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"{}"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.mark.skipif(
+    not os.path.isdir("/proc/self/fd"),
+    reason="Counts the open file descriptors through /proc",
+)
+class TestOttuConnectionLeaks:
+    iterations = 20
+
+    @pytest.fixture
+    def server(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_port}"
+        server.shutdown()
+        server.server_close()
+
+    def _open_fds(self):
+        return len(os.listdir("/proc/self/fd"))
+
+    def _run_jobs(self, server, auth, close):
+        instances = []
+        for _ in range(self.iterations):
+            ottu = Ottu(merchant_id="test.ottu.dev", auth=auth)
+            ottu.host_url = server
+            response = ottu.send_request(path="/health/", method="GET")
+            assert response.success
+            if close:
+                ottu.close()
+            # eg: referenced by a job result, or by a reference cycle
+            instances.append(ottu)
+        return instances
+
+    def _wait_for_fds(self, expected, timeout=2.0):
+        # The server threads close their side once they read the EOF
+        deadline = time.monotonic() + timeout
+        while self._open_fds() >= expected + 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self._open_fds()
+
+    def test_open_connections_stay_flat(self, server, auth_api_key):
+        gc.collect()
+        gc.disable()
+        try:
+            before = self._open_fds()
+            instances = self._run_jobs(server, auth_api_key, close=True)
+            after = self._wait_for_fds(before)
+        finally:
+            gc.enable()
+        assert after - before < 5
+        assert len(instances) == self.iterations
+
+    def test_unclosed_clients_leak_until_released(self, server, auth_api_key):
+        gc.collect()
+        before = self._open_fds()
+        instances = self._run_jobs(server, auth_api_key, close=False)
+        leaked = self._open_fds() - before
+        del instances
+        gc.collect()
+        after = self._wait_for_fds(before)
+        # The detection works: keep-alive connections pile up without `close()`
+        assert leaked >= self.iterations
+        # ... and the finalizer releases them once the instances are collected
+        assert after - before < 5
+
+
+def add_session_callback(httpx_mock):
+    """
+    Responds to checkout requests with `session-<order_no>` as session ID.
+    """
+
+    def callback(request):
+        order_no = json.loads(request.content)["order_no"]
+        return httpx.Response(
+            status_code=201,
+            json={**fake_data.response_checkout, "session_id": f"session-{order_no}"},
+        )
+
+    httpx_mock.add_callback(
+        callback,
+        url="https://test.ottu.dev/b/checkout/v1/pymt-txn/",
+        method="POST",
+    )
+
+
+class TestOttuSessionIsolation:
+    def _run_threads(self, ottu, payload, count=4):
+        barrier = threading.Barrier(count)
+        seen = {}
+
+        def worker(index):
+            ottu.checkout(order_no=str(index), **payload)
+            # every thread has created its session before any of them reads it
+            barrier.wait()
+            seen[index] = ottu.session.session_id
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return seen
+
+    def test_threads(self, httpx_mock, auth_api_key, payload_minimal_checkout):
+        add_session_callback(httpx_mock)
+        ottu = Ottu(
+            merchant_id="test.ottu.dev",
+            auth=auth_api_key,
+            isolate_sessions=True,
+        )
+        seen = self._run_threads(ottu, payload_minimal_checkout)
+        assert seen == {index: f"session-{index}" for index in range(4)}
+        # nothing leaks into the current thread
+        assert ottu.session.session_id is None
+
+    def test_instances_are_collected(
+        self,
+        httpx_mock,
+        auth_api_key,
+        payload_minimal_checkout,
+    ):
+        add_session_callback(httpx_mock)
+        ottu = Ottu(
+            merchant_id="test.ottu.dev",
+            auth=auth_api_key,
+            isolate_sessions=True,
+        )
+        ottu.checkout(order_no="1", **payload_minimal_checkout)
+        other = Ottu(
+            merchant_id="test.ottu.dev",
+            auth=auth_api_key,
+            isolate_sessions=True,
+        )
+        assert other.session.session_id is None
+        ref = weakref.ref(ottu)
+
+        del ottu
+        gc.collect()
+        assert ref() is None
+        # The state of the other instance is kept
+        session = other.session
+        gc.collect()
+        assert other.session is session
+
+    def test_shared_by_default(
+        self,
+        httpx_mock,
+        auth_api_key,
+        payload_minimal_checkout,
+    ):
+        add_session_callback(httpx_mock)
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        assert ottu.isolate_sessions is False
+        seen = self._run_threads(ottu, payload_minimal_checkout)
+        assert len(set(seen.values())) == 1
+        assert ottu.session.session_id == seen[0]
+
+    def test_lazy_sessions(self, httpx_mock, auth_api_key, payload_minimal_checkout):
+        add_session_callback(httpx_mock)
+        ottu = Ottu(
+            merchant_id="test.ottu.dev",
+            auth=auth_api_key,
+            isolate_sessions=True,
+            lazy_sessions=True,
+        )
+        ottu.checkout(order_no="1", **payload_minimal_checkout)
+        assert ottu.session.session_id == "session-1"
+        ottu.checkout(order_no="2", **payload_minimal_checkout)
+        assert ottu.session.session_id == "session-2"
+
+
 class TestOttuCheckoutAutoFlow(MethodRefMixin):
     def get_method_ref(self):
         return Ottu.checkout_autoflow
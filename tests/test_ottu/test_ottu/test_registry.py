@@ -0,0 +1,151 @@
+import os
+
+import httpx
+import pytest
+
+from ottu.auth import (
+    APIKeyAuth,
+    BasicAuth,
+    KeycloakClientAuth,
+    KeycloakPasswordAuth,
+)
+from ottu.registry import OttuRegistry, get_auth_key
+
+
+class TestGetAuthKey:
+    def test_equal_credentials(self):
+        assert get_auth_key(APIKeyAuth("key-1")) == get_auth_key(APIKeyAuth("key-1"))
+
+    def test_different_credentials(self):
+        assert get_auth_key(APIKeyAuth("key-1")) != get_auth_key(APIKeyAuth("key-2"))
+        assert get_auth_key(BasicAuth("user", "pass")) != get_auth_key(
+            BasicAuth("user", "other"),
+        )
+
+    def test_keycloak_auth_after_token_fetch(self, httpx_mock):
+        httpx_mock.add_response(
+            url="https://sso.ottu.dev/auth/realms/test/protocol/openid-connect/token",
+            method="POST",
+            json={"access_token": "token", "expires_in": 300},
+        )
+        auth = KeycloakClientAuth(
+            client_id="client",
+            client_secret="secret",
+            host="sso.ottu.dev",
+            realm="test",
+        )
+        registry = OttuRegistry()
+        ottu = registry.get("a.ottu.dev", auth)
+
+        auth.get_token()
+        assert registry.get("a.ottu.dev", auth) is ottu
+        auth.close()
+        assert registry.get("a.ottu.dev", auth) is ottu
+        assert len(registry) == 1
+
+        other = KeycloakClientAuth(
+            client_id="client",
+            client_secret="other",
+            host="sso.ottu.dev",
+            realm="test",
+        )
+        assert registry.get("a.ottu.dev", other) is not ottu
+
+    def test_credentials_are_hashed(self):
+        auth = KeycloakPasswordAuth(
+            username="user",
+            password="hunter2",
+            client_id="client",
+            client_secret="s3cr3t",
+            host="sso.ottu.dev",
+            realm="test",
+        )
+        key = repr(get_auth_key(auth))
+        assert "hunter2" not in key
+        assert "s3cr3t" not in key
+
+    def test_unknown_auth_class(self):
+        class CustomAuth(httpx.Auth):
+            def __init__(self, token):
+                self.token = token
+                self._state = object()
+
+        assert get_auth_key(CustomAuth("a")) == get_auth_key(CustomAuth("a"))
+        assert get_auth_key(CustomAuth("a")) != get_auth_key(CustomAuth("b"))
+
+
+class TestOttuRegistry:
+    def test_cache(self):
+        registry = OttuRegistry()
+        ottu = registry.get("a.ottu.dev", APIKeyAuth("key"))
+        assert registry.get("a.ottu.dev", APIKeyAuth("key")) is ottu
+        assert (
+            registry.get("a.ottu.dev", APIKeyAuth("key"), is_sandbox=False) is not ottu
+        )
+        assert registry.get("a.ottu.dev", APIKeyAuth("other")) is not ottu
+        assert registry.get("b.ottu.dev", APIKeyAuth("key")) is not ottu
+        assert len(registry) == 4
+        assert ottu.isolate_sessions is True
+
+    def test_shared_transport(self, httpx_mock):
+        httpx_mock.add_response(url="https://a.ottu.dev/any/path", json={})
+        httpx_mock.add_response(url="https://b.ottu.dev/any/path", json={})
+        registry = OttuRegistry(timeout=5)
+        ottu_a = registry.get("a.ottu.dev", APIKeyAuth("key-a"))
+        ottu_b = registry.get("b.ottu.dev", APIKeyAuth("key-b"))
+        assert ottu_a.request_session._transport is registry.transport
+        assert ottu_b.request_session._transport is registry.transport
+        assert ottu_a.timeout == 5
+
+        ottu_a.send_request(path="/any/path", method="GET")
+        ottu_b.send_request(path="/any/path", method="GET")
+        request_a, request_b = httpx_mock.get_requests()
+        assert request_a.headers["Authorization"] == "Api-Key key-a"
+        assert request_b.headers["Authorization"] == "Api-Key key-b"
+
+    def test_idle_eviction(self, mocker):
+        monotonic = mocker.patch("ottu.registry.time.monotonic", return_value=0)
+        registry = OttuRegistry(idle_timeout=60)
+        ottu_a = registry.get("a.ottu.dev", APIKeyAuth("key"))
+        monotonic.return_value = 50
+        registry.get("b.ottu.dev", APIKeyAuth("key"))
+
+        monotonic.return_value = 100
+        registry.evict_idle()
+        assert len(registry) == 1
+        assert registry.get("a.ottu.dev", APIKeyAuth("key")) is not ottu_a
+
+    def test_max_clients(self):
+        registry = OttuRegistry(max_clients=2)
+        ottu_a = registry.get("a.ottu.dev", APIKeyAuth("key"))
+        registry.get("b.ottu.dev", APIKeyAuth("key"))
+        registry.get("a.ottu.dev", APIKeyAuth("key"))
+        registry.get("c.ottu.dev", APIKeyAuth("key"))
+        assert len(registry) == 2
+        # `b` was the least recently used
+        assert registry.get("a.ottu.dev", APIKeyAuth("key")) is ottu_a
+
+    def test_close(self, mocker):
+        with OttuRegistry() as registry:
+            registry.get("a.ottu.dev", APIKeyAuth("key"))
+            close = mocker.spy(registry.transport, "close")
+        assert close.call_count == 1
+        assert len(registry) == 0
+        with pytest.raises(RuntimeError):
+            registry.get("a.ottu.dev", APIKeyAuth("key"))
+
+    def test_external_transport_is_not_closed(self, mocker):
+        transport = mocker.Mock()
+        OttuRegistry(transport=transport).close()
+        transport.close.assert_not_called()
+
+    def test_fork(self, mocker):
+        registry = OttuRegistry()
+        ottu = registry.get("a.ottu.dev", APIKeyAuth("key"))
+        transport = registry.transport
+        close = mocker.spy(transport, "close")
+
+        mocker.patch("ottu.registry.os.getpid", return_value=os.getpid() + 1)
+        assert registry.get("a.ottu.dev", APIKeyAuth("key")) is not ottu
+        assert registry.transport is not transport
+        close.assert_not_called()
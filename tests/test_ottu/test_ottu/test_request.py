@@ -1,6 +1,9 @@
+import logging
+
 import httpx
 
 from ottu import Ottu
+from ottu.request import RequestResponseHandler
 
 
 class TestRequest:
@@ -126,3 +129,111 @@ class TestRequest:
         request = httpx_mock.get_request()
         timeout = request.extensions.get("timeout", {})
         assert timeout == {"connect": 22, "pool": 22, "read": 22, "write": 22}
+
+
+class TestRequestLogging:
+    def test_skips_formatting_when_disabled(self, httpx_mock, auth_api_key, mocker):
+        httpx_mock.add_response(
+            url="https://test.ottu.dev/any/path",
+            method="POST",
+            status_code=200,
+            json={"message": "success"},
+        )
+        mocker.patch("ottu.request.logger.isEnabledFor", return_value=False)
+        mock_log_kwargs = mocker.patch.object(
+            RequestResponseHandler,
+            "get_log_kwargs",
+        )
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        ottu.send_request(path="/any/path", method="POST", json={"foo": "bar"})
+        mock_log_kwargs.assert_not_called()
+
+    def test_redacts_secrets(self, httpx_mock, auth_api_key, caplog):
+        httpx_mock.add_response(
+            url="https://test.ottu.dev/any/path",
+            method="POST",
+            status_code=200,
+            json={"message": "success"},
+        )
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        with caplog.at_level(logging.INFO, logger="ottu-py"):
+            ottu.send_request(
+                path="/any/path",
+                method="POST",
+                json={"session_id": "sess-1", "token": "secret-card-token"},
+                headers={"Authorization": "Api-Key secret-key"},
+            )
+        assert "secret-card-token" not in caplog.text
+        assert "secret-key" not in caplog.text
+        assert "sess-1" in caplog.text
+        record = caplog.records[0]
+        assert record.ottu_method == "POST"
+        assert record.ottu_path == "/any/path"
+
+    def test_summarizes_files(self, httpx_mock, auth_api_key, caplog):
+        httpx_mock.add_response(
+            url="https://test.ottu.dev/any/path",
+            method="POST",
+            status_code=200,
+            json={"message": "success"},
+        )
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        content = b"%PDF" + b"x" * 5000
+        with caplog.at_level(logging.INFO, logger="ottu-py"):
+            ottu.send_request(
+                path="/any/path",
+                method="POST",
+                data={"amount": "10"},
+                files={"attachment": ("invoice.pdf", content)},
+            )
+        assert "<file 'invoice.pdf' (5004 bytes)>" in caplog.text
+        assert "xxxx" not in caplog.text
+
+    def test_truncates_long_values(self, httpx_mock, auth_api_key, caplog):
+        class CustomHandler(RequestResponseHandler):
+            log_max_length = 20
+
+        class CustomOttu(Ottu):
+            request_response_handler = CustomHandler
+
+        httpx_mock.add_response(
+            url="https://test.ottu.dev/any/path",
+            method="POST",
+            status_code=200,
+            json={"message": "success"},
+        )
+        ottu = CustomOttu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        with caplog.at_level(logging.INFO, logger="ottu-py"):
+            ottu.send_request(
+                path="/any/path",
+                method="POST",
+                json={"a": "b" * 100},
+            )
+        assert "b" * 21 not in caplog.text
+        assert "<truncated" in caplog.text
+
+    def test_sampling_keeps_errors(self, httpx_mock, auth_api_key, caplog):
+        class CustomHandler(RequestResponseHandler):
+            log_sample_rate = 0.0
+
+        class CustomOttu(Ottu):
+            request_response_handler = CustomHandler
+
+        httpx_mock.add_response(
+            url="https://test.ottu.dev/ok",
+            method="GET",
+            status_code=200,
+            json={},
+        )
+        httpx_mock.add_response(
+            url="https://test.ottu.dev/fail",
+            method="GET",
+            status_code=400,
+            json={"detail": "bad request"},
+        )
+        ottu = CustomOttu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        with caplog.at_level(logging.INFO, logger="ottu-py"):
+            ottu.send_request(path="/ok", method="GET")
+            ottu.send_request(path="/fail", method="GET")
+        assert [r.levelno for r in caplog.records] == [logging.ERROR]
+        assert caplog.records[0].ottu_status_code == 400
@@ -1,10 +1,16 @@
+import builtins
+import io
+import json
+import pathlib
 from inspect import signature
 
+import httpx
 import pytest
 
 from ottu import Ottu
+from ottu.attachments import AttachmentCache
 from ottu.errors import ValidationError
-from ottu.session import Session
+from ottu.session import IterableReader, PaymentMethod, Session
 
 from .mixins import OttuAutoDebitMixin, OttuCheckoutMixin
 
@@ -285,6 +291,86 @@ class TestSessionRefresh:
         assert response is None
 
 
+class TestSessionHydration:
+    url = "https://test.ottu.dev/b/checkout/v1/pymt-txn/"
+
+    def _mock(self, httpx_mock, response_checkout):
+        session_id = response_checkout["session_id"]
+        httpx_mock.add_response(
+            url=self.url,
+            method="POST",
+            status_code=201,
+            json=response_checkout,
+        )
+        httpx_mock.add_response(
+            url=f"{self.url}{session_id}",
+            method="GET",
+            status_code=200,
+            json={**response_checkout, "state": "paid"},
+        )
+        return session_id
+
+    def test_retrieve_updates_in_place(
+        self,
+        httpx_mock,
+        auth_api_key,
+        payload_minimal_checkout,
+        response_checkout,
+    ):
+        session_id = self._mock(httpx_mock, response_checkout)
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        ottu.checkout(**payload_minimal_checkout)
+        session = ottu.session
+
+        ottu.session.retrieve(session_id=session_id)
+        assert ottu.session is session
+        assert session.state == "paid"
+
+    def test_payment_methods_are_parsed_on_access(self, response_checkout):
+        session = Session(ottu=None, **response_checkout)
+        assert isinstance(session._payment_methods[0], dict)
+        assert isinstance(session.payment_methods[0], PaymentMethod)
+        assert session.payment_methods is session.payment_methods
+
+    def test_lazy_sessions(
+        self,
+        httpx_mock,
+        auth_api_key,
+        payload_minimal_checkout,
+        response_checkout,
+        mocker,
+    ):
+        session_id = self._mock(httpx_mock, response_checkout)
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key, lazy_sessions=True)
+        init = mocker.spy(Session, "__init__")
+
+        for _ in range(2):
+            response = ottu.checkout(**payload_minimal_checkout)
+            assert response["response"]["session_id"] == session_id
+        # Only the `Session` the calls are made on
+        assert init.call_count == 1
+
+        # Built on access
+        assert ottu.session.session_id == session_id
+        assert init.call_count == 2
+        ottu.session.retrieve(session_id=session_id)
+        assert ottu.session.state == "paid"
+        assert init.call_count == 2
+
+    def test_failure_keeps_session(self, httpx_mock, auth_api_key):
+        httpx_mock.add_response(
+            url=f"{self.url}missing-session",
+            method="GET",
+            status_code=404,
+            json={"detail": "Not found."},
+        )
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        session = ottu.session
+        response = ottu.session.retrieve(session_id="missing-session")
+        assert response["success"] is False
+        assert ottu.session is session
+
+
 class TestSessionAutoDebit(OttuAutoDebitMixin):
     def get_method_ref(self):
         return Session.auto_debit
@@ -386,6 +472,224 @@ class TestSessionUpdate:
         )
 
 
+class TestSessionAttachment:
+    url = "https://test.ottu.dev/b/checkout/v1/pymt-txn/"
+
+    def _create(self, httpx_mock, auth_api_key, payload, attachment):
+        def callback(request):
+            # Multipart bodies are streamed, consume it while the file is open
+            request.read()
+            return httpx.Response(status_code=201, json={})
+
+        httpx_mock.add_callback(callback, url=self.url, method="POST")
+        ottu = Ottu(merchant_id="test.ottu.dev", auth=auth_api_key)
+        response = ottu.session.create(attachment=attachment, **payload)
+        assert response["success"] is True
+        return httpx_mock.get_request()
+
+    def test_path_is_streamed_and_closed(
+        self,
+        httpx_mock,
+        auth_api_key,
+        payload_minimal_checkout,
+        mocker,
+    ):
+        spy = mocker.spy(builtins, "open")
+        request = self._create(
+            httpx_mock,
+            auth_api_key,
+            payload_minimal_checkout,
+            pathlib.Path("tests/demo-file.txt"),
+        )
+        assert pathlib.Path("tests/demo-file.txt").read_bytes() in request.content
+        assert b'filename="tests/demo-file.txt"' in request.content
+        assert spy.spy_return.closed is True
+
+    def test_bytes(self, httpx_mock, auth_api_key, payload_minimal_checkout):
+        request = self._create(
+            httpx_mock,
+            auth_api_key,
+            payload_minimal_checkout,
+            b"%PDF-raw-bytes",
+        )
+        assert b"%PDF-raw-bytes" in request.content
+        assert b'filename="attachment.pdf"' in request.content
+
+    def test_file_object(self, httpx_mock, auth_api_key, payload_minimal_checkout):
+        request = self._create(
+            httpx_mock,
+            auth_api_key,
+            payload_minimal_checkout,
+            io.BytesIO(b"%PDF-file-object"),
+        )
+        assert b"%PDF-file-object" in request.content
+
+    def test_iterable(self, httpx_mock, auth_api_key, payload_minimal_checkout):
+        chunks = (chunk for chunk in [b"%PDF-", b"chunk-1", b"-chunk-2"])
+        request = self._create(
+            httpx_mock,
+            auth_api_key,
+            payload_minimal_checkout,
+            chunks,
+        )
+        assert b"%PDF-chunk-1-chunk-2" in request.content
+
+    def test_tuple(self, httpx_mock, auth_api_key, payload_minimal_checkout):
+        request = self._create(
+            httpx_mock,
+            auth_api_key,
+            payload_minimal_checkout,
+            ("invoice.pdf", io.BytesIO(b"%PDF-tuple")),
+        )
+        assert b"%PDF-tuple" in request.content
+        assert b'filename="invoice.pdf"' in request.content
+
+
+class TestIterableReader:
+    def test_read(self):
+        reader = IterableReader([b"abc", b"", b"defgh"])
+        assert reader.read(2) == b"ab"
+        assert reader.read(4) == b"c"
+        assert reader.read() == b"defgh"
+        assert reader.read(1) == b""
+
+
+class TestAttachmentCache:
+    url = "https://test.ottu.dev/b/checkout/v1/pymt-txn/"
+    attachment_url = "https://test.ottu.dev/media/attachments/invoice.pdf"
+
+    def _create_many(self, httpx_mock, auth_api_key, payload, attachment, cache):
+        def callback(request):
+            request.read()
+            return httpx.Response(
+                status_code=201,
+                json={"attachment": self.attachment_url},
+            )
+
+        httpx_mock.add_callback(callback, url=self.url, method="POST")
+        httpx_mock.add_callback(callback, url=self.url, method="POST")
+        ottu = Ottu(
+            merchant_id="test.ottu.dev",
+            auth=auth_api_key,
+            attachment_cache=cache,
+        )
+        for _ in range(2):
+            response = ottu.session.create(attachment=attachment, **payload)
+            assert response["success"] is True
+        return httpx_mock.get_requests()
+
+    def test_path_is_read_once(
+        self,
+        httpx_mock,
+        auth_api_key,
+        payload_minimal_checkout,
+        mocker,
+    ):
+        cache = AttachmentCache()
+        spy = mocker.spy(builtins, "open")
+        requests = self._create_many(
+            httpx_mock,
+            auth_api_key,
+            payload_minimal_checkout,
+            "tests/demo-file.txt",
+            cache,
+        )
+        content = pathlib.Path("tests/demo-file.txt").read_bytes()
+        assert all(content in request.content for request in requests)
+        assert all(
+            b'filename="tests/demo-file.txt"' in request.content for request in requests
+        )
+        assert spy.call_count == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_modified_file_is_read_again(self, tmp_path):
+        path = tmp_path / "invoice.pdf"
+        path.write_bytes(b"%PDF-1")
+        cache = AttachmentCache()
+        first = cache.get(path)
+        path.write_bytes(b"%PDF-22")
+        second = cache.get(path)
+        assert second.content == b"%PDF-22"
+        assert first.digest != second.digest
+
+    def test_bytes_share_entry(self):
+        cache = AttachmentCache()
+        first = cache.get(b"%PDF-bytes")
+        second = cache.get(b"%PDF-bytes")
+        assert first is second
+
+    def test_eviction(self):
+        cache = AttachmentCache(max_size=10)
+        cache.get(b"123456")
+        cache.get(b"abcdef")
+        cache.get(b"123456")
+        assert cache.misses == 3
+        # Larger than the whole cache, never stored
+        cache.get(b"x" * 11)
+        cache.get(b"x" * 11)
+        assert cache.misses == 5
+
+    def test_reference_eviction(self):
+        cache = AttachmentCache(reference_field="attachment_url", max_urls=2)
+        cache.remember_upload("a", "https://test.ottu.dev/media/a.pdf")
+        cache.remember_upload("b", "https://test.ottu.dev/media/b.pdf")
+        assert cache.get_reference("a") == "https://test.ottu.dev/media/a.pdf"
+        cache.remember_upload("c", "https://test.ottu.dev/media/c.pdf")
+        # The least recently used is dropped
+        assert cache.get_reference("b") is None
+        assert cache.get_reference("a") is not None
+        assert cache.get_reference("c") is not None
+
+    def test_no_reference_reuse_by_default(
+        self,
+        httpx_mock,
+        auth_api_key,
+        payload_minimal_checkout,
+    ):
+        requests = self._create_many(
+            httpx_mock,
+            auth_api_key,
+            payload_minimal_checkout,
+            b"%PDF-bytes",
+            AttachmentCache(),
+        )
+        assert all(b"%PDF-bytes" in request.content for request in requests)
+
+    def test_reference_reuse(
+        self,
+        httpx_mock,
+        auth_api_key,
+        payload_minimal_checkout,
+    ):
+        first, second = self._create_many(
+            httpx_mock,
+            auth_api_key,
+            payload_minimal_checkout,
+            b"%PDF-bytes",
+            AttachmentCache(reference_field="attachment_url"),
+        )
+        assert b"%PDF-bytes" in first.content
+        assert second.headers["content-type"] == "application/json"
+        assert json.loads(second.content)["attachment_url"] == self.attachment_url
+
+    def test_streams_are_not_cached(
+        self,
+        httpx_mock,
+        auth_api_key,
+        payload_minimal_checkout,
+    ):
+        cache = AttachmentCache()
+        requests = self._create_many(
+            httpx_mock,
+            auth_api_key,
+            payload_minimal_checkout,
+            io.BytesIO(b"%PDF-stream"),
+            cache,
+        )
+        assert b"%PDF-stream" in requests[0].content
+        assert cache.misses == 0
+
+
 class TestOps:
     @pytest.mark.parametrize(
         "op_name, extra_params",
@@ -8,6 +8,7 @@ from ottu.utils.webhooks import (
     _MISSING,
     _SIGNED_FIELDS,
     _SUBSCRIPTION_SIGNED_FIELDS,
+    SignatureVerifier,
     _resolve_path,
     calculate_hmac_signature,
     calculate_subscription_hmac_signature,
@@ -412,3 +413,77 @@ class TestVerifySignature:
         # same payload — that would allow a subscription signature to pass as standard.
         payload = _full_subscription_payload()
         assert calculate_hmac_signature(payload, KEY) != calculate_subscription_hmac_signature(payload, KEY)
+
+
+# ---------------------------------------------------------------------------
+# SignatureVerifier — adaptive scheme cache
+# ---------------------------------------------------------------------------
+
+class TestSignatureVerifier:
+    def test_accepts_both_schemes(self):
+        verifier = SignatureVerifier()
+        std_sig = calculate_hmac_signature(_STD_PAYLOAD, KEY)
+        payload = _full_subscription_payload()
+        sub_sig = calculate_subscription_hmac_signature(payload, KEY)
+        assert verifier.verify(_STD_PAYLOAD, std_sig, KEY) is True
+        assert verifier.verify(payload, sub_sig, KEY) is True
+        assert verifier.counters == {"standard": 1, "subscription": 1, "unverified": 0}
+
+    def test_rejects_tampered_payload(self):
+        verifier = SignatureVerifier()
+        payload = _full_subscription_payload()
+        sig = calculate_subscription_hmac_signature(payload, KEY)
+        tampered = _set_path(payload, "token.token", "evil-token")
+        assert verifier.verify(tampered, sig, KEY) is False
+        assert verifier.counters["unverified"] == 1
+
+    def test_matched_scheme_is_tried_first(self, mocker):
+        verifier = SignatureVerifier()
+        payload = _full_subscription_payload()
+        sig = calculate_subscription_hmac_signature(payload, KEY)
+        assert verifier.verify(payload, sig, KEY) is True
+
+        # The standard scheme must not be computed once subscription has matched.
+        mocker.patch.dict(
+            "ottu.utils.webhooks.SIGNATURE_SCHEMES",
+            {"standard": mocker.Mock(side_effect=AssertionError("not expected"))},
+        )
+        assert verifier.verify(payload, sig, KEY) is True
+        assert verifier.counters["subscription"] == 2
+
+    def test_cache_key_includes_merchant_and_payment_type(self):
+        payload = _full_subscription_payload()
+        assert SignatureVerifier.get_cache_key(payload, KEY) == (
+            KEY,
+            "m-1",
+            "auto_debit",
+        )
+        assert SignatureVerifier.get_cache_key({}, KEY) == (KEY, None, None)
+
+    def test_falls_back_when_preferred_scheme_fails(self):
+        verifier = SignatureVerifier()
+        payload = _full_subscription_payload()
+        sub_sig = calculate_subscription_hmac_signature(payload, KEY)
+        std_sig = calculate_hmac_signature(payload, KEY)
+        assert verifier.verify(payload, sub_sig, KEY) is True
+        assert verifier.verify(payload, std_sig, KEY) is True
+        assert verifier.get_schemes(verifier.get_cache_key(payload, KEY)) == [
+            "standard",
+            "subscription",
+        ]
+
+    def test_max_entries(self):
+        verifier = SignatureVerifier(max_entries=2)
+        for payment_type in ["one_off", "auto_debit", "saved_card"]:
+            payload = {**_STD_PAYLOAD, "payment_type": payment_type}
+            sig = calculate_hmac_signature(payload, KEY)
+            assert verifier.verify(payload, sig, KEY) is True
+        assert len(verifier._preferred) == 2
+
+    def test_reset(self):
+        verifier = SignatureVerifier()
+        sig = calculate_hmac_signature(_STD_PAYLOAD, KEY)
+        verifier.verify(_STD_PAYLOAD, sig, KEY)
+        verifier.reset()
+        assert verifier._preferred == {}
+        assert verifier.counters == {"standard": 0, "subscription": 0, "unverified": 0}